@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+文件账号源
+
+账号很多时不适合放在一个逗号分隔的环境变量里（密码含逗号会被拆开、环境变量有长度限制、一次性全部载入）。
+这里从文件按行读取账号，每个账号可以带自己的选项：
+
+  JSONL：每行一个对象
+    {"account": "a@example.com", "password": "p,w", "site": "leaflow", "proxy": "http://127.0.0.1:8080", "priority": 10}
+  CSV：第一行为表头，每行一个账号（字段含逗号时用双引号括起来）
+    account,password,site,proxy,priority,enabled
+
+  account   账号（也可以写 email / username），必填
+  password  密码，必填
+  site      只用于指定站点，留空表示所有站点
+  proxy     该账号使用的代理，浏览器和 HTTP 请求都走这个代理（Chrome 不支持在代理地址中带用户名密码）
+  priority  优先级，数字越大越先处理，默认 0
+  enabled   false / 0 / no 表示停用
+
+启动时完整扫描一遍文件做校验（格式错误的行记录行号后跳过），只在内存中保留每个有效账号的文件偏移，
+处理到某个账号时再回到文件中读取这一行，账号数量很大时内存占用也基本不变。
+
+文件名以 .enc 结尾时为加密文件：每一行是一个 Fernet 密文（明文为 JSONL / CSV 的一行），
+可以用 python account_source.py encrypt <明文文件> <输出文件> 生成，口令来自 ACCOUNTS_FILE_KEY。
+
+环境变量：
+  <站点>_ACCOUNTS_FILE  站点的账号文件，例如 LEAFLOW_ACCOUNTS_FILE
+  ACCOUNTS_FILE         所有站点共用的账号文件（按 site 字段区分），站点的文件优先
+  ACCOUNTS_FILE_KEY     加密文件的口令
+未设置账号文件时继续使用原来的环境变量（LEAFLOW_ACCOUNTS 等）。
+"""
+
+import io
+import os
+import csv
+import sys
+import copy
+import json
+import logging
+from array import array
+
+from session_store import Fernet, InvalidToken, derive_key
+
+logger = logging.getLogger(__name__)
+
+ID_ALIASES = ("account", "email", "username")
+FALSE_VALUES = ("false", "0", "no", "off")
+
+
+class AccountFileError(ValueError):
+    pass
+
+
+def detect_format(path: str):
+    """返回 (格式, 是否加密)"""
+    name = path.lower()
+    encrypted = name.endswith(".enc")
+    if encrypted:
+        name = name[:-4]
+    if name.endswith(".csv"):
+        return "csv", encrypted
+    if name.endswith(".jsonl") or name.endswith(".json"):
+        return "jsonl", encrypted
+    raise AccountFileError(f"无法识别账号文件格式（应为 .jsonl / .csv，可加 .enc）: {path}")
+
+
+def _fernet(key: str):
+    if Fernet is None:
+        raise AccountFileError("读取加密账号文件需要安装 cryptography")
+    if not key:
+        raise AccountFileError("账号文件已加密，请设置 ACCOUNTS_FILE_KEY")
+    return Fernet(derive_key(key))
+
+
+class AccountSource:
+    """
+    按需从文件读取账号，用法与账号列表相同：len()、遍历、按序号取值。
+    每个账号是一个字典：{<id_field>: 账号, "password", "proxy", "priority"}。
+    """
+
+    def __init__(self, path: str, site: str, id_field: str = "account", key: str = None):
+        self.path = path
+        self.site = site
+        self.id_field = id_field
+        self.format, encrypted = detect_format(path)
+        self._fernet = _fernet(key) if encrypted else None
+        self._header = None
+        # 有效账号所在行的文件偏移，按处理顺序排列
+        self._offsets = array("q")
+        self.errors = 0
+        self._validate()
+
+    # ========== 逐行读取 ==========
+
+    def _decode(self, raw: bytes, lineno: int) -> str:
+        if self._fernet:
+            try:
+                raw = self._fernet.decrypt(raw.strip())
+            except InvalidToken:
+                raise AccountFileError(f"{self.path}:{lineno}: 解密失败，口令错误或文件损坏")
+        return raw.decode("utf-8-sig").strip()
+
+    def _parse(self, text: str) -> dict:
+        if self.format == "jsonl":
+            record = json.loads(text)
+            if not isinstance(record, dict):
+                raise ValueError("每行应为一个 JSON 对象")
+            return record
+        row = next(csv.reader(io.StringIO(text)))
+        return dict(zip(self._header, (value.strip() for value in row)))
+
+    def _normalize(self, record: dict):
+        """返回账号字典；不属于本站点或已停用时返回 None，缺少必填字段时抛出 ValueError"""
+        site = str(record.get("site") or "").strip().lower()
+        if site and site != self.site:
+            return None
+        if str(record.get("enabled", "")).strip().lower() in FALSE_VALUES or record.get("enabled") is False:
+            return None
+
+        account = next((str(record[k]).strip() for k in ID_ALIASES if record.get(k)), "")
+        password = str(record.get("password") or "")
+        if not account or not password:
+            raise ValueError("缺少账号或密码")
+        try:
+            priority = int(record.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"priority 应为整数: {record.get('priority')!r}")
+        return {
+            self.id_field: account,
+            "password": password,
+            "proxy": str(record.get("proxy") or "").strip() or None,
+            "priority": priority,
+        }
+
+    def _validate(self) -> None:
+        """扫描一遍文件，记录有效账号的偏移；只保留偏移和优先级，不保留账号内容"""
+        offsets = array("q")
+        priorities = array("q")
+        with open(self.path, "rb") as f:
+            lineno = 0
+            while True:
+                offset = f.tell()
+                raw = f.readline()
+                if not raw:
+                    break
+                lineno += 1
+                if not raw.strip():
+                    continue
+                text = self._decode(raw, lineno)
+                if not text or text.startswith("#"):
+                    continue
+                if self.format == "csv" and self._header is None:
+                    self._header = [h.strip().lower() for h in next(csv.reader(io.StringIO(text)))]
+                    if not any(h in self._header for h in ID_ALIASES) or "password" not in self._header:
+                        raise AccountFileError(f"{self.path}: CSV 表头需要包含 account（或 email/username）和 password")
+                    continue
+                try:
+                    account = self._normalize(self._parse(text))
+                except (ValueError, StopIteration) as e:
+                    # 不在日志中输出行内容，避免泄露密码
+                    self.errors += 1
+                    logger.warning(f"{self.path}:{lineno}: 账号格式错误，已跳过（{e.__class__.__name__}: {e}）")
+                    continue
+                if account:
+                    offsets.append(offset)
+                    priorities.append(account["priority"])
+
+        if any(priorities):
+            # 优先级高的先处理，相同优先级保持文件中的顺序
+            order = sorted(range(len(offsets)), key=lambda i: -priorities[i])
+            offsets = array("q", (offsets[i] for i in order))
+        self._offsets = offsets
+        logger.info(f"从 {self.path} 加载 {self.site} 账号 {len(offsets)} 个" + (f"，跳过 {self.errors} 行格式错误" if self.errors else ""))
+
+    def _read_at(self, offset: int) -> dict:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return self._normalize(self._parse(self._decode(f.readline(), 0)))
+
+    # ========== 列表接口 ==========
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._read_at(offset) for offset in self._offsets[index]]
+        return self._read_at(self._offsets[index])
+
+    def __iter__(self):
+        for offset in self._offsets:
+            yield self._read_at(offset)
+
+    def __bool__(self):
+        return len(self._offsets) > 0
+
+    def take(self, indexes):
+        """只包含指定序号账号的新账号源（共用同一个文件，不重新扫描）"""
+        view = copy.copy(self)
+        view._offsets = array("q", (self._offsets[i] for i in indexes))
+        return view
+
+
+def source_from_env(site: str, id_field: str = "account"):
+    """配置了账号文件时返回 AccountSource，否则返回 None（使用原来的环境变量方式）"""
+    path = os.getenv(f"{site.upper()}_ACCOUNTS_FILE", "").strip() or os.getenv("ACCOUNTS_FILE", "").strip()
+    if not path:
+        return None
+    return AccountSource(path, site, id_field=id_field, key=os.getenv("ACCOUNTS_FILE_KEY", ""))
+
+
+def proxy_settings(proxy):
+    """requests 使用的代理配置"""
+    return {"http": proxy, "https": proxy} if proxy else {}
+
+
+def encrypt_file(src: str, dst: str, key: str) -> int:
+    """把明文账号文件逐行加密，返回加密的行数"""
+    fernet = _fernet(key)
+    count = 0
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        for line in fin:
+            line = line.rstrip(b"\r\n")
+            if not line.strip():
+                continue
+            fout.write(fernet.encrypt(line) + b"\n")
+            count += 1
+    return count
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) == 4 and sys.argv[1] == "encrypt":
+        count = encrypt_file(sys.argv[2], sys.argv[3], os.getenv("ACCOUNTS_FILE_KEY", ""))
+        logger.info(f"已加密 {count} 行到 {sys.argv[3]}")
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "check":
+        sites = [sys.argv[3]] if len(sys.argv) == 4 else ["leaflow", "mjjbox", "nodeloc"]
+        for site in sites:
+            AccountSource(sys.argv[2], site, key=os.getenv("ACCOUNTS_FILE_KEY", ""))
+    else:
+        print("Usage: python account_source.py encrypt <plain_file> <encrypted_file>")
+        print("       python account_source.py check <file> [site]")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
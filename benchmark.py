@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+离线性能基准测试
+
+启动本地模拟站点（见 standin_sites.py），用 N 个虚拟账号运行三个签到脚本中的类，
+统计每个账号和整轮的耗时、进程树（Python + chromedriver + Chrome）的峰值内存
+以及 WebDriver 命令数，结果写入基线文件，便于不同版本之间对比。
+
+用法：
+  python benchmark.py --sites leaflow,mjjbox,nodeloc --accounts 5
+  python benchmark.py --latency 0.05 --popup --checked-in 0.4 --rounds 2
+  python benchmark.py --output benchmark_new.json --compare benchmark_baseline.json
+  LOW_MEMORY=1 python benchmark.py --output benchmark_low.json --compare benchmark_baseline.json
+
+  每个账号除了整个进程树的峰值内存，还记录该账号所用浏览器（chromedriver + Chrome）的峰值，
+  对比 LOW_MEMORY=1 与默认配置即可看到低内存模式的效果。
+
+  --rounds 大于 1 时，每一轮开始前模拟进入新的一天，会话缓存、选择器缓存和接口缓存
+  在轮次之间保留，第二轮起反映的是缓存命中后的耗时。
+
+无需访问真实站点，Linux 上安装 Chrome 即可运行（强制无头模式）。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import importlib
+import platform
+import subprocess
+import threading
+
+from browser_pool import pool_from_env
+from session_store import store_from_env
+from http_client import build_session
+from run_metrics import metrics, mask_account, percentile
+from memory_profile import RSS_KIND, low_memory_enabled, process_tree_rss
+from standin_sites import StandInServer, STANDIN_PASSWORD
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ALL_SITES = ("leaflow", "mjjbox", "nodeloc")
+
+# 每个站点使用的模拟站点类型
+STANDIN_TYPES = {"leaflow": "leaflow", "mjjbox": "discourse", "nodeloc": "discourse"}
+
+
+# ========== 内存采样 ==========
+
+class MemorySampler:
+    """后台线程定期采样进程树内存，记录整体峰值和当前账号的峰值"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak = 0
+        self.window_peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.enabled = os.path.isdir("/proc")
+        if not self.enabled:
+            logger.warning("当前系统没有 /proc，无法统计内存")
+
+    def sample(self) -> int:
+        rss = process_tree_rss(os.getpid()) if self.enabled else 0
+        self.peak = max(self.peak, rss)
+        self.window_peak = max(self.window_peak, rss)
+        return rss
+
+    def start_window(self) -> None:
+        self.window_peak = 0
+        self.sample()
+
+    def end_window(self) -> int:
+        self.sample()
+        return self.window_peak
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def to_mb(n: int) -> float:
+    return round(n / 1024 / 1024, 1)
+
+
+# ========== 运行站点 ==========
+
+def account_names(site: str, count: int) -> list:
+    if site == "leaflow":
+        return [f"bench{i}@example.com" for i in range(count)]
+    return [f"bench{i}" for i in range(count)]
+
+
+def configure_env(site: str, base_url: str, workdir: str, args) -> None:
+    """导入站点模块之前设置环境变量，所有缓存文件放在临时目录中"""
+    os.environ.update({
+        "HEADLESS": "1",
+        "SESSION_STORE_KEY": "benchmark",
+        "SESSION_STORE_DIR": os.path.join(workdir, "sessions"),
+        "SELECTOR_CACHE": os.path.join(workdir, "selector_cache.json"),
+        "LEAFLOW_API_CACHE": os.path.join(workdir, "leaflow_api.json"),
+    })
+    # 默认不限速，测量脚本本身的耗时；需要评估限速效果时可以显式设置 RATE_LIMIT=on
+    os.environ.setdefault("RATE_LIMIT", "off")
+    for name in ("TELEGRAM_BOT_TOKEN", "TELEGRAM_CHAT_ID", "METRICS_JSON", "METRICS_PROM_FILE"):
+        os.environ.pop(name, None)
+
+    if site == "leaflow":
+        os.environ["LEAFLOW_BASE_URL"] = base_url
+        os.environ["LEAFLOW_CHECKIN_URL"] = f"{base_url}/checkin"
+    elif site == "mjjbox":
+        os.environ["MJJBOX_BASE_URL"] = base_url
+    elif site == "nodeloc":
+        os.environ["NODELOC_BASE_URL"] = base_url
+        os.environ["NODELOC_CHECKIN_PATH"] = "/checkin"
+
+    if args.mode:
+        os.environ["MJJBOX_MODE"] = args.mode
+        os.environ["NODELOC_MODE"] = args.mode
+
+
+def load_site_module(site: str):
+    """站点地址在模块导入时读取，每个站点重新加载一次"""
+    name = f"{site}_checkin"
+    if name in sys.modules:
+        return importlib.reload(sys.modules[name])
+    return importlib.import_module(name)
+
+
+def make_runner(site: str, module, pool, session_store, http_session):
+    """返回 run(账号) -> (是否成功, 结果)，与各脚本主流程中单个账号的处理方式一致"""
+    if site == "leaflow":
+        def run(name):
+            checker = module.LeaflowAutoCheckin(name, STANDIN_PASSWORD, pool=pool, session_store=session_store)
+            success, result, _, _ = checker.run()
+            return success, result
+
+    elif site == "mjjbox":
+        def run(name):
+            checker = None
+            try:
+                checker = module.MJJBoxAutoCheckin(
+                    name, STANDIN_PASSWORD,
+                    pool=pool, session_store=session_store, http_session=http_session,
+                )
+                return True, checker.checkin()
+            except Exception as e:
+                if checker:
+                    checker.close(discard=True)
+                return False, str(e)
+            finally:
+                if checker:
+                    checker.close()
+
+    else:
+        def run(name):
+            checker = module.NodeLocAutoCheckin(name, STANDIN_PASSWORD, pool=pool, session_store=session_store)
+            success, result, _, _ = checker.run()
+            return success, result
+
+    return run
+
+
+def summarize(accounts: list, wall: float, peak: int) -> dict:
+    seconds = [a["seconds"] for a in accounts]
+    return {
+        "wall_seconds": round(wall, 3),
+        "accounts": accounts,
+        "success": sum(1 for a in accounts if a["success"]),
+        "p50_seconds": percentile(seconds, 0.5),
+        "p95_seconds": percentile(seconds, 0.95),
+        "webdriver_commands": sum(a["webdriver_commands"] for a in accounts),
+        "http_requests": sum(a["http_requests"] for a in accounts),
+        "peak_rss_mb": to_mb(peak),
+        "browser_peak_rss_mb": max((a["browser_peak_rss_mb"] for a in accounts), default=0),
+    }
+
+
+def run_site(site: str, args, sampler: MemorySampler) -> dict:
+    names = account_names(site, args.accounts)
+    workdir = tempfile.mkdtemp(prefix=f"bench-{site}-")
+
+    with StandInServer(STANDIN_TYPES[site], latency=args.latency, popup=args.popup) as server:
+        server.state.seed(names, args.checked_in)
+        configure_env(site, server.base_url, workdir, args)
+        module = load_site_module(site)
+
+        origins = getattr(module, f"{site.upper()}_ORIGINS", [server.base_url])
+        pool = pool_from_env(module.create_driver, origins=origins)
+        http_session = build_session() if site == "mjjbox" else None
+        rounds = []
+        try:
+            for round_index in range(args.rounds):
+                if round_index:
+                    server.state.new_day(args.checked_in)
+                # 每轮重新读取会话缓存，模拟新的一次运行
+                run = make_runner(site, module, pool, store_from_env(), http_session)
+                metrics.reset()
+                accounts = []
+
+                logger.info(f"[{site}] 第 {round_index + 1}/{args.rounds} 轮，{len(names)} 个账号")
+                sampler.start_window()
+                round_start = time.perf_counter()
+                round_peak = 0
+                for name in names:
+                    sampler.start_window()
+                    start = time.perf_counter()
+                    with metrics.account(site, name):
+                        try:
+                            success, result = run(name)
+                        except Exception as e:
+                            success, result = False, str(e)
+                        metrics.set_outcome(success)
+                    elapsed = time.perf_counter() - start
+                    peak = sampler.end_window()
+                    round_peak = max(round_peak, peak)
+
+                    counters = metrics.counters.get((site, mask_account(name)), {})
+                    peaks = metrics.peaks.get((site, mask_account(name)), {})
+                    accounts.append({
+                        "account": mask_account(name),
+                        "success": success,
+                        "result": str(result)[:200],
+                        "seconds": round(elapsed, 3),
+                        "webdriver_commands": counters.get("webdriver_commands", 0),
+                        "http_requests": counters.get("http_requests", 0),
+                        "peak_rss_mb": to_mb(peak),
+                        "browser_peak_rss_mb": to_mb(peaks.get(RSS_KIND, 0)),
+                    })
+                wall = time.perf_counter() - round_start
+
+                summary = summarize(accounts, wall, round_peak)
+                summary["phases"] = metrics.phase_stats().get(site, {})
+                summary["server_requests"] = server.state.requests
+                server.state.requests = 0
+                rounds.append(summary)
+        finally:
+            if pool:
+                pool.close()
+            if http_session:
+                http_session.close()
+
+    return {"rounds": rounds}
+
+
+# ========== 报告 ==========
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def print_report(report: dict) -> None:
+    for site, data in report["sites"].items():
+        for i, r in enumerate(data["rounds"], 1):
+            print(f"\n== {site} 第 {i} 轮：成功 {r['success']}/{len(r['accounts'])}，"
+                  f"总耗时 {r['wall_seconds']:.2f}s，p50 {r['p50_seconds']:.2f}s，p95 {r['p95_seconds']:.2f}s，"
+                  f"WebDriver 命令 {r['webdriver_commands']}，HTTP 请求 {r['http_requests']}，"
+                  f"峰值内存 {r['peak_rss_mb']} MB")
+            print(f"{'账号':<16}{'结果':<6}{'耗时(s)':>10}{'WebDriver':>11}{'HTTP':>7}{'峰值(MB)':>10}")
+            for a in r["accounts"]:
+                print(f"{a['account']:<16}{'✅' if a['success'] else '❌':<6}{a['seconds']:>10.2f}"
+                      f"{a['webdriver_commands']:>11}{a['http_requests']:>7}{a['peak_rss_mb']:>10}")
+
+
+def change(old, new) -> str:
+    if not old:
+        return f"{new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)"
+
+
+def print_comparison(baseline: dict, report: dict) -> None:
+    print(f"\n== 与基线对比（{baseline.get('revision') or '未知版本'} -> {report.get('revision') or '当前'}）")
+    for site, data in report["sites"].items():
+        old_rounds = baseline.get("sites", {}).get(site, {}).get("rounds", [])
+        for i, new in enumerate(data["rounds"]):
+            if i >= len(old_rounds):
+                print(f"{site} 第 {i + 1} 轮：基线中没有对应数据")
+                continue
+            old = old_rounds[i]
+            print(f"{site} 第 {i + 1} 轮：")
+            for key, label in (
+                ("wall_seconds", "总耗时(s)"),
+                ("p50_seconds", "p50(s)"),
+                ("p95_seconds", "p95(s)"),
+                ("webdriver_commands", "WebDriver 命令"),
+                ("http_requests", "HTTP 请求"),
+                ("peak_rss_mb", "峰值内存(MB)"),
+                ("browser_peak_rss_mb", "单浏览器峰值(MB)"),
+            ):
+                print(f"  {label:<16}{change(old.get(key), new.get(key))}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="签到脚本离线性能基准测试")
+    parser.add_argument("--sites", default=",".join(ALL_SITES), help="要测试的站点，逗号分隔")
+    parser.add_argument("--accounts", type=int, default=3, help="每个站点的虚拟账号数")
+    parser.add_argument("--rounds", type=int, default=1, help="运行轮数，第二轮起缓存已预热")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟站点每个请求的延迟（秒）")
+    parser.add_argument("--popup", action="store_true", help="登录页显示遮罩弹窗")
+    parser.add_argument("--checked-in", type=float, default=0.0, help="初始即为今日已签到的账号比例")
+    parser.add_argument("--mode", choices=("auto", "http", "browser"), help="MJJBOX / NodeLoc 的签到方式")
+    parser.add_argument("--output", default="benchmark_baseline.json", help="结果文件路径")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    args.sites = [s.strip() for s in args.sites.split(",") if s.strip()]
+    unknown = set(args.sites) - set(ALL_SITES)
+    if unknown:
+        parser.error(f"未知的站点: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "accounts": args.accounts,
+            "rounds": args.rounds,
+            "latency": args.latency,
+            "popup": args.popup,
+            "checked_in": args.checked_in,
+            "mode": args.mode or "auto",
+            "block_resources": os.getenv("BLOCK_RESOURCES", "off"),
+            "browser_pool_size": os.getenv("BROWSER_POOL_SIZE", "1"),
+            "low_memory": low_memory_enabled(),
+        },
+        "sites": {},
+    }
+
+    with MemorySampler() as sampler:
+        for site in args.sites:
+            report["sites"][site] = run_site(site, args, sampler)
+
+    print_report(report)
+
+    if args.compare:
+        try:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                print_comparison(json.load(f), report)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取基线文件失败: {e}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"基准测试结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Chrome 浏览器池
+
+每次运行只启动少量 Chrome 进程，多个账号轮流复用。
+账号之间会清空 Cookie / 缓存 / 站点存储，保证会话互不干扰。
+
+常驻进程（checkin_daemon.py）中调用 keep_warm() 后，同一站点的浏览器池在多次运行之间保留，
+运行结束时不关闭空闲的浏览器，下次签到直接复用；空闲超过 BROWSER_WARM_IDLE 秒的浏览器由 reap_warm_pools() 关闭。
+
+环境变量：
+  BROWSER_POOL_SIZE      池中浏览器数量，默认与并发数相同；设为 0 表示禁用（每个账号单独启动浏览器）
+  BROWSER_RECYCLE_AFTER  单个浏览器处理多少个账号后重建，默认 10
+  BROWSER_WARM_IDLE      常驻模式下空闲浏览器保留的秒数，默认 1800
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    def __init__(self, factory, size=1, recycle_after=10, origins=None, persistent=False):
+        """
+        factory: 无参函数，返回一个新的 webdriver 实例
+        size: 同时存在的浏览器数量上限
+        recycle_after: 单个浏览器复用多少次后重建
+        origins: 需要在账号之间清空存储的站点列表
+        persistent: 为 True 时 close() 保留空闲浏览器，供下次运行复用，shutdown() 才真正关闭
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self.origins = list(origins or [])
+        self.persistent = persistent
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._idle_since = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取出一个已清理的浏览器，池中没有空闲浏览器时新建"""
+        self._slots.acquire()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            # 常驻模式下浏览器可能已经空闲很久，先确认还能用
+            if not self.persistent or self._alive(driver):
+                return driver
+            logger.info("空闲浏览器已失效，重新启动")
+            self._quit(driver)
+
+        try:
+            logger.info("浏览器池启动新的 Chrome 实例")
+            driver = self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def release(self, driver, discard=False):
+        """归还浏览器；出错、达到复用上限或清理失败时直接关闭"""
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+
+            if discard or uses >= self.recycle_after or not self.reset_session(driver):
+                logger.info(f"浏览器已使用 {uses} 次，关闭并回收")
+                self._quit(driver)
+            else:
+                with self._lock:
+                    self._idle_since[id(driver)] = time.monotonic()
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def reset_session(self, driver):
+        """清空 Cookie、缓存和站点存储，回到空白页"""
+        try:
+            # 只保留一个标签页
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            driver.get("about:blank")
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            for origin in self.origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": origin,
+                    "storageTypes": "all"
+                })
+            return True
+        except Exception as e:
+            logger.warning(f"清理浏览器会话失败: {e}")
+            return False
+
+    def close(self):
+        """运行结束时调用：关闭池中所有空闲浏览器，常驻模式下保留"""
+        if self.persistent:
+            logger.info(f"保留 {self._idle.qsize()} 个空闲浏览器供下次运行使用")
+            return
+        self.shutdown()
+
+    def shutdown(self):
+        """关闭池中所有空闲浏览器"""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+    def reap_idle(self, max_idle):
+        """关闭空闲超过 max_idle 秒的浏览器，返回关闭的数量"""
+        now = time.monotonic()
+        keep, expired = [], []
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                since = self._idle_since.get(id(driver), now)
+            (expired if now - since >= max_idle else keep).append(driver)
+        # LIFO 队列：按取出的相反顺序放回，保持原来的先后
+        for driver in reversed(keep):
+            self._idle.put(driver)
+        for driver in expired:
+            self._quit(driver)
+        return len(expired)
+
+    def _alive(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._idle_since.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# 常驻模式下按 (创建函数, 站点) 保留的浏览器池
+_warm_pools = {}
+_warm_lock = threading.Lock()
+_keep_warm = False
+
+
+def keep_warm(enabled=True):
+    """常驻进程启动时调用，之后 pool_from_env 返回跨运行复用的浏览器池"""
+    global _keep_warm
+    _keep_warm = enabled
+
+
+def reap_warm_pools(max_idle=None):
+    """关闭常驻浏览器池中空闲太久的浏览器"""
+    if max_idle is None:
+        try:
+            max_idle = float(os.getenv("BROWSER_WARM_IDLE", "1800"))
+        except ValueError:
+            max_idle = 1800.0
+    with _warm_lock:
+        pools = list(_warm_pools.values())
+    closed = sum(pool.reap_idle(max_idle) for pool in pools)
+    if closed:
+        logger.info(f"关闭 {closed} 个空闲超过 {max_idle:.0f} 秒的浏览器")
+
+
+def shutdown_warm_pools():
+    """常驻进程退出时关闭所有保留的浏览器"""
+    with _warm_lock:
+        pools = list(_warm_pools.values())
+        _warm_pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def pool_from_env(factory, origins=None, default_size=1):
+    """根据环境变量创建浏览器池，BROWSER_POOL_SIZE=0 时返回 None"""
+    try:
+        size = int(os.getenv("BROWSER_POOL_SIZE", str(default_size)).strip())
+        recycle_after = int(os.getenv("BROWSER_RECYCLE_AFTER", "10").strip())
+    except ValueError:
+        logger.warning("浏览器池配置无效，禁用浏览器池")
+        return None
+
+    if size <= 0:
+        return None
+
+    if _keep_warm:
+        key = (getattr(factory, "__module__", ""), getattr(factory, "__qualname__", repr(factory)), tuple(origins or []))
+        with _warm_lock:
+            pool = _warm_pools.get(key)
+            if pool is None or pool.size != size:
+                if pool is not None:
+                    pool.shutdown()
+                logger.info(f"启用常驻浏览器池：大小 {size}，每个浏览器最多复用 {recycle_after} 次")
+                pool = BrowserPool(factory, size=size, recycle_after=recycle_after, origins=origins, persistent=True)
+                _warm_pools[key] = pool
+            return pool
+
+    logger.info(f"启用浏览器池：大小 {size}，每个浏览器最多复用 {recycle_after} 次")
+    return BrowserPool(factory, size=size, recycle_after=recycle_after, origins=origins)
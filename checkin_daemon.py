@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+常驻签到进程
+
+替代"外部定时触发 + 每次冷启动"的方式：进程一直运行，自己安排每个站点每天的签到时间
+（与 schedule_next.py 相同，在北京时间的分钟窗口内随机选一个时间点），
+解释器、依赖模块和浏览器在多次签到之间保持加载，每次签到只剩与站点交互的耗时。
+
+用法：
+  python checkin_daemon.py                  按计划运行
+  python checkin_daemon.py --run-now        启动后先立即运行一次所有站点，再按计划运行
+  python checkin_daemon.py --sites leaflow,nodeloc
+
+环境变量：
+  DAEMON_SITES          运行的站点，逗号分隔，默认为配置了账号的站点
+  DAEMON_WINDOW         每日签到窗口（北京时间，距 0 点的分钟数），默认 60-180，即 1:00~3:00
+  <站点>_WINDOW         单个站点的窗口，例如 NODELOC_WINDOW=480-540
+  DAEMON_KEEP_BROWSER   设为 0 时每次运行结束关闭浏览器，默认 1（保留，空闲超过 BROWSER_WARM_IDLE 秒后关闭）
+  CHECKIN_PLAN          设为 1 时在窗口开始时启动站点，由 load_planner 把账号分散到整个窗口
+  其余配置与各站点脚本相同
+
+各站点在各自的线程中运行，一个站点的签到（按计划可能持续整个窗口）不会推迟其他站点。
+每个站点开始运行时只清空该站点上一轮的耗时统计；收到停止信号时，按计划等待中的站点不再等待剩余账号。
+"""
+
+import os
+import sys
+import heapq
+import signal
+import logging
+import argparse
+import importlib
+import threading
+from datetime import datetime, timedelta
+
+import browser_pool
+import load_planner
+from run_metrics import metrics
+from schedule_next import TZ, next_run_time
+from load_planner import parse_window, planning_enabled, window_bounds
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 站点 -> 判断是否配置了账号的环境变量
+SITE_ACCOUNT_ENVS = {
+    "leaflow": ("LEAFLOW_ACCOUNTS", "LEAFLOW_EMAIL", "LEAFLOW_ACCOUNTS_FILE", "ACCOUNTS_FILE"),
+    "mjjbox": ("MJJBOX_ACCOUNTS", "MJJBOX_EMAIL", "MJJBOX_ACCOUNTS_FILE", "ACCOUNTS_FILE"),
+    "nodeloc": ("NODELOC_ACCOUNTS", "NODELOC_ACCOUNTS_FILE", "ACCOUNTS_FILE"),
+}
+
+# 等待期间的最长睡眠时间，用于定期关闭空闲浏览器
+TICK_SECONDS = 60
+
+
+def run_site_once(site: str, module) -> None:
+    """在当前进程中运行一次站点的完整签到流程（与直接运行脚本相同，但不退出进程）"""
+    if site == "mjjbox":
+        # 不解析守护进程自己的命令行参数
+        module.main([])
+    else:
+        module.MultiAccountManager().run_all()
+
+
+def configured_sites():
+    return [site for site, names in SITE_ACCOUNT_ENVS.items() if any(os.getenv(n, "").strip() for n in names)]
+
+
+class CheckinDaemon:
+    def __init__(self, sites, keep_browser=True):
+        self.sites = list(sites)
+        self.windows = {site: parse_window(site) for site in self.sites}
+        self.planned = planning_enabled()
+        self.stop_event = threading.Event()
+        # (下次运行时间, 站点)
+        self.schedule = []
+        self._schedule_lock = threading.Lock()
+        # 正在运行的站点 -> 线程（与 schedule 共用 _schedule_lock）
+        self.running = {}
+        # 停止时结束按计划的等待
+        load_planner.use_stop_event(self.stop_event)
+
+        if keep_browser:
+            browser_pool.keep_warm()
+
+        # 启动时导入所有站点模块，之后每次签到不再付出导入开销
+        self.modules = {}
+        for site in self.sites:
+            self.modules[site] = importlib.import_module(f"{site}_checkin")
+
+    def plan(self, site: str, include_today: bool) -> None:
+        start, end = self.windows[site]
+        now = datetime.now(TZ)
+        if self.planned:
+            # 按账号分散时在窗口开始时启动，各账号到点才处理
+            day = now.astimezone(TZ).date()
+            window_start, window_end = window_bounds(day, start, end)
+            if not include_today or now >= window_end:
+                window_start, _ = window_bounds(day + timedelta(days=1), start, end)
+            run_at = max(now, window_start)
+        else:
+            run_at = next_run_time(start, end, now, include_today=include_today)
+        with self._schedule_lock:
+            heapq.heappush(self.schedule, (run_at, site))
+        logger.info(f"[{site}] 下次签到时间（北京时间）: {run_at:%Y-%m-%d %H:%M:%S}，窗口 {start}-{end} 分钟")
+
+    def run_site(self, site: str) -> None:
+        logger.info(f"[{site}] 开始签到")
+        # 耗时统计按站点记录，只清空本站点上一轮的数据，不影响同时运行的其他站点
+        metrics.reset(site)
+        try:
+            run_site_once(site, self.modules[site])
+        except SystemExit:
+            pass
+        except Exception as e:
+            logger.error(f"[{site}] 签到运行出错: {e}")
+        logger.info(f"[{site}] 本次签到结束")
+
+    def _run_and_replan(self, site: str) -> None:
+        try:
+            self.run_site(site)
+        finally:
+            with self._schedule_lock:
+                self.running.pop(site, None)
+            if not self.stop_event.is_set():
+                self.plan(site, include_today=False)
+
+    def start_site(self, site: str) -> None:
+        thread = threading.Thread(target=self._run_and_replan, args=(site,), name=f"checkin-{site}")
+        with self._schedule_lock:
+            self.running[site] = thread
+        thread.start()
+
+    def next_due(self):
+        with self._schedule_lock:
+            return self.schedule[0] if self.schedule else (None, None)
+
+    def run_forever(self, run_now: bool = False) -> None:
+        for site in self.sites:
+            if run_now:
+                self.start_site(site)
+            else:
+                # 今天的窗口还没过时今天就运行一次，当天已签到的账号会被每日状态跳过
+                self.plan(site, include_today=True)
+
+        try:
+            while not self.stop_event.is_set():
+                run_at, site = self.next_due()
+                remaining = TICK_SECONDS if run_at is None else (run_at - datetime.now(TZ)).total_seconds()
+                if remaining > 0:
+                    # 等待期间定期关闭空闲太久的浏览器
+                    browser_pool.reap_warm_pools()
+                    self.stop_event.wait(min(remaining, TICK_SECONDS))
+                    continue
+                with self._schedule_lock:
+                    heapq.heappop(self.schedule)
+                    busy = site in self.running
+                if busy:
+                    logger.warning(f"[{site}] 上一次签到仍在运行，跳过本次")
+                    self.plan(site, include_today=False)
+                    continue
+                self.start_site(site)
+        finally:
+            with self._schedule_lock:
+                threads = list(self.running.values())
+            for thread in threads:
+                thread.join()
+            browser_pool.shutdown_warm_pools()
+            logger.info("常驻签到进程已退出")
+
+    def stop(self, *_):
+        logger.info("收到停止信号，当前账号处理完后退出")
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻签到进程")
+    parser.add_argument("--sites", default=os.getenv("DAEMON_SITES", ""), help="运行的站点，逗号分隔")
+    parser.add_argument("--run-now", action="store_true", help="启动后立即运行一次所有站点")
+    args = parser.parse_args()
+
+    sites = [s.strip().lower() for s in args.sites.split(",") if s.strip()] or configured_sites()
+    unknown = [s for s in sites if s not in SITE_ACCOUNT_ENVS]
+    if unknown:
+        logger.error(f"未知站点: {', '.join(unknown)}，可选: {', '.join(SITE_ACCOUNT_ENVS)}")
+        sys.exit(1)
+    if not sites:
+        logger.error("没有配置账号的站点，请设置 LEAFLOW_ACCOUNTS / MJJBOX_ACCOUNTS / NODELOC_ACCOUNTS")
+        sys.exit(1)
+
+    keep_browser = os.getenv("DAEMON_KEEP_BROWSER", "1").strip().lower() not in ("0", "false", "off")
+    daemon = CheckinDaemon(sites, keep_browser=keep_browser)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    logger.info(f"常驻签到进程启动，站点: {', '.join(sites)}，保留浏览器: {'是' if keep_browser else '否'}")
+    daemon.run_forever(run_now=args.run_now)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+每日签到状态记录
+
+按 站点 + 账号 + 签到日 记录当天是否已经签到成功（SQLite 单文件）。
+任务重跑或被重复触发时，已完成的账号在启动浏览器之前就直接跳过，不再登录。
+
+签到日按北京时间（Asia/Shanghai）计算，每个站点可以设置每日重置的小时，
+重置之前的记录视为前一天，自然失效。
+
+环境变量：
+  DAILY_STATE_DB        数据库路径，默认 .daily_state.db；设为 off 时不启用
+  FORCE_CHECKIN         强制重新签到：1 / all 表示全部站点，也可以写站点名，逗号分隔
+  <站点>_RESET_HOUR     站点每日重置的小时（北京时间），默认 0，例如 NODELOC_RESET_HOUR=8
+  DAILY_STATE_KEEP_DAYS 记录保留天数，默认 7
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# 北京时间没有夏令时，固定偏移即可，不依赖系统时区数据
+SHANGHAI_TZ = timezone(timedelta(hours=8), "Asia/Shanghai")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkins (
+    site       TEXT NOT NULL,
+    account    TEXT NOT NULL,
+    day        TEXT NOT NULL,
+    message    TEXT,
+    balance    TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (site, account, day)
+)
+"""
+
+
+def reset_hour(site: str) -> int:
+    value = os.getenv(f"{site.upper()}_RESET_HOUR", "0").strip()
+    try:
+        return max(0, min(23, int(value)))
+    except ValueError:
+        logger.warning(f"{site.upper()}_RESET_HOUR 配置无效: {value}，使用 0 点")
+        return 0
+
+
+def checkin_day(site: str, now: datetime = None) -> str:
+    """站点当前的签到日（北京时间，按站点的重置小时切换）"""
+    now = now or datetime.now(SHANGHAI_TZ)
+    return (now.astimezone(SHANGHAI_TZ) - timedelta(hours=reset_hour(site))).date().isoformat()
+
+
+def force_sites() -> set:
+    value = os.getenv("FORCE_CHECKIN", "").strip().lower()
+    if value in ("1", "true", "all"):
+        return {"*"}
+    return {s.strip() for s in value.split(",") if s.strip()}
+
+
+def _account_key(site: str, account: str) -> str:
+    # 只保存哈希，不在数据库中暴露账号
+    return hashlib.sha256(f"{site}:{account}".encode("utf-8")).hexdigest()[:32]
+
+
+class DailyState:
+    def __init__(self, path: str = ".daily_state.db", keep_days: float = 7):
+        self.path = path
+        self.force = force_sites()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(SCHEMA)
+            self._conn.execute(
+                "DELETE FROM checkins WHERE updated_at < ?",
+                (time.time() - keep_days * 86400,)
+            )
+
+    def is_forced(self, site: str) -> bool:
+        return "*" in self.force or site in self.force
+
+    def get(self, site: str, account: str):
+        """返回当天的成功记录 {"message", "balance", "updated_at"}；没有记录或强制重签时返回 None"""
+        if self.is_forced(site):
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT message, balance, updated_at FROM checkins "
+                    "WHERE site = ? AND account = ? AND day = ?",
+                    (site, _account_key(site, account), checkin_day(site))
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取签到状态失败: {e}")
+            return None
+        if not row:
+            return None
+        return {"message": row[0], "balance": row[1], "updated_at": row[2]}
+
+    def mark_done(self, site: str, account: str, message: str = "", balance: str = "") -> None:
+        """记录当天已签到成功（包括"今日已签到"）"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkins (site, account, day, message, balance, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (site, _account_key(site, account), checkin_day(site),
+                     str(message or ""), str(balance or ""), time.time())
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"保存签到状态失败: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def state_from_env():
+    """根据环境变量创建状态记录；DAILY_STATE_DB=off 或数据库无法打开时返回 None"""
+    path = os.getenv("DAILY_STATE_DB", ".daily_state.db").strip()
+    if not path or path.lower() == "off":
+        return None
+    try:
+        keep_days = float(os.getenv("DAILY_STATE_KEEP_DAYS", "7"))
+    except ValueError:
+        keep_days = 7
+    try:
+        return DailyState(path, keep_days)
+    except sqlite3.Error as e:
+        logger.warning(f"无法打开签到状态数据库 {path}: {e}")
+        return None
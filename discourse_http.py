@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Discourse 站点的纯 HTTP 登录工具（MJJBOX / NodeLoc 共用）
+
+登录流程与前端一致：
+  1. GET  /session/csrf         获取 CSRF Token（同时下发会话 Cookie）
+  2. POST /session              提交用户名和密码
+  3. GET  /session/csrf         登录后 Token 会轮换，重新获取一次
+
+全程只用 requests.Session，不需要启动浏览器。
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiscourseLoginError(RuntimeError):
+    """HTTP 登录被拒绝（密码错误、需要二次验证、被 WAF 拦截等）"""
+
+
+def ajax_headers(csrf_token: str = "") -> dict:
+    headers = {
+        "Accept": "application/json",
+        "X-Requested-With": "XMLHttpRequest",
+    }
+    if csrf_token:
+        headers["X-CSRF-Token"] = csrf_token
+    return headers
+
+
+def fetch_csrf(session, base_url: str, timeout: int = 15) -> str:
+    """调用 /session/csrf 获取 CSRF Token"""
+    resp = session.get(f"{base_url}/session/csrf", headers=ajax_headers(), timeout=timeout)
+    if resp.status_code != 200:
+        raise DiscourseLoginError(f"获取 CSRF Token 失败，HTTP 状态码：{resp.status_code}")
+
+    try:
+        token = (resp.json().get("csrf") or "").strip()
+    except ValueError:
+        raise DiscourseLoginError("获取 CSRF Token 失败：响应不是 JSON（可能被防火墙拦截）")
+
+    if not token:
+        raise DiscourseLoginError("获取 CSRF Token 失败：响应中没有 csrf 字段")
+    return token
+
+
+def session_is_valid(session, base_url: str, timeout: int = 10) -> bool:
+    """/session/current.json 已登录返回 200，未登录返回 404"""
+    try:
+        resp = session.get(
+            f"{base_url}/session/current.json",
+            headers={"Accept": "application/json"},
+            timeout=timeout,
+        )
+    except Exception as e:
+        logger.warning(f"校验会话失败: {e}")
+        return False
+    return resp.status_code == 200
+
+
+def http_login(session, base_url: str, username: str, password: str, timeout: int = 15) -> str:
+    """
+    通过 /session 接口登录，成功后返回新的 CSRF Token。
+    登录被拒绝时抛出 DiscourseLoginError。
+    """
+    csrf_token = fetch_csrf(session, base_url, timeout)
+
+    resp = session.post(
+        f"{base_url}/session",
+        data={"login": username, "password": password},
+        headers=ajax_headers(csrf_token),
+        timeout=timeout,
+    )
+
+    if resp.status_code != 200:
+        raise DiscourseLoginError(f"HTTP 登录失败，HTTP 状态码：{resp.status_code}")
+
+    try:
+        data = resp.json()
+    except ValueError:
+        raise DiscourseLoginError("HTTP 登录失败：响应不是 JSON（可能被防火墙拦截）")
+
+    # 失败时返回 {"error": "..."}，需要二次验证时返回 second_factor 相关字段
+    if data.get("error"):
+        raise DiscourseLoginError(f"HTTP 登录失败：{data.get('error')}")
+    if data.get("second_factor_required") or data.get("security_key_enabled"):
+        raise DiscourseLoginError("HTTP 登录失败：账号开启了二次验证")
+
+    logger.info("HTTP 登录成功")
+    return fetch_csrf(session, base_url, timeout)
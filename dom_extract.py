@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+批量 DOM 提取
+
+逐个 find_elements + element.text 每次都是一次 WebDriver 往返，节点多时非常慢。
+这里用一次 execute_script 把需要的文本一次性取回，匹配和解析都在 Python 中完成。
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个 XPath 最多返回的节点数，避免超大页面一次传回过多数据
+MAX_NODES_PER_XPATH = 500
+
+XPATH_TEXTS_SCRIPT = """
+var xpaths = arguments[0];
+var limit = arguments[1];
+var result = {};
+for (var i = 0; i < xpaths.length; i++) {
+    var texts = [];
+    try {
+        var snapshot = document.evaluate(xpaths[i], document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var j = 0; j < snapshot.snapshotLength && texts.length < limit; j++) {
+            var node = snapshot.snapshotItem(j);
+            texts.push((node.innerText || node.textContent || '').trim());
+        }
+    } catch (e) {}
+    result[xpaths[i]] = texts;
+}
+return result;
+"""
+
+TABLE_ROWS_SCRIPT = """
+var rows = document.querySelectorAll(arguments[0]);
+var limit = arguments[1];
+var result = [];
+for (var i = 0; i < rows.length && i < limit; i++) {
+    var cells = rows[i].querySelectorAll('td');
+    var row = [];
+    for (var j = 0; j < cells.length; j++) {
+        var span = cells[j].querySelector('span');
+        var positive = cells[j].querySelector('.positive');
+        row.push({
+            text: (cells[j].innerText || '').trim(),
+            title: span ? span.getAttribute('title') : null,
+            positive: positive ? (positive.innerText || '').trim() : null
+        });
+    }
+    result.push(row);
+}
+return result;
+"""
+
+ELEMENT_TEXTS_SCRIPT = """
+var result = {};
+for (var i = 0; i < arguments[0].length; i++) {
+    var el = document.querySelector(arguments[0][i]);
+    result[arguments[0][i]] = el ? (el.innerText || el.textContent || '').trim() : null;
+}
+return result;
+"""
+
+
+def xpath_texts(driver, xpaths) -> dict:
+    """一次调用取回每个 XPath 匹配节点的文本：{xpath: [text, ...]}"""
+    try:
+        return driver.execute_script(XPATH_TEXTS_SCRIPT, list(xpaths), MAX_NODES_PER_XPATH) or {}
+    except Exception as e:
+        logger.warning(f"批量提取文本失败: {e}")
+        return {}
+
+
+def table_rows(driver, row_selector: str, limit: int = 200) -> list:
+    """
+    一次调用取回表格行：[[{"text", "title", "positive"}, ...], ...]
+    title 为单元格内第一个 span 的 title 属性，positive 为 .positive 元素的文本
+    """
+    try:
+        return driver.execute_script(TABLE_ROWS_SCRIPT, row_selector, limit) or []
+    except Exception as e:
+        logger.warning(f"批量提取表格失败: {e}")
+        return []
+
+
+def element_texts(driver, selectors) -> dict:
+    """一次调用取回多个 CSS 选择器第一个匹配元素的文本，未找到为 None"""
+    try:
+        return driver.execute_script(ELEMENT_TEXTS_SCRIPT, list(selectors)) or {}
+    except Exception as e:
+        logger.warning(f"批量提取文本失败: {e}")
+        return {}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+带连接池的 HTTP 客户端
+
+每次运行只创建一个 requests.Session，所有接口调用和通知共用：
+  - HTTPAdapter 连接池，保持 keep-alive，减少 TLS 握手
+  - GET 请求在 429 / 5xx / 连接错误时按指数退避自动重试（POST 不重试，避免重复提交）
+
+多账号顺序执行时，每个账号开始前调用 sync_driver_cookies / reset_cookies 切换 Cookie，
+连接池保持不变。
+"""
+
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def build_session(pool_size: int = 10, retries: int = 3, backoff: float = 0.5) -> requests.Session:
+    """创建带连接池和重试策略的 Session"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def reset_cookies(session: requests.Session) -> None:
+    """切换账号前清空 Cookie，保留连接池"""
+    session.cookies.clear()
+
+
+def sync_driver_cookies(session: requests.Session, driver) -> None:
+    """用浏览器当前的 Cookie 替换 Session 中的 Cookie"""
+    session.cookies.clear()
+    for c in driver.get_cookies():
+        try:
+            session.cookies.set(
+                c["name"], c["value"],
+                domain=c.get("domain", ""),
+                path=c.get("path", "/"),
+            )
+        except Exception:
+            continue
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Leaflow 接口直连签到
+
+签到页面点击按钮后实际是调用一个 XHR/fetch 接口，仪表板的余额也是通过接口加载的。
+浏览器模式运行时，页面中注入的脚本会记录这些请求；脚本从中识别出签到接口和余额接口，
+保存到本地文件。之后的运行直接用登录后的 Cookie 调用这两个接口，跳过两次页面渲染，
+结果也从 JSON 中精确读取。接口不可用时由调用方回退到页面方式；只有响应结构不符时才删除接口记录，
+网络错误、限流、未登录等情况下接口仍然有效，保留记录。
+
+环境变量：
+  LEAFLOW_API_MODE      auto（默认，已知接口时直连）/ off（始终使用页面方式）
+  LEAFLOW_API_CACHE     接口缓存文件，默认 .leaflow_api.json
+  LEAFLOW_CHECKIN_API   手动指定签到接口（POST）
+  LEAFLOW_BALANCE_API   手动指定余额接口（GET）
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from urllib.parse import unquote, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 在每个页面加载前注入：包装 fetch / XMLHttpRequest，记录请求和响应
+XHR_CAPTURE_SCRIPT = """
+(function () {
+    if (window.__capturedRequests) return;
+    window.__capturedRequests = [];
+    var record = function (method, url, status, body) {
+        try {
+            window.__capturedRequests.push({
+                method: (method || 'GET').toUpperCase(),
+                url: new URL(url, location.href).href,
+                status: status,
+                body: (body || '').slice(0, 4000)
+            });
+        } catch (e) {}
+    };
+    var origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function (input, init) {
+            var method = (init && init.method) || (input && input.method) || 'GET';
+            var url = (typeof input === 'string') ? input : (input && input.url);
+            return origFetch.apply(this, arguments).then(function (resp) {
+                resp.clone().text().then(function (text) {
+                    record(method, url, resp.status, text);
+                }).catch(function () {});
+                return resp;
+            });
+        };
+    }
+    var origOpen = XMLHttpRequest.prototype.open;
+    var origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__capture = {method: method, url: url};
+        return origOpen.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function () {
+        var xhr = this;
+        xhr.addEventListener('loadend', function () {
+            if (!xhr.__capture) return;
+            var body = '';
+            try { body = (xhr.responseType === '' || xhr.responseType === 'text') ? xhr.responseText : ''; } catch (e) {}
+            record(xhr.__capture.method, xhr.__capture.url, xhr.status, body);
+        });
+        return origSend.apply(this, arguments);
+    };
+})();
+"""
+
+# 只认明确的余额字段，"amount" / "money" 之类的通用字段在订单、流水等接口中也会出现
+BALANCE_KEYS = ("balance", "total_balance", "current_balance")
+MESSAGE_KEYS = ("message", "msg", "detail")
+# 非 2xx 响应中只有明确表示"今日已签到"的消息才算签到结果
+ALREADY_MARKERS = ("已签到", "已经签到", "重复签到", "already checked", "already signed")
+ALREADY_STATUSES = (400, 409, 422)
+# 响应体中表示成功的 code，其余视为错误码
+OK_CODES = (0, 200, "0", "200")
+# 请求未被处理（限流、未登录、CSRF 失效），接口本身仍然有效
+REJECT_STATUSES = (401, 403, 419, 429)
+
+# call_checkin 的失败类型
+CHECKIN_REJECTED = "rejected"    # 请求未被处理：连接失败、限流、未登录或接口明确返回失败，保留接口记录
+CHECKIN_UNCERTAIN = "uncertain"  # 请求可能已被处理：读取超时、5xx，重新签到前需要先确认签到状态
+CHECKIN_CHANGED = "changed"      # 响应结构不符：接口可能已变化，删除接口记录
+
+_cache_lock = threading.Lock()
+
+
+def api_mode_enabled() -> bool:
+    return os.getenv("LEAFLOW_API_MODE", "auto").strip().lower() != "off"
+
+
+def _cache_path() -> str:
+    return os.getenv("LEAFLOW_API_CACHE", ".leaflow_api.json")
+
+
+def load_endpoints() -> dict:
+    """读取已识别的接口，环境变量优先"""
+    endpoints = {}
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            endpoints = json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    if os.getenv("LEAFLOW_CHECKIN_API"):
+        endpoints["checkin"] = {"method": "POST", "url": os.getenv("LEAFLOW_CHECKIN_API")}
+    if os.getenv("LEAFLOW_BALANCE_API"):
+        endpoints["balance"] = {"method": "GET", "url": os.getenv("LEAFLOW_BALANCE_API")}
+    return endpoints
+
+
+def save_endpoint(name: str, method: str, url: str) -> None:
+    """记录识别出的接口（多线程运行时加锁读写）"""
+    with _cache_lock:
+        try:
+            with open(_cache_path(), "r", encoding="utf-8") as f:
+                endpoints = json.load(f)
+        except (FileNotFoundError, ValueError):
+            endpoints = {}
+
+        if endpoints.get(name) == {"method": method, "url": url}:
+            return
+        endpoints[name] = {"method": method, "url": url}
+        with open(_cache_path(), "w", encoding="utf-8") as f:
+            json.dump(endpoints, f, ensure_ascii=False, indent=2)
+    logger.info(f"已记录{name}接口: {method} {url}")
+
+
+def forget_endpoint(name: str) -> None:
+    """接口结构变化时删除记录，下次运行重新识别"""
+    with _cache_lock:
+        try:
+            with open(_cache_path(), "r", encoding="utf-8") as f:
+                endpoints = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if endpoints.pop(name, None) is not None:
+            with open(_cache_path(), "w", encoding="utf-8") as f:
+                json.dump(endpoints, f, ensure_ascii=False, indent=2)
+
+
+# ========== JSON 解析 ==========
+
+def _parse_json(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_key(data, keys):
+    """在嵌套的 dict / list 中查找第一个出现的 key，返回其值"""
+    if isinstance(data, dict):
+        for key in keys:
+            if key in data and not isinstance(data[key], (dict, list)):
+                return data[key]
+        for value in data.values():
+            found = find_key(value, keys)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for item in data:
+            found = find_key(item, keys)
+            if found is not None:
+                return found
+    return None
+
+
+def parse_checkin_response(data):
+    """从签到接口的 JSON 中取出结果消息，结构不符时返回 None"""
+    if not isinstance(data, dict):
+        return None
+    message = find_key(data, MESSAGE_KEYS)
+    if message is None:
+        return None
+    return str(message).strip() or None
+
+
+def is_already_checked_in(message) -> bool:
+    text = str(message or "").lower()
+    return any(marker in text for marker in ALREADY_MARKERS)
+
+
+def reports_failure(data) -> bool:
+    """响应体明确表示失败：success / ok 为 false，或 code 是错误码"""
+    if not isinstance(data, dict):
+        return False
+    if any(data.get(key) is False for key in ("success", "ok")):
+        return True
+    return "code" in data and data["code"] not in OK_CODES
+
+
+def checkin_message(status, data):
+    """
+    签到接口响应对应的结果消息：2xx 且响应体没有表示失败时返回消息；
+    响应体表示失败或非 2xx 时只接受明确的"今日已签到"消息，其余（限流、质询页、校验失败等）返回 None
+    """
+    message = parse_checkin_response(data)
+    if not message:
+        return None
+    ok_status = 200 <= (status or 0) < 300
+    if ok_status and not reports_failure(data):
+        return message
+    if (ok_status or status in ALREADY_STATUSES) and is_already_checked_in(message):
+        return message
+    return None
+
+
+def parse_balance_response(data):
+    """
+    从余额接口的 JSON 中取出余额，返回形如 "12.34元"，结构不符时返回 None。
+    只看顶层和 data 包装层，不深入列表（流水记录中的 balance 不是当前余额）
+    """
+    if not isinstance(data, dict):
+        return None
+    value = None
+    for scope in (data, data.get("data")):
+        if isinstance(scope, dict):
+            value = next((scope[k] for k in BALANCE_KEYS if k in scope and not isinstance(scope[k], (dict, list))), None)
+            if value is not None:
+                break
+    if value is None:
+        return None
+    numbers = re.findall(r'\d+\.?\d*', str(value))
+    if not numbers:
+        return None
+    return f"{numbers[0]}元"
+
+
+# ========== 浏览器内捕获 ==========
+
+def get_captured_requests(driver):
+    try:
+        return driver.execute_script("return window.__capturedRequests || [];") or []
+    except Exception:
+        return []
+
+
+def pick_checkin_request(captured, host="checkin.leaflow.net"):
+    """从点击签到后捕获的请求中找出签到接口：目标主机上的非 GET 请求，且响应是被接受的签到结果"""
+    for item in reversed(captured):
+        if item.get("method") == "GET" or host not in item.get("url", ""):
+            continue
+        message = checkin_message(item.get("status"), _parse_json(item.get("body")))
+        if message:
+            return item, message
+    return None, None
+
+
+def pick_balance_request(captured):
+    """
+    从仪表板加载时捕获的请求中找出包含余额字段的 GET 接口。
+    多个接口都带余额字段时，只接受唯一一个地址中含 balance 的；仍无法区分时不记录，返回 (None, None)
+    """
+    candidates = {}
+    for item in captured:
+        if item.get("method") != "GET" or item.get("status") != 200:
+            continue
+        balance = parse_balance_response(_parse_json(item.get("body")))
+        if balance:
+            candidates.setdefault(item.get("url", ""), (item, balance))
+
+    if len(candidates) > 1:
+        named = [url for url in candidates if "balance" in urlparse(url).path.lower()]
+        if len(named) != 1:
+            logger.warning(f"有 {len(candidates)} 个接口包含余额字段，无法确定余额接口，不记录")
+            return None, None
+        candidates = {named[0]: candidates[named[0]]}
+    if candidates:
+        return next(iter(candidates.values()))
+    return None, None
+
+
+# ========== 直连调用 ==========
+
+def build_session(cookies) -> requests.Session:
+    """用浏览器导出的 Cookie 构造会话，并带上 Laravel 风格的 XSRF 头"""
+    session = requests.Session()
+    session.headers.update({
+        "Accept": "application/json",
+        "X-Requested-With": "XMLHttpRequest",
+    })
+    for c in cookies:
+        session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        if c["name"] == "XSRF-TOKEN":
+            session.headers["X-XSRF-TOKEN"] = unquote(c["value"])
+    return session
+
+
+def call_checkin(session, endpoint):
+    """
+    直连签到接口，返回 (结果消息, None)；未确认签到结果时返回 (None, 失败类型)，
+    失败类型为 CHECKIN_REJECTED / CHECKIN_UNCERTAIN / CHECKIN_CHANGED
+    """
+    try:
+        resp = session.request(endpoint.get("method", "POST"), endpoint["url"], timeout=15)
+    except requests.ConnectTimeout as e:
+        logger.warning(f"签到接口连接失败: {e}")
+        return None, CHECKIN_REJECTED
+    except requests.RequestException as e:
+        # 连接建立后的超时或断开：服务端可能已经处理了签到
+        logger.warning(f"签到接口请求失败，签到结果未知: {e}")
+        return None, CHECKIN_UNCERTAIN
+
+    # 只接受 2xx；已签到时部分接口返回 4xx，只有消息明确表示已签到时才接受
+    data = _parse_json(resp.text)
+    message = checkin_message(resp.status_code, data)
+    if message is not None:
+        return message, None
+
+    logger.warning(f"签到接口返回 HTTP {resp.status_code}，未确认签到结果")
+    if resp.status_code >= 500:
+        return None, CHECKIN_UNCERTAIN
+    if resp.status_code in REJECT_STATUSES or parse_checkin_response(data):
+        # 限流、未登录，或结构正常但明确返回失败
+        return None, CHECKIN_REJECTED
+    return None, CHECKIN_CHANGED
+
+
+def call_balance(session, endpoint):
+    """直连余额接口，返回形如 "12.34元"；失败返回 None"""
+    try:
+        resp = session.get(endpoint["url"], timeout=15)
+    except requests.RequestException as e:
+        logger.warning(f"余额接口请求失败: {e}")
+        return None
+    if resp.status_code != 200:
+        return None
+    return parse_balance_response(_parse_json(resp.text))
@@ -3,26 +3,89 @@
 Leaflow 多账号自动签到脚本
 变量名：LEAFLOW_ACCOUNTS
 变量值：邮箱1:密码1,邮箱2:密码2,邮箱3:密码3
+并发数（可选）：LEAFLOW_MAX_WORKERS，默认 1
+接口直连（可选）：LEAFLOW_API_MODE=auto/off，默认 auto
+站点地址（可选）：LEAFLOW_BASE_URL、LEAFLOW_CHECKIN_URL，默认为正式站点
+账号文件（可选）：LEAFLOW_ACCOUNTS_FILE，JSONL / CSV，可加密，格式见 account_source.py
+分片运行（可选）：--shard i/n 只处理一部分账号，--merge 目录 合并各分片结果并发送汇总，见 sharding.py
+低内存模式（可选）：LOW_MEMORY=1，每个账号的浏览器内存峰值附在汇总中，见 memory_profile.py
 """
 
 import os
-import time
+import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-import requests
+from selenium.common.exceptions import TimeoutException
 from datetime import datetime
+from urllib.parse import urlparse
+from browser_pool import pool_from_env
+from resource_blocking import configure_options, apply_blocking, report_page
+from memory_profile import window_size, configure_low_memory, release_page, track_driver, summary_line, site_peaks
+from dom_extract import xpath_texts
+from page_ready import wait_until, wait_document_ready, wait_network_idle, wait_for_any
+from session_store import store_from_env, import_driver_cookies, export_driver_cookies
+from selector_cache import get_cache
+from run_metrics import metrics
+from daily_state import state_from_env
+from retry_queue import RetryQueue
+from rate_limiter import get_limiter
+from telegram_notify import TelegramDispatcher, LiveProgress
+from load_planner import plan_from_env
+from account_source import source_from_env, proxy_settings
+from sharding import parse_cli, select, write_results, merge_and_notify
+import leaflow_api
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+LEAFLOW_BASE_URL = os.getenv('LEAFLOW_BASE_URL', 'https://leaflow.net').rstrip('/')
+LEAFLOW_CHECKIN_URL = os.getenv('LEAFLOW_CHECKIN_URL', 'https://checkin.leaflow.net').rstrip('/')
+LEAFLOW_CHECKIN_HOST = urlparse(LEAFLOW_CHECKIN_URL).netloc
+# 浏览器池切换账号时需要清理的源（本地测试时两个地址可能同源）
+LEAFLOW_ORIGINS = list(dict.fromkeys(
+    "{0.scheme}://{0.netloc}".format(urlparse(url)) for url in (LEAFLOW_BASE_URL, LEAFLOW_CHECKIN_URL)
+))
+
+def create_driver(proxy=None):
+    """创建Chrome驱动，proxy 为账号单独配置的代理"""
+    chrome_options = Options()
+    
+    # GitHub Actions环境配置（HEADLESS=1 时本地也使用无头模式）
+    if os.getenv('GITHUB_ACTIONS') or os.getenv('HEADLESS') == '1':
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument(f'--window-size={window_size()}')
+    
+    # 通用配置
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    configure_options(chrome_options, "leaflow")
+    configure_low_memory(chrome_options)
+    if proxy:
+        chrome_options.add_argument(f'--proxy-server={proxy}')
+    
+    driver = webdriver.Chrome(options=chrome_options)
+    apply_blocking(driver, "leaflow")
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    
+    # 记录页面发出的接口请求，用于识别签到和余额接口
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": leaflow_api.XHR_CAPTURE_SCRIPT})
+    metrics.instrument_driver(driver)
+    get_limiter("leaflow").instrument_driver(driver)
+    return driver
+
 class LeaflowAutoCheckin:
-    def __init__(self, email, password):
+    def __init__(self, email, password, pool=None, session_store=None, proxy=None):
         self.email = email
         self.password = password
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -31,41 +94,59 @@ class LeaflowAutoCheckin:
         if not self.email or not self.password:
             raise ValueError("邮箱和密码不能为空")
         
+        # 使用单独代理的账号不能复用池中的浏览器
+        self.proxy = proxy
+        self.pool = pool if not proxy else None
+        self.session_store = session_store
+        self.api_endpoints = leaflow_api.load_endpoints() if leaflow_api.api_mode_enabled() else {}
+        self.api_session = None
+        # 签到结果是否经过确认（接口返回、按钮显示已签到、页面提示成功），只有确认的结果才记入每日状态
+        self.checkin_confirmed = False
+        # 签到接口请求可能已被服务端处理但没有拿到结果，页面签到前需要先确认状态
+        self.checkin_uncertain = False
+        self.selector_cache = get_cache()
         self.driver = None
+        self.rss_sampler = None
         self.setup_driver()
     
     def setup_driver(self):
-        """设置Chrome驱动选项"""
-        chrome_options = Options()
-        
-        # GitHub Actions环境配置
-        if os.getenv('GITHUB_ACTIONS'):
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-        
-        # 通用配置
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        """设置Chrome驱动，启用浏览器池时从池中获取"""
+        with metrics.phase("driver_startup"):
+            if self.pool:
+                self.driver = self.pool.acquire()
+            else:
+                self.driver = create_driver(self.proxy)
+        self.rss_sampler = track_driver(self.driver)
+    
+    def stop_sampling(self):
+        """在关闭或归还浏览器之前记录本账号的浏览器内存峰值"""
+        if self.rss_sampler:
+            self.rss_sampler.stop()
+            self.rss_sampler = None
+    
+    def close_driver(self, discard=False):
+        """关闭或归还Chrome驱动"""
+        if not self.driver:
+            return
+        self.stop_sampling()
+        if self.pool:
+            self.pool.release(self.driver, discard=discard)
+        else:
+            self.driver.quit()
+        self.driver = None
         
     def close_popup(self):
         """关闭初始弹窗"""
         try:
             logger.info("尝试关闭初始弹窗...")
-            time.sleep(3)  # 等待弹窗加载
+            wait_network_idle(self.driver, timeout=3)  # 等待弹窗加载，最多3秒
             
             # 尝试关闭弹窗
             try:
                 actions = ActionChains(self.driver)
                 actions.move_by_offset(10, 10).click().perform()
                 logger.info("已成功关闭弹窗")
-                time.sleep(2)
+                wait_network_idle(self.driver, timeout=2)
                 return True
             except:
                 pass
@@ -92,8 +173,9 @@ class LeaflowAutoCheckin:
         logger.info(f"开始登录流程")
         
         # 访问登录页面
-        self.driver.get("https://leaflow.net/login")
-        time.sleep(5)
+        self.driver.get(f"{LEAFLOW_BASE_URL}/login")
+        wait_document_ready(self.driver, timeout=5)
+        report_page(self.driver, "登录页")
         
         # 关闭弹窗
         self.close_popup()
@@ -102,9 +184,6 @@ class LeaflowAutoCheckin:
         try:
             logger.info("查找邮箱输入框...")
             
-            # 等待页面稳定
-            time.sleep(2)
-            
             # 尝试多种选择器找到邮箱输入框
             email_selectors = [
                 "input[type='text']",
@@ -116,23 +195,23 @@ class LeaflowAutoCheckin:
                 "input[name='username']"
             ]
             
-            email_input = None
-            for selector in email_selectors:
-                try:
-                    email_input = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"找到邮箱输入框")
-                    break
-                except:
-                    continue
-            
-            if not email_input:
+            # 所有选择器同时等待，最多5秒
+            hit = wait_for_any(
+                self.driver,
+                self.selector_cache.ordered("leaflow", "email_input", email_selectors),
+                timeout=5
+            )
+            if not hit:
                 raise Exception("找不到邮箱输入框")
             
+            logger.info(f"找到邮箱输入框")
+            self.selector_cache.record("leaflow", "email_input", hit['selector'])
+            email_input = hit['element']
+            
             # 清除并输入邮箱
             email_input.clear()
             email_input.send_keys(self.email)
             logger.info("邮箱输入完成")
-            time.sleep(2)
             
         except Exception as e:
             logger.error(f"输入邮箱时出错: {e}")
@@ -140,7 +219,6 @@ class LeaflowAutoCheckin:
             try:
                 self.driver.execute_script(f"document.querySelector('input[type=\"text\"], input[type=\"email\"]').value = '{self.email}';")
                 logger.info("通过JavaScript设置邮箱")
-                time.sleep(2)
             except:
                 raise Exception(f"无法输入邮箱: {e}")
         
@@ -156,7 +234,6 @@ class LeaflowAutoCheckin:
             password_input.clear()
             password_input.send_keys(self.password)
             logger.info("密码输入完成")
-            time.sleep(1)
             
         except TimeoutException:
             raise Exception("找不到密码输入框")
@@ -172,21 +249,17 @@ class LeaflowAutoCheckin:
                 "button[type='submit']"
             ]
             
-            login_btn = None
-            for selector in login_btn_selectors:
-                try:
-                    if selector.startswith("//"):
-                        login_btn = self.wait_for_element_clickable(By.XPATH, selector, 5)
-                    else:
-                        login_btn = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"找到登录按钮")
-                    break
-                except:
-                    continue
-            
-            if not login_btn:
+            hit = wait_for_any(
+                self.driver,
+                self.selector_cache.ordered("leaflow", "login_button", login_btn_selectors),
+                timeout=5
+            )
+            if not hit:
                 raise Exception("找不到登录按钮")
             
+            logger.info(f"找到登录按钮")
+            self.selector_cache.record("leaflow", "login_button", hit['selector'])
+            login_btn = hit['element']
             login_btn.click()
             logger.info("已点击登录按钮")
             
@@ -222,20 +295,117 @@ class LeaflowAutoCheckin:
             except Exception as e:
                 raise e
     
+    def restore_session(self):
+        """尝试用缓存的Cookie恢复登录状态，成功返回True"""
+        if not self.session_store:
+            return False
+        
+        cookies = self.session_store.load("leaflow", self.email)
+        if not cookies:
+            return False
+        
+        try:
+            logger.info("尝试使用缓存的会话...")
+            import_driver_cookies(self.driver, cookies)
+            self.driver.get(f"{LEAFLOW_BASE_URL}/dashboard")
+            wait_network_idle(self.driver, timeout=5)
+            report_page(self.driver, "仪表板")
+            
+            # 未被重定向到登录页即说明会话有效
+            if "login" not in self.driver.current_url:
+                logger.info("缓存会话有效，跳过登录")
+                return True
+        except Exception as e:
+            logger.warning(f"恢复缓存会话失败: {e}")
+        
+        logger.info("缓存会话已失效，重新登录")
+        self.session_store.delete("leaflow", self.email)
+        try:
+            self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            pass
+        return False
+    
+    def save_session(self):
+        """签到成功后刷新会话缓存"""
+        if not self.session_store:
+            return
+        try:
+            self.session_store.save("leaflow", self.email, export_driver_cookies(self.driver))
+            logger.info("会话缓存已更新")
+        except Exception as e:
+            logger.warning(f"保存会话缓存失败: {e}")
+    
+    def get_api_session(self):
+        """用浏览器当前的Cookie构造接口会话（每个账号只构造一次）"""
+        if self.api_session is None:
+            self.api_session = leaflow_api.build_session(export_driver_cookies(self.driver))
+            self.api_session.proxies.update(proxy_settings(self.proxy))
+            metrics.instrument_session(self.api_session)
+            get_limiter("leaflow").instrument_session(self.api_session)
+        return self.api_session
+    
+    def checkin_via_api(self):
+        """已识别签到接口时直接调用，返回结果消息；不可用时返回None"""
+        endpoint = self.api_endpoints.get('checkin')
+        if not endpoint:
+            return None
+        
+        logger.info("通过签到接口直接签到...")
+        message, failure = leaflow_api.call_checkin(self.get_api_session(), endpoint)
+        if message is None:
+            if failure == leaflow_api.CHECKIN_CHANGED:
+                logger.warning("签到接口返回结构变化，回退到页面签到")
+                leaflow_api.forget_endpoint('checkin')
+            elif failure == leaflow_api.CHECKIN_UNCERTAIN:
+                logger.warning("签到接口请求结果未知，先在签到页面确认签到状态")
+                self.checkin_uncertain = True
+            else:
+                logger.warning("签到接口暂不可用，回退到页面签到")
+            return None
+        
+        logger.info(f"签到接口返回: {message}")
+        self.checkin_confirmed = True
+        return message
+    
+    def get_balance_via_api(self):
+        """已识别余额接口时直接调用，返回余额；不可用时返回None"""
+        endpoint = self.api_endpoints.get('balance')
+        if not endpoint:
+            return None
+        
+        logger.info("通过余额接口获取余额...")
+        balance = leaflow_api.call_balance(self.get_api_session(), endpoint)
+        if balance is None:
+            logger.warning("余额接口不可用或返回结构变化，回退到仪表板页面")
+            leaflow_api.forget_endpoint('balance')
+            return None
+        
+        logger.info(f"找到余额: {balance}")
+        return balance
+    
     def get_balance(self):
         """获取当前账号的总余额"""
         try:
             logger.info("获取账号余额...")
             
             # 跳转到仪表板页面
-            self.driver.get("https://leaflow.net/dashboard")
-            time.sleep(3)
+            self.driver.get(f"{LEAFLOW_BASE_URL}/dashboard")
+            wait_network_idle(self.driver, timeout=3)
+            report_page(self.driver, "仪表板")
             
             # 等待页面加载
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             
+            # 优先从页面加载的余额接口响应中读取，并记录该接口
+            item, balance = leaflow_api.pick_balance_request(leaflow_api.get_captured_requests(self.driver))
+            if balance:
+                leaflow_api.save_endpoint('balance', item['method'], item['url'])
+                logger.info(f"找到余额: {balance}")
+                return balance
+            
             # 尝试多种选择器查找余额元素
             balance_selectors = [
                 "//*[contains(text(), '¥') or contains(text(), '￥') or contains(text(), '元')]",
@@ -246,22 +416,21 @@ class LeaflowAutoCheckin:
                 "//span[contains(@class, 'font-medium')]"
             ]
             
-            for selector in balance_selectors:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, selector)
-                    for element in elements:
-                        text = element.text.strip()
-                        # 查找包含数字和货币符号的文本
-                        if any(char.isdigit() for char in text) and ('¥' in text or '￥' in text or '元' in text):
-                            # 提取数字部分
-                            import re
-                            numbers = re.findall(r'\d+\.?\d*', text)
-                            if numbers:
-                                balance = numbers[0]
-                                logger.info(f"找到余额: {balance}元")
-                                return f"{balance}元"
-                except:
-                    continue
+            # 一次脚本调用取回所有候选节点的文本，再在本地匹配
+            ordered_selectors = self.selector_cache.ordered("leaflow", "balance", balance_selectors)
+            texts_by_selector = xpath_texts(self.driver, ordered_selectors)
+            
+            for selector in ordered_selectors:
+                for text in texts_by_selector.get(selector, []):
+                    # 查找包含数字和货币符号的文本
+                    if any(char.isdigit() for char in text) and ('¥' in text or '￥' in text or '元' in text):
+                        # 提取数字部分
+                        numbers = re.findall(r'\d+\.?\d*', text)
+                        if numbers:
+                            balance = numbers[0]
+                            logger.info(f"找到余额: {balance}元")
+                            self.selector_cache.record("leaflow", "balance", selector)
+                            return f"{balance}元"
             
             logger.warning("未找到余额信息")
             return "未知"
@@ -272,36 +441,23 @@ class LeaflowAutoCheckin:
     
     def wait_for_checkin_page_loaded(self, max_retries=3, wait_time=20):
         """等待签到页面完全加载，支持重试"""
+        # 检查页面是否包含签到相关元素
+        checkin_indicators = [
+            "button.checkin-btn",  # 优先使用这个选择器
+            "//button[contains(text(), '立即签到')]",
+            "//button[contains(text(), '已签到')]",
+            "//*[contains(text(), '每日签到')]",
+            "//*[contains(text(), '签到')]"
+        ]
+        
         for attempt in range(max_retries):
-            logger.info(f"等待签到页面加载，尝试 {attempt + 1}/{max_retries}，等待 {wait_time} 秒...")
-            time.sleep(wait_time)
+            logger.info(f"等待签到页面加载，尝试 {attempt + 1}/{max_retries}，最多等待 {wait_time} 秒...")
             
             try:
-                # 检查页面是否包含签到相关元素
-                checkin_indicators = [
-                    "button.checkin-btn",  # 优先使用这个选择器
-                    "//button[contains(text(), '立即签到')]",
-                    "//button[contains(text(), '已签到')]",
-                    "//*[contains(text(), '每日签到')]",
-                    "//*[contains(text(), '签到')]"
-                ]
-                
-                for indicator in checkin_indicators:
-                    try:
-                        if indicator.startswith("//"):
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.XPATH, indicator))
-                            )
-                        else:
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, indicator))
-                            )
-                        
-                        if element.is_displayed():
-                            logger.info(f"找到签到页面元素")
-                            return True
-                    except:
-                        continue
+                # 所有签到相关元素同时等待，任意一个出现即返回
+                if wait_for_any(self.driver, checkin_indicators, timeout=wait_time):
+                    logger.info(f"找到签到页面元素")
+                    return True
                 
                 logger.warning(f"第 {attempt + 1} 次尝试未找到签到按钮，继续等待...")
                 
@@ -310,13 +466,13 @@ class LeaflowAutoCheckin:
         
         return False
     
-    def find_and_click_checkin_button(self):
-        """查找并点击签到按钮 - 处理已签到状态"""
+    def find_and_click_checkin_button(self, click=True):
+        """查找并点击签到按钮 - 处理已签到状态；click=False 时只检查状态，按钮可点击时返回 "not_checked_in" """
         logger.info("查找签到按钮...")
         
         try:
-            # 先等待页面可能的重载
-            time.sleep(5)
+            # 先等待页面可能的重载，最多5秒
+            wait_network_idle(self.driver, timeout=5)
             
             # 使用和单账号成功时相同的选择器
             checkin_selectors = [
@@ -327,36 +483,31 @@ class LeaflowAutoCheckin:
                 "button[name='checkin']"
             ]
             
-            for selector in checkin_selectors:
-                try:
-                    if selector.startswith("//"):
-                        checkin_btn = WebDriverWait(self.driver, 15).until(
-                            EC.presence_of_element_located((By.XPATH, selector))
-                        )
-                    else:
-                        checkin_btn = WebDriverWait(self.driver, 15).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                        )
-                    
-                    if checkin_btn.is_displayed():
-                        # 检查按钮文本，如果包含"已签到"则说明今天已经签到过了
-                        btn_text = checkin_btn.text.strip()
-                        if "已签到" in btn_text:
-                            logger.info("伙计，今日你已经签到过了！")
-                            return "already_checked_in"
-                        
-                        # 检查按钮是否可用
-                        if checkin_btn.is_enabled():
-                            logger.info(f"找到并点击立即签到按钮")
-                            checkin_btn.click()
-                            return True
-                        else:
-                            logger.info("签到按钮不可用，可能已经签到过了")
-                            return "already_checked_in"
-                        
-                except Exception as e:
-                    logger.debug(f"选择器未找到按钮: {e}")
-                    continue
+            # 所有选择器同时等待，最坏耗时15秒而不是每个选择器15秒之和
+            hit = wait_for_any(
+                self.driver,
+                self.selector_cache.ordered("leaflow", "checkin_button", checkin_selectors),
+                timeout=15
+            )
+            
+            if hit:
+                self.selector_cache.record("leaflow", "checkin_button", hit['selector'])
+                
+                # 检查按钮文本，如果包含"已签到"则说明今天已经签到过了
+                if "已签到" in hit['text']:
+                    logger.info("伙计，今日你已经签到过了！")
+                    return "already_checked_in"
+                
+                # 检查按钮是否可用
+                if hit['enabled'] and not click:
+                    return "not_checked_in"
+                if hit['enabled']:
+                    logger.info(f"找到并点击立即签到按钮")
+                    hit['element'].click()
+                    return True
+                else:
+                    logger.info("签到按钮不可用，可能已经签到过了")
+                    return "already_checked_in"
             
             logger.error("找不到签到按钮")
             return False
@@ -370,23 +521,41 @@ class LeaflowAutoCheckin:
         logger.info("跳转到签到页面...")
         
         # 跳转到签到页面
-        self.driver.get("https://checkin.leaflow.net")
+        self.driver.get(LEAFLOW_CHECKIN_URL)
         
         # 等待签到页面加载（最多重试3次，每次等待20秒）
-        if not self.wait_for_checkin_page_loaded(max_retries=3, wait_time=20):
+        with metrics.phase("checkin_page_wait"):
+            page_loaded = self.wait_for_checkin_page_loaded(max_retries=3, wait_time=20)
+        if not page_loaded:
             raise Exception("签到页面加载失败，无法找到签到相关元素")
+        report_page(self.driver, "签到页")
         
-        # 查找并点击立即签到按钮
-        checkin_result = self.find_and_click_checkin_button()
+        # 查找并点击立即签到按钮；签到接口请求结果未知时只确认状态，不再点击
+        checkin_result = self.find_and_click_checkin_button(click=not self.checkin_uncertain)
         
-        if checkin_result == "already_checked_in":
+        if checkin_result == "not_checked_in":
+            # 接口请求可能仍在处理，此时点击可能重复签到，交给重试在稍后确认
+            raise Exception("签到接口请求结果未知，页面尚未显示已签到，稍后重试")
+        elif checkin_result == "already_checked_in":
+            self.checkin_confirmed = True
             return "今日已签到"
         elif checkin_result is True:
             logger.info("已点击立即签到按钮")
-            time.sleep(5)  # 等待签到结果
+            wait_network_idle(self.driver, timeout=5)  # 等待签到请求完成，最多5秒
             
-            # 获取签到结果
-            result_message = self.get_checkin_result()
+            # 优先从签到接口的响应中读取结果，并记录该接口
+            item, message = leaflow_api.pick_checkin_request(
+                leaflow_api.get_captured_requests(self.driver), host=LEAFLOW_CHECKIN_HOST
+            )
+            if message:
+                leaflow_api.save_endpoint('checkin', item['method'], item['url'])
+                self.checkin_confirmed = True
+                return message
+            
+            # 获取签到结果，页面上明确提示成功或已签到时才算确认
+            with metrics.phase("result_scrape"):
+                result_message = self.get_checkin_result()
+            self.checkin_confirmed = "成功" in result_message or leaflow_api.is_already_checked_in(result_message)
             return result_message
         else:
             raise Exception("找不到立即签到按钮或按钮不可点击")
@@ -394,9 +563,6 @@ class LeaflowAutoCheckin:
     def get_checkin_result(self):
         """获取签到结果消息"""
         try:
-            # 给页面一些时间显示结果
-            time.sleep(3)
-            
             # 尝试查找各种可能的成功消息元素
             success_selectors = [
                 ".alert-success",
@@ -411,15 +577,22 @@ class LeaflowAutoCheckin:
                 ".notification"    # 通知
             ]
             
-            for selector in success_selectors:
-                try:
-                    element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if element.is_displayed():
-                        text = element.text.strip()
-                        if text:
-                            return text
-                except:
-                    continue
+            def find_message(driver):
+                for selector in success_selectors:
+                    try:
+                        element = driver.find_element(By.CSS_SELECTOR, selector)
+                        if element.is_displayed():
+                            text = element.text.strip()
+                            if text:
+                                return text
+                    except:
+                        continue
+                return None
+            
+            # 结果消息出现即返回，最多等待3秒
+            text = wait_until(self.driver, find_message, timeout=3)
+            if text:
+                return text
             
             # 如果没有找到特定元素，检查页面文本
             page_text = self.driver.find_element(By.TAG_NAME, "body").text
@@ -447,39 +620,77 @@ class LeaflowAutoCheckin:
             return f"获取签到结果时出错: {str(e)}"
     
     def run(self):
-        """单个账号执行流程"""
+        """单个账号执行流程，返回 (是否成功, 结果, 余额, 签到结果是否经过确认)"""
         try:
             logger.info(f"开始处理账号")
             
-            # 登录
-            if self.login():
-                # 签到
-                result = self.checkin()
+            # 优先使用缓存会话，失效时再登录
+            with metrics.phase("login"):
+                logged_in = self.restore_session() or self.login()
+            
+            if logged_in:
+                # 低内存模式下阶段之间回到空白页，下一阶段会自己打开需要的页面
+                release_page(self.driver)
+                
+                # 签到：优先直连接口，不可用时回退到页面
+                with metrics.phase("checkin"):
+                    result = self.checkin_via_api() or self.checkin()
+                release_page(self.driver)
                 
                 # 获取余额
-                balance = self.get_balance()
+                with metrics.phase("balance"):
+                    balance = self.get_balance_via_api() or self.get_balance()
+                
+                # 刷新会话缓存
+                self.save_session()
                 
                 logger.info(f"签到结果: {result}, 余额: {balance}")
-                return True, result, balance
+                return True, result, balance, self.checkin_confirmed
             else:
                 raise Exception("登录失败")
                 
         except Exception as e:
             error_msg = f"自动签到失败: {str(e)}"
             logger.error(error_msg)
-            return False, error_msg, "未知"
+            # 出错的浏览器可能状态异常，不再放回池中
+            self.close_driver(discard=True)
+            return False, error_msg, "未知", False
         
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.close_driver()
 
 class MultiAccountManager:
     """多账号管理器 - 简化配置版本"""
     
-    def __init__(self):
+    def __init__(self, shard=None):
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
         self.accounts = self.load_accounts()
+        # 分片模式：只处理本分片的账号，记录它们在完整列表中的序号，合并时按原顺序排列
+        self.shard = shard
+        self.shard_indexes = None
+        if shard:
+            self.accounts, self.shard_indexes = select(self.accounts, "leaflow", "email", shard)
+        self.max_workers = self.load_max_workers()
+        self.pool = pool_from_env(create_driver, origins=LEAFLOW_ORIGINS, default_size=self.max_workers)
+        self.session_store = store_from_env()
+        self.daily_state = state_from_env()
+        self.limiter = get_limiter("leaflow")
+        self.notifier = TelegramDispatcher.from_env(parse_mode="HTML")
+        # 进度模式：已完成账号的结果，按账号顺序存放，未完成的为 None
+        self.progress_results = [None] * len(self.accounts)
+        # 分片模式下由合并步骤统一发送汇总，不发送进度消息
+        self.progress = LiveProgress.from_env(self.notifier, self.render_progress) if not shard else None
+    
+    def load_max_workers(self):
+        """从环境变量 LEAFLOW_MAX_WORKERS 读取并发数，默认 1（逐个执行）"""
+        value = os.getenv('LEAFLOW_MAX_WORKERS', '1').strip()
+        try:
+            workers = int(value)
+        except ValueError:
+            logger.warning(f"LEAFLOW_MAX_WORKERS 配置无效: {value}，使用默认值 1")
+            return 1
+        return max(1, min(workers, len(self.accounts)))
     
     def load_accounts(self):
         """从环境变量加载多账号信息，支持冒号分隔多账号和单账号"""
@@ -487,6 +698,13 @@ class MultiAccountManager:
         
         logger.info("开始加载账号配置...")
         
+        # 方法0: 账号文件（JSONL / CSV，可加密），逐行读取，适合大量账号
+        source = source_from_env("leaflow", "email")
+        if source is not None:
+            if not source:
+                raise ValueError(f"账号文件 {source.path} 中没有有效的 leaflow 账号")
+            return source
+        
         # 方法1: 冒号分隔多账号格式
         accounts_str = os.getenv('LEAFLOW_ACCOUNTS', '').strip()
         if accounts_str:
@@ -541,79 +759,172 @@ class MultiAccountManager:
         
         raise ValueError("未找到有效的账号配置")
     
+    @staticmethod
+    def build_summary(results):
+        """按照指定模板格式构建通知，返回 (标题, 各账号内容)"""
+        success_count = sum(1 for _, success, _, _ in results if success)
+        total_count = len(results)
+        current_date = datetime.now().strftime("%Y/%m/%d")
+        
+        header = f"🎁 Leaflow自动签到通知\n"
+        header += f"📊 成功: {success_count}/{total_count}\n"
+        header += f"📅 签到时间：{current_date}\n"
+        
+        blocks = []
+        for email, success, result, balance in results:
+            # 隐藏邮箱部分字符以保护隐私
+            masked_email = email[:3] + "***" + email[email.find("@"):]
+            
+            if success:
+                status = "✅"
+                block = f"账号：{masked_email}\n"
+                block += f"{status}  {result}！\n"
+                block += f"💰  当前总余额：{balance}。"
+            else:
+                status = "❌"
+                block = f"账号：{masked_email}\n"
+                block += f"{status}  {result}"
+            blocks.append(block)
+        
+        return header, blocks
+    
+    def render_progress(self):
+        """进度消息：已完成账号的汇总 + 进度"""
+        done = [r for r in self.progress_results if r]
+        header, blocks = self.build_summary(done)
+        header += f"⏳ 进度：{len(done)}/{len(self.accounts)}\n"
+        return header, blocks
+    
     def send_notification(self, results):
-        """发送汇总通知到Telegram - 按照指定模板格式"""
-        if not self.telegram_bot_token or not self.telegram_chat_id:
+        """发送汇总通知到Telegram - 超长时按账号拆分，后台发送；进度模式下编辑进度消息为最终汇总"""
+        if self.shard:
+            # 分片模式只保存本分片的结果，由 --merge 合并后统一发送
+            write_results("leaflow", self.shard, zip(self.shard_indexes, results), peaks=site_peaks("leaflow"))
+            return
+        
+        if not self.notifier:
             logger.info("Telegram配置未设置，跳过通知")
             return
         
-        try:
-            # 构建通知消息
-            success_count = sum(1 for _, success, _, _ in results if success)
-            total_count = len(results)
-            current_date = datetime.now().strftime("%Y/%m/%d")
-            
-            message = f"🎁 Leaflow自动签到通知\n"
-            message += f"📊 成功: {success_count}/{total_count}\n"
-            message += f"📅 签到时间：{current_date}\n\n"
-            
-            for email, success, result, balance in results:
-                # 隐藏邮箱部分字符以保护隐私
-                masked_email = email[:3] + "***" + email[email.find("@"):]
-                
-                if success:
-                    status = "✅"
-                    message += f"账号：{masked_email}\n"
-                    message += f"{status}  {result}！\n"
-                    message += f"💰  当前总余额：{balance}。\n\n"
-                else:
-                    status = "❌"
-                    message += f"账号：{masked_email}\n"
-                    message += f"{status}  {result}\n\n"
-            
-            url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
-            data = {
-                "chat_id": self.telegram_chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            
-            response = requests.post(url, data=data, timeout=10)
-            if response.status_code == 200:
-                logger.info("Telegram汇总通知发送成功")
-            else:
-                logger.error(f"Telegram通知发送失败: {response.text}")
-                
-        except Exception as e:
-            logger.error(f"发送Telegram通知时出错: {e}")
+        header, blocks = self.build_summary(results)
+        header += summary_line(site_peaks("leaflow"))
+        if self.progress:
+            self.progress.finish(header, blocks)
+        else:
+            self.notifier.send_summary(header, blocks)
     
-    def run_all(self):
-        """运行所有账号的签到流程"""
-        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务")
-        
-        results = []
+    def process_account(self, index, account):
+        """处理单个账号，返回 (邮箱, 是否成功, 结果, 余额)"""
+        logger.info(f"处理第 {index}/{len(self.accounts)} 个账号")
         
-        for i, account in enumerate(self.accounts, 1):
-            logger.info(f"处理第 {i}/{len(self.accounts)} 个账号")
-            
+        with metrics.account("leaflow", account['email']):
+            # 今日已签到成功的账号直接使用记录，不启动浏览器
+            record = self.daily_state.get("leaflow", account['email']) if self.daily_state else None
+            if record:
+                logger.info("今日已完成签到，跳过")
+                metrics.count("skipped")
+                metrics.set_outcome(True)
+                return self.record_progress(
+                    index, (account['email'], True, record['message'] or "今日已签到", record['balance'] or "未知")
+                )
+            
+            # 按站点限速开始处理，所有并发线程共用同一个限速器
+            self.limiter.acquire_account()
             try:
-                auto_checkin = LeaflowAutoCheckin(account['email'], account['password'])
-                success, result, balance = auto_checkin.run()
-                results.append((account['email'], success, result, balance))
-                
-                # 在账号之间添加间隔，避免请求过于频繁
-                if i < len(self.accounts):
-                    wait_time = 5
-                    logger.info(f"等待{wait_time}秒后处理下一个账号...")
-                    time.sleep(wait_time)
-                    
+                auto_checkin = LeaflowAutoCheckin(
+                    account['email'], account['password'],
+                    pool=self.pool, session_store=self.session_store,
+                    proxy=account.get('proxy')
+                )
+                success, result, balance, confirmed = auto_checkin.run()
             except Exception as e:
                 error_msg = f"处理账号时发生异常: {str(e)}"
                 logger.error(error_msg)
-                results.append((account['email'], False, error_msg, "未知"))
+                success, result, balance, confirmed = False, error_msg, "未知", False
+                # 与原来一样，出现异常的账号之后不等待，直接处理下一个账号
+                self.limiter.refund_account()
+            metrics.set_outcome(success)
+            
+            if success:
+                self.limiter.on_success()
+            # 只记录确认过的结果，未确认的账号下次运行时重新检查
+            if confirmed and self.daily_state:
+                self.daily_state.mark_done("leaflow", account['email'], result, balance)
+            elif success:
+                logger.warning("签到结果未确认，不记入今日状态")
+        
+        return self.record_progress(index, (account['email'], success, result, balance))
+    
+    def record_progress(self, index, outcome):
+        """记录第 index 个账号的结果并更新进度消息，原样返回结果"""
+        self.progress_results[index - 1] = outcome
+        if self.progress:
+            self.progress.update()
+        return outcome
+    
+    def dispatch_order(self):
+        """按处理顺序产出 (序号, 账号)：启用计划时每个账号到了分配的时间才产出，否则按配置顺序"""
+        plan = plan_from_env("leaflow")
+        if not plan:
+            return enumerate(self.accounts)
+        
+        def done_today(email):
+            return bool(self.daily_state and self.daily_state.get("leaflow", email))
+        
+        emails = [account['email'] for account in self.accounts]
+        return ((i, self.accounts[i]) for i, _ in plan.iter_due(emails, ready=done_today))
+    
+    def retry_failed(self, results):
+        """把第一轮失败的账号放入重试队列，重试结果直接替换 results 中对应的项"""
+        queue = RetryQueue.from_env()
+        for index, (_, success, result, _) in enumerate(results):
+            if not success:
+                queue.push(index, result, label=f"第 {index + 1} 个账号")
+        
+        for index, attempt in queue.drain():
+            logger.info(f"第 {attempt} 次尝试第 {index + 1} 个账号")
+            results[index] = self.process_account(index + 1, self.accounts[index])
+            if not results[index][1]:
+                queue.push(index, results[index][2], label=f"第 {index + 1} 个账号")
+    
+    def run_all(self):
+        """运行所有账号的签到流程"""
+        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务，并发数: {self.max_workers}")
+        if self.progress:
+            self.progress.start()
         
-        # 发送汇总通知
-        self.send_notification(results)
+        try:
+            if self.max_workers <= 1:
+                results = [None] * len(self.accounts)
+                # 账号之间的间隔由限速器控制
+                for i, account in self.dispatch_order():
+                    results[i] = self.process_account(i + 1, account)
+            else:
+                # 并发模式：每个线程从浏览器池获取浏览器，结果按原始账号顺序收集，开始速率由限速器控制
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {
+                        i: executor.submit(self.process_account, i + 1, account)
+                        for i, account in self.dispatch_order()
+                    }
+                    results = [futures[i].result() for i in range(len(self.accounts))]
+            
+            # 失败的账号按退避间隔重试，不重复处理已成功的账号
+            self.retry_failed(results)
+            
+            # 发送汇总通知（后台发送，与关闭浏览器等收尾工作同时进行）
+            self.send_notification(results)
+        finally:
+            if self.pool:
+                self.pool.close()
+            if self.daily_state:
+                self.daily_state.close()
+        
+        # 输出耗时统计
+        metrics.write_reports()
+        
+        # 等待通知发送完成
+        if self.notifier:
+            self.notifier.close()
         
         # 返回总体结果
         success_count = sum(1 for _, success, _, _ in results if success)
@@ -621,8 +932,13 @@ class MultiAccountManager:
 
 def main():
     """主函数"""
+    args = parse_cli()
+    if args.merge:
+        merge_and_notify("leaflow", args.merge, MultiAccountManager.build_summary, parse_mode="HTML")
+        exit(0)
+    
     try:
-        manager = MultiAccountManager()
+        manager = MultiAccountManager(shard=args.shard)
         overall_success, detailed_results = manager.run_all()
         
         if overall_success:
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+签到负载分散计划
+
+原来整个站点在窗口内随机选一个时间点，所有账号集中在几分钟内登录，容易触发限流。
+这里给每个账号在当天的窗口内分配各自的时间点：窗口按账号数等分，每个账号在自己的区间内随机，
+相邻账号之间至少间隔 PLAN_MIN_SPACING 秒。计划按天保存，重跑时沿用同一份计划，
+到点的账号才开始处理；同时处理的账号数仍由各站点的并发数（如 LEAFLOW_MAX_WORKERS）限制。
+常驻进程收到停止信号时（见 use_stop_event）结束等待，剩余账号不再处理。
+
+  - 运行开始时已经在窗口内：只在窗口剩余部分分配
+  - 运行开始时窗口已过（例如手动触发）：不等待，立即处理
+  - 当天已签到的账号不等待，直接交给脚本跳过
+
+环境变量：
+  CHECKIN_PLAN        设为 1 时启用
+  DAEMON_WINDOW       每日签到窗口（北京时间，距 0 点的分钟数），默认 60-180
+  <站点>_WINDOW       单个站点的窗口，例如 NODELOC_WINDOW=480-540
+  PLAN_MIN_SPACING    相邻账号之间的最小间隔（秒），默认 30
+  PLAN_FILE           计划保存路径，默认 .checkin_plan.json
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from daily_state import SHANGHAI_TZ
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = "60-180"
+
+# 所有站点共用同一个计划文件，按路径加锁，读-改-写不会覆盖其他站点的计划
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+# 计划等待使用的停止信号，常驻进程通过 use_stop_event 换成自己的
+_stop_event = threading.Event()
+
+
+def use_stop_event(event) -> None:
+    """之后创建的计划在 event 被设置时结束等待（常驻进程启动时调用）"""
+    global _stop_event
+    _stop_event = event
+
+
+def parse_window(site: str):
+    """站点的每日签到窗口 (start_minute, end_minute)"""
+    value = os.getenv(f"{site.upper()}_WINDOW", "").strip() or os.getenv("DAEMON_WINDOW", DEFAULT_WINDOW).strip()
+    try:
+        start, end = (int(v) for v in value.split("-", 1))
+        if end <= start:
+            raise ValueError
+        return start, end
+    except ValueError:
+        logger.warning(f"[{site}] 签到窗口配置无效: {value}，使用默认值 {DEFAULT_WINDOW}")
+        start, end = DEFAULT_WINDOW.split("-")
+        return int(start), int(end)
+
+
+def window_bounds(day, start_minute: int, end_minute: int):
+    """day 当天窗口的起止时间（北京时间）"""
+    base = datetime(day.year, day.month, day.day, tzinfo=SHANGHAI_TZ)
+    return base + timedelta(minutes=start_minute), base + timedelta(minutes=end_minute)
+
+
+def spread_slots(count: int, start: float, end: float, min_spacing: float, rng=random, taken=()):
+    """
+    在 [start, end]（时间戳）内给 count 个账号分配时间点：等分区间，在各自区间内随机，
+    保证相邻两个至少间隔 min_spacing。窗口放不下时按 min_spacing 依次排开，会超出窗口结束时间。
+    taken 为已经分配给其他账号的时间点，新的时间点与它们同样至少间隔 min_spacing。
+    """
+    if count <= 0:
+        return []
+    if taken:
+        return _spread_around(count, start, end, min_spacing, rng, sorted(taken))
+    step = (end - start) / count
+    if step < min_spacing:
+        logger.warning(f"窗口内放不下 {count} 个账号（最小间隔 {min_spacing:.0f} 秒），计划会超出窗口")
+        return [start + i * min_spacing for i in range(count)]
+    # 每个点落在所在区间的前 (step - min_spacing) 部分，相邻两点的间隔不小于 min_spacing
+    jitter = step - min_spacing
+    return [start + i * step + rng.uniform(0, jitter) for i in range(count)]
+
+
+def free_intervals(start: float, end: float, taken, min_spacing: float):
+    """[start, end] 中与 taken（已排序）每个时间点都至少相距 min_spacing 的区间"""
+    intervals = []
+    cursor = start
+    for t in taken:
+        if t - min_spacing > cursor:
+            intervals.append((cursor, min(t - min_spacing, end)))
+        cursor = max(cursor, t + min_spacing)
+        if cursor >= end:
+            break
+    if cursor < end:
+        intervals.append((cursor, end))
+    return [(a, b) for a, b in intervals if b > a]
+
+
+def _spread_around(count: int, start: float, end: float, min_spacing: float, rng, taken):
+    """避开已分配的时间点：账号逐个分给平均间隔最大的空闲区间，再在各区间内用 spread_slots 分配"""
+    intervals = free_intervals(start, end, taken, min_spacing)
+    # spread_slots 在长度为 L 的区间内最多放 L // min_spacing 个点而不超出区间
+    capacity = [int((b - a) // min_spacing) if min_spacing else count for a, b in intervals]
+    if sum(capacity) < count:
+        logger.warning(f"窗口剩余部分放不下 {count} 个新账号（最小间隔 {min_spacing:.0f} 秒），排在已有计划之后，会超出窗口")
+        base = max(start, taken[-1] + min_spacing)
+        return [base + i * min_spacing for i in range(count)]
+
+    assigned = [0] * len(intervals)
+    for _ in range(count):
+        j = max(
+            (j for j in range(len(intervals)) if assigned[j] < capacity[j]),
+            key=lambda j: (intervals[j][1] - intervals[j][0]) / (assigned[j] + 1),
+        )
+        assigned[j] += 1
+
+    result = []
+    for (a, b), n in zip(intervals, assigned):
+        result.extend(spread_slots(n, a, b, min_spacing, rng))
+    return result
+
+
+def _file_lock(path: str):
+    with _file_locks_guard:
+        return _file_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _account_key(site: str, account: str) -> str:
+    # 与每日状态一致，只保存哈希
+    return hashlib.sha256(f"{site}:{account}".encode("utf-8")).hexdigest()[:32]
+
+
+class DailyPlan:
+    def __init__(self, site: str, start_minute: int, end_minute: int, min_spacing: float = 30.0,
+                 path: str = ".checkin_plan.json", stop_event=None):
+        self.site = site
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+        self.min_spacing = min_spacing
+        self.path = path
+        self.stop_event = stop_event or threading.Event()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, data: dict) -> None:
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"保存签到计划失败: {e}")
+
+    def slots(self, accounts, now: float = None) -> dict:
+        """
+        返回 {账号: 计划时间戳}。当天已有计划时沿用，新增的账号在窗口剩余部分补充分配；
+        窗口已经结束时返回空字典（不等待）。
+        """
+        now = time.time() if now is None else now
+        today = datetime.fromtimestamp(now, SHANGHAI_TZ).date()
+        window_start, window_end = (t.timestamp() for t in window_bounds(today, self.start_minute, self.end_minute))
+        if now >= window_end:
+            logger.info(f"[{self.site}] 今日签到窗口已过，不按计划等待")
+            return {}
+
+        with _file_lock(self.path):
+            data = self._load()
+            plan = data.get(self.site, {})
+            if plan.get("day") != today.isoformat() or plan.get("window") != [self.start_minute, self.end_minute]:
+                plan = {"day": today.isoformat(), "window": [self.start_minute, self.end_minute], "slots": {}}
+
+            keys = {account: _account_key(self.site, account) for account in accounts}
+            missing = [account for account in accounts if keys[account] not in plan["slots"]]
+            if missing:
+                # 打乱顺序，账号不会每天都排在同一个位置
+                random.shuffle(missing)
+                start = max(window_start, now)
+                # 与当天已分配的账号同样保持最小间隔
+                taken = list(plan["slots"].values())
+                for account, slot in zip(missing, spread_slots(len(missing), start, window_end, self.min_spacing, taken=taken)):
+                    plan["slots"][keys[account]] = round(slot, 1)
+                data[self.site] = plan
+                self._save(data)
+                logger.info(
+                    f"[{self.site}] 为 {len(missing)} 个账号分配签到时间："
+                    f"{datetime.fromtimestamp(start, SHANGHAI_TZ):%H:%M:%S} ~ "
+                    f"{datetime.fromtimestamp(window_end, SHANGHAI_TZ):%H:%M:%S}"
+                )
+
+            return {account: plan["slots"][keys[account]] for account in accounts}
+
+    def iter_due(self, accounts, ready=None):
+        """
+        按计划时间依次产出 (序号, 账号)，没到时间就等待。
+        ready(账号) 为 True 的账号（例如当天已签到）不等待，最先产出；等待中 stop_event 被设置时结束，不再产出。
+        """
+        accounts = list(accounts)
+        done = {i for i, account in enumerate(accounts) if ready and ready(account)}
+        for i in sorted(done):
+            yield i, accounts[i]
+
+        pending = [i for i in range(len(accounts)) if i not in done]
+        slots = self.slots([accounts[i] for i in pending])
+        pending.sort(key=lambda i: slots.get(accounts[i], 0))
+        for n, i in enumerate(pending):
+            wait = slots.get(accounts[i], 0) - time.time()
+            if wait > 0:
+                logger.info(
+                    f"[{self.site}] 第 {i + 1} 个账号计划于 "
+                    f"{datetime.fromtimestamp(slots[accounts[i]], SHANGHAI_TZ):%H:%M:%S} 开始，等待 {wait:.0f} 秒"
+                )
+                if self.stop_event.wait(wait):
+                    logger.info(f"[{self.site}] 收到停止信号，剩余 {len(pending) - n} 个账号不再处理")
+                    return
+            yield i, accounts[i]
+
+
+def planning_enabled() -> bool:
+    return os.getenv("CHECKIN_PLAN", "").strip().lower() in ("1", "true", "on")
+
+
+def plan_from_env(site: str):
+    """CHECKIN_PLAN=1 时返回站点的计划，否则返回 None"""
+    if not planning_enabled():
+        return None
+    start, end = parse_window(site)
+    try:
+        min_spacing = max(0.0, float(os.getenv("PLAN_MIN_SPACING", "30")))
+    except ValueError:
+        logger.warning("PLAN_MIN_SPACING 配置无效，使用默认值 30")
+        min_spacing = 30.0
+    path = os.getenv("PLAN_FILE", ".checkin_plan.json").strip() or ".checkin_plan.json"
+    return DailyPlan(site, start, end, min_spacing=min_spacing, path=path, stop_event=_stop_event)
+
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+浏览器低内存模式与内存统计
+
+默认配置下（1920x1080 窗口、按站点拆分渲染进程、后台服务全部开启）每个 Chrome 常驻几百 MB，
+同一台机器（例如 7GB 内存的 GitHub Actions runner）上能同时运行的浏览器数量受此限制。
+
+LOW_MEMORY=1 时：
+  - 使用较小的窗口（LOW_MEMORY_WINDOW，默认 1024,768）
+  - 只保留一个渲染进程，关闭站点隔离、后台网络、组件更新、翻译等后台功能
+  - 磁盘缓存和媒体缓存限制为 1 MB，限制 V8 堆大小
+  - 阶段之间回到 about:blank，并通知 Chrome 释放内存
+
+无论是否启用低内存模式，处理每个账号期间都会定期采样 chromedriver 及其所有子进程（Chrome）的常驻内存，
+每个账号的峰值写入耗时报告，并附在汇总通知中，用于估算一台机器上的并发数。
+
+环境变量：
+  LOW_MEMORY           设为 1 时启用低内存模式
+  LOW_MEMORY_WINDOW    低内存模式的窗口大小，默认 1024,768
+  RSS_SAMPLE_INTERVAL  内存采样间隔（秒），默认 0.5；设为 0 时不采样
+"""
+
+import os
+import logging
+import threading
+
+from run_metrics import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = "1920,1080"
+LOW_MEMORY_WINDOW = "1024,768"
+
+LOW_MEMORY_ARGS = [
+    "--renderer-process-limit=1",
+    "--disable-site-isolation-trials",
+    "--disable-features=site-per-process,IsolateOrigins,Translate,OptimizationHints,MediaRouter,BackForwardCache",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+    "--disk-cache-size=1048576",
+    "--media-cache-size=1048576",
+    "--js-flags=--max-old-space-size=256",
+]
+
+LOW_MEMORY_PREFS = {
+    "credentials_enable_service": False,
+    "profile.password_manager_enabled": False,
+    "profile.default_content_setting_values.notifications": 2,
+}
+
+# 每个账号浏览器进程树的峰值内存在 run_metrics 中的名称
+RSS_KIND = "browser_peak_rss_bytes"
+
+
+def low_memory_enabled() -> bool:
+    return os.getenv("LOW_MEMORY", "").strip().lower() in ("1", "true", "on")
+
+
+def window_size() -> str:
+    """无头模式的窗口大小"""
+    if not low_memory_enabled():
+        return DEFAULT_WINDOW
+    return os.getenv("LOW_MEMORY_WINDOW", LOW_MEMORY_WINDOW).strip() or LOW_MEMORY_WINDOW
+
+
+def configure_low_memory(chrome_options) -> None:
+    """创建浏览器前调用（在 configure_options 之后）：低内存模式下追加启动参数，prefs 与已有的合并"""
+    if not low_memory_enabled():
+        return
+    for arg in LOW_MEMORY_ARGS:
+        chrome_options.add_argument(arg)
+    prefs = dict(chrome_options.experimental_options.get("prefs", {}))
+    prefs.update(LOW_MEMORY_PREFS)
+    chrome_options.add_experimental_option("prefs", prefs)
+
+
+def release_page(driver) -> None:
+    """低内存模式下在阶段之间回到空白页，释放上一个页面占用的渲染进程内存；下一阶段会自己打开需要的页面"""
+    if not low_memory_enabled() or driver is None:
+        return
+    try:
+        driver.get("about:blank")
+        driver.execute_cdp_cmd("Memory.simulatePressureNotification", {"level": "critical"})
+    except Exception as e:
+        logger.debug(f"释放页面内存失败: {e}")
+
+
+# ========== 内存统计 ==========
+
+def process_tree_rss(root_pid: int) -> int:
+    """统计进程及其所有子孙进程的常驻内存（字节），读取 /proc，仅支持 Linux"""
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                # comm 字段可能包含空格，从最后一个右括号之后开始解析
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(name))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def driver_pid(driver):
+    """chromedriver 进程号，Chrome 是它的子进程；取不到时返回 None"""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+
+def sample_interval() -> float:
+    try:
+        return max(0.0, float(os.getenv("RSS_SAMPLE_INTERVAL", "0.5")))
+    except ValueError:
+        logger.warning("RSS_SAMPLE_INTERVAL 配置无效，使用默认值 0.5")
+        return 0.5
+
+
+class RssSampler:
+    """后台线程定期采样一个浏览器的进程树内存，stop() 时把峰值记到当前账号上"""
+
+    def __init__(self, pid: int, interval: float):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"rss-{pid}", daemon=True)
+
+    def sample(self) -> None:
+        self.peak = max(self.peak, process_tree_rss(self.pid))
+
+    def _loop(self):
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        """停止采样并记录峰值，需要在账号上下文中、浏览器关闭或归还之前调用"""
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        metrics.record_peak(RSS_KIND, self.peak)
+        logger.info(f"浏览器内存峰值 {format_mb(self.peak)}")
+        return self.peak
+
+
+def track_driver(driver):
+    """开始采样浏览器内存，返回 RssSampler；不支持（没有 /proc、取不到进程号或已关闭采样）时返回 None"""
+    interval = sample_interval()
+    pid = driver_pid(driver)
+    if not interval or not pid or not os.path.isdir("/proc"):
+        return None
+    return RssSampler(pid, interval).start()
+
+
+def format_mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.0f} MB"
+
+
+def summary_line(peaks) -> str:
+    """汇总通知中的内存行；没有启动浏览器的账号不计入，全部没有数据时返回空字符串"""
+    peaks = [p for p in peaks if p]
+    if not peaks:
+        return ""
+    mode = "（低内存模式）" if low_memory_enabled() else ""
+    return (
+        f"🧠 浏览器内存峰值{mode}：最高 {format_mb(max(peaks))}，"
+        f"中位 {format_mb(percentile(peaks, 0.5))}（{len(peaks)} 个账号）\n"
+    )
+
+
+def site_peaks(site: str):
+    """本次运行中该站点每个账号的浏览器内存峰值（字节）"""
+    return metrics.peak_values(site, RSS_KIND)
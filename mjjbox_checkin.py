@@ -12,6 +12,16 @@ MJJBOX 自动签到脚本
   MJJBOX_EMAIL
   MJJBOX_PASSWORD
 
+  # 账号文件（可选，账号很多或密码含逗号时使用），JSONL / CSV，可加密，格式见 account_source.py
+  MJJBOX_ACCOUNTS_FILE
+
+  # 分片运行（可选）：--shard i/n 只处理一部分账号，--merge 目录 合并各分片结果并发送汇总，见 sharding.py
+  CHECKIN_SHARD
+  SHARD_RESULTS_DIR
+
+  # 低内存模式（可选）：LOW_MEMORY=1，每个账号的浏览器内存峰值附在汇总中，见 memory_profile.py
+  LOW_MEMORY
+
   # Telegram（可选，用于汇总推送）
   TELEGRAM_BOT_TOKEN
   TELEGRAM_CHAT_ID
@@ -19,12 +29,22 @@ MJJBOX 自动签到脚本
   # 站点地址（可选，默认 https://mjjbox.com）
   MJJBOX_BASE_URL
 
+  # 签到方式（可选）：auto 先用纯 HTTP 失败再回退浏览器（默认）/ http / browser
+  MJJBOX_MODE
+
   # 是否无头模式（默认在 GitHub Actions 下自动无头）
   HEADLESS = "1" / "0"
+
+  # 浏览器池（可选，默认 1 个浏览器复用；0 表示每个账号单独启动）
+  BROWSER_POOL_SIZE
+  BROWSER_RECYCLE_AFTER
+
+  # 登录会话缓存（可选，设置口令后启用）
+  SESSION_STORE_KEY
+  SESSION_STORE_DIR
 """
 
 import os
-import time
 import logging
 from datetime import datetime
 
@@ -36,6 +56,29 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from browser_pool import pool_from_env
+from resource_blocking import configure_options, apply_blocking, report_page
+from memory_profile import window_size, configure_low_memory, release_page, track_driver, summary_line, site_peaks
+from page_ready import wait_document_ready, wait_present, wait_for_any
+from session_store import (
+    store_from_env,
+    load_into_session,
+    import_driver_cookies,
+    export_driver_cookies,
+    export_session_cookies,
+)
+from selector_cache import get_cache
+from run_metrics import metrics
+from daily_state import state_from_env
+from retry_queue import RetryQueue
+from rate_limiter import get_limiter
+from telegram_notify import TelegramDispatcher, LiveProgress
+from load_planner import plan_from_env
+from account_source import source_from_env, proxy_settings
+from sharding import parse_cli, select, write_results, merge_and_notify
+from http_client import build_session, reset_cookies, sync_driver_cookies
+from discourse_http import DiscourseLoginError, fetch_csrf, http_login, session_is_valid
+
 
 # 日志配置
 logging.basicConfig(
@@ -45,46 +88,84 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def get_base_url() -> str:
+    return os.getenv("MJJBOX_BASE_URL", "https://mjjbox.com").rstrip("/")
+
+
+def create_driver(proxy=None):
+    """配置 Chrome / Chromium driver，proxy 为账号单独配置的代理"""
+    chrome_options = Options()
+
+    # GitHub Actions 或 HEADLESS=1 下启用无头
+    if os.getenv("GITHUB_ACTIONS") or os.getenv("HEADLESS", "1") == "1":
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument(f"--window-size={window_size()}")
+
+    # 一些常规参数 & 反自动化
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+    configure_options(chrome_options, "mjjbox")
+    configure_low_memory(chrome_options)
+    if proxy:
+        chrome_options.add_argument(f"--proxy-server={proxy}")
+
+    driver = webdriver.Chrome(options=chrome_options)
+    apply_blocking(driver, "mjjbox")
+
+    # 去掉 webdriver 标记
+    try:
+        driver.execute_script(
+            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        )
+    except Exception:
+        pass
+
+    metrics.instrument_driver(driver)
+    get_limiter("mjjbox").instrument_driver(driver)
+    return driver
+
+
 class MJJBoxAutoCheckin:
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, pool=None, session_store=None, http_session=None, proxy=None):
         if not username or not password:
             raise ValueError("用户名/邮箱 和 密码 不能为空")
 
         self.username = username
         self.password = password
 
-        self.base_url = os.getenv("MJJBOX_BASE_URL", "https://mjjbox.com").rstrip("/")
+        self.base_url = get_base_url()
+        # 使用单独代理的账号不能复用池中的浏览器
+        self.proxy = proxy
+        self.pool = pool if not proxy else None
+        self.session_store = session_store
+        # 整个运行共用的连接池 Session，每个账号开始时切换 Cookie
+        self.http = http_session or build_session()
+        metrics.instrument_session(self.http)
+        get_limiter("mjjbox").instrument_session(self.http)
+        # 浏览器按需启动，纯 HTTP 模式下不会创建
         self.driver = None
-        self.setup_driver()
+        self.rss_sampler = None
 
     # ========== 浏览器相关 ==========
 
     def setup_driver(self) -> None:
-        """配置 Chrome / Chromium driver"""
-        chrome_options = Options()
-
-        # GitHub Actions 或 HEADLESS=1 下启用无头
-        if os.getenv("GITHUB_ACTIONS") or os.getenv("HEADLESS", "1") == "1":
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
-
-        # 一些常规参数 & 反自动化
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option("useAutomationExtension", False)
+        """创建 driver，启用浏览器池时从池中获取"""
+        with metrics.phase("driver_startup"):
+            if self.pool:
+                self.driver = self.pool.acquire()
+            else:
+                self.driver = create_driver(self.proxy)
+        self.rss_sampler = track_driver(self.driver)
 
-        self.driver = webdriver.Chrome(options=chrome_options)
-
-        # 去掉 webdriver 标记
-        try:
-            self.driver.execute_script(
-                "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            )
-        except Exception:
-            pass
+    def stop_sampling(self) -> None:
+        """在关闭或归还浏览器之前记录本账号的浏览器内存峰值"""
+        if self.rss_sampler:
+            self.rss_sampler.stop()
+            self.rss_sampler = None
 
     def wait_clickable(self, by, value, timeout: int = 10):
         return WebDriverWait(self.driver, timeout).until(
@@ -104,7 +185,8 @@ class MJJBoxAutoCheckin:
         logger.info(f"开始登录 {login_url}")
 
         self.driver.get(login_url)
-        time.sleep(5)
+        wait_document_ready(self.driver, timeout=5)
+        report_page(self.driver, "登录页")
 
         # 用户名/邮箱输入框（你提供的 id）
         try:
@@ -116,8 +198,6 @@ class MJJBoxAutoCheckin:
         username_input.send_keys(self.username)
         logger.info("用户名/邮箱输入完成")
 
-        time.sleep(1)
-
         # 密码输入框（你提供的 id）
         try:
             password_input = self.wait_clickable(By.ID, "login-account-password", 10)
@@ -128,8 +208,6 @@ class MJJBoxAutoCheckin:
         password_input.send_keys(self.password)
         logger.info("密码输入完成")
 
-        time.sleep(1)
-
         # 登录按钮，你改过的选择器
         login_button_selectors = [
             "#login-button",
@@ -138,23 +216,18 @@ class MJJBoxAutoCheckin:
             "//button[contains(text(), 'Log in')]",
         ]
 
-        login_btn = None
-        for selector in login_button_selectors:
-            try:
-                if selector.startswith("//"):
-                    login_btn = WebDriverWait(self.driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, selector))
-                    )
-                else:
-                    login_btn = self.wait_clickable(By.CSS_SELECTOR, selector, 5)
-                break
-            except Exception:
-                continue
-
-        if not login_btn:
+        # 上次命中的选择器排在最前，所有选择器同时等待，最多 5 秒
+        selector_cache = get_cache()
+        hit = wait_for_any(
+            self.driver,
+            selector_cache.ordered("mjjbox", "login_button", login_button_selectors),
+            timeout=5,
+        )
+        if not hit:
             raise RuntimeError("找不到登录按钮，请检查页面结构")
 
-        login_btn.click()
+        selector_cache.record("mjjbox", "login_button", hit["selector"])
+        hit["element"].click()
         logger.info("已点击登录按钮，等待登录完成...")
 
         # 简单判断：URL 不再包含 /login 视为登录成功
@@ -169,6 +242,45 @@ class MJJBoxAutoCheckin:
         logger.info(f"登录完成，当前 URL: {self.driver.current_url}")
         return True
 
+    # ========== 会话缓存 ==========
+
+    def restore_session(self, session) -> list:
+        """
+        把缓存的 Cookie 载入 requests.Session 并校验是否仍然有效。
+        通过 /session/current.json 做轻量校验：已登录返回 200，否则 404。
+        有效时返回 Cookie 列表，否则返回空列表。
+        """
+        if not self.session_store:
+            return []
+
+        cookies = self.session_store.load("mjjbox", self.username)
+        if not cookies:
+            return []
+
+        load_into_session(session, cookies)
+        if session_is_valid(session, self.base_url):
+            logger.info("缓存会话有效，跳过登录")
+            return cookies
+
+        logger.info("缓存会话已失效，重新登录")
+        self.session_store.delete("mjjbox", self.username)
+        session.cookies.clear()
+        return []
+
+    def save_session(self, session=None) -> None:
+        """签到成功后刷新会话缓存；传入 session 时保存 HTTP 会话，否则保存浏览器 Cookie"""
+        if not self.session_store:
+            return
+        try:
+            if session is not None:
+                cookies = export_session_cookies(session)
+            else:
+                cookies = export_driver_cookies(self.driver)
+            self.session_store.save("mjjbox", self.username, cookies)
+            logger.info("会话缓存已更新")
+        except Exception as e:
+            logger.warning(f"保存会话缓存失败: {e}")
+
     # ========== CSRF & /checkin 请求 ==========
 
     def get_csrf_token(self) -> str:
@@ -188,7 +300,7 @@ class MJJBoxAutoCheckin:
 
         return ""
 
-    def perform_checkin_request(self) -> tuple[str, str]:
+    def perform_checkin_request(self, session, csrf_token: str) -> tuple[str, str]:
         """
         模拟油猴脚本的 _performCheckinRequest：
         向 /checkin 发送 POST 请求，返回 (结果类型, 提示文本)
@@ -199,18 +311,9 @@ class MJJBoxAutoCheckin:
           - "auth"     : 权限 / 登录问题
           - "error"    : 其他错误
         """
-        csrf_token = self.get_csrf_token()
         if not csrf_token:
             raise RuntimeError("无法获取 CSRF Token，请确认已经成功登录")
 
-        # 用 Selenium 当前 session 的 cookie 构造一个 requests.Session
-        session = requests.Session()
-        for c in self.driver.get_cookies():
-            try:
-                session.cookies.set(c["name"], c["value"])
-            except Exception:
-                continue
-
         headers = {
             "Accept": "application/json",
             "X-CSRF-Token": csrf_token,
@@ -275,7 +378,7 @@ class MJJBoxAutoCheckin:
 
     # ========== /checkin.json 获取积分信息 ==========
 
-    def fetch_checkin_status(self) -> dict:
+    def fetch_checkin_status(self, session) -> dict:
         """
         调用 /checkin.json 获取签到详情：
         - user_checkin_count : 总签到天数
@@ -284,13 +387,6 @@ class MJJBoxAutoCheckin:
         - checkin_history[0] : 最近一次签到记录（含 points_earned）
         - current_points     : 当前总积分
         """
-        session = requests.Session()
-        for c in self.driver.get_cookies():
-            try:
-                session.cookies.set(c["name"], c["value"])
-            except Exception:
-                continue
-
         url = f"{self.base_url}/checkin.json"
         logger.info(f"获取签到详情：{url}")
 
@@ -327,39 +423,111 @@ class MJJBoxAutoCheckin:
 
     def checkin(self) -> str:
         """
-        整体签到流程：
-        登录 + 打开页面拿 CSRF + 调用 /checkin 接口 + 查询 /checkin.json 补充分数信息
+        整体签到流程，按 MJJBOX_MODE 选择：
+          - auto    : 先走纯 HTTP，登录被拒绝时回退到浏览器（默认）
+          - http    : 只走纯 HTTP，不启动浏览器
+          - browser : 只走浏览器
 
         返回一段可直接用于日志/TG 的文本
         """
         logger.info(f"开始为账号 {self.username} 签到")
 
-        if not self.login():
-            raise RuntimeError("登录失败，无法进行签到")
+        mode = os.getenv("MJJBOX_MODE", "auto").strip().lower()
+        if mode in ("auto", "http"):
+            # 只有签到请求发出之前的失败才回退到浏览器；签到请求发出后（例如超时但服务器已受理）
+            # 再用浏览器签到一次可能重复签到，直接抛出
+            try:
+                csrf_token = self.login_http()
+            except (DiscourseLoginError, requests.RequestException) as e:
+                if mode == "http":
+                    raise RuntimeError(f"HTTP 登录失败：{e}")
+                logger.warning(f"HTTP 登录失败，回退到浏览器模式：{e}")
+            else:
+                return self.checkin_http(csrf_token)
 
-        # 为了拿到 meta[name='csrf-token']，打开首页或任意页面
-        try:
-            self.driver.get(f"{self.base_url}/")
-            time.sleep(5)
-        except Exception as e:
-            logger.warning(f"打开首页失败: {e}")
+        return self.checkin_browser()
+
+    def login_http(self) -> str:
+        """纯 HTTP 登录：优先使用缓存会话，否则 /session/csrf + /session 登录，返回 CSRF Token"""
+        session = self.http
+        reset_cookies(session)
+
+        with metrics.phase("login"):
+            if self.restore_session(session):
+                return fetch_csrf(session, self.base_url)
+            logger.info("使用 HTTP 接口登录")
+            return http_login(session, self.base_url, self.username, self.password)
+
+    def checkin_http(self, csrf_token: str) -> str:
+        """
+        纯 HTTP 签到：在 login_http 登录后的会话上调用 /checkin 和 /checkin.json，
+        全程不启动浏览器
+        """
+        session = self.http
 
-        result_type, message = self.perform_checkin_request()
+        with metrics.phase("checkin"):
+            result_type, message = self.perform_checkin_request(session, csrf_token)
+        base_msg = self.describe_result(result_type, message)
 
-        # 先生成基础结果文案
+        self.save_session(session)
+        with metrics.phase("status"):
+            return self.append_points_detail(session, base_msg)
+
+    def checkin_browser(self) -> str:
+        """
+        浏览器签到：
+        登录 + 打开页面拿 CSRF + 调用 /checkin 接口 + 查询 /checkin.json 补充分数信息
+        """
+        if not self.driver:
+            self.setup_driver()
+
+        # 优先使用缓存会话，失效时再登录
+        with metrics.phase("login"):
+            reset_cookies(self.http)
+            cookies = self.restore_session(self.http)
+            if cookies:
+                import_driver_cookies(self.driver, cookies)
+            elif not self.login():
+                raise RuntimeError("登录失败，无法进行签到")
+
+        # 为了拿到 meta[name='csrf-token']，打开首页或任意页面
+        with metrics.phase("csrf_page"):
+            try:
+                self.driver.get(f"{self.base_url}/")
+                # meta 标签出现即可，最多等待 5 秒
+                wait_present(self.driver, By.CSS_SELECTOR, "meta[name='csrf-token']", timeout=5)
+                report_page(self.driver, "首页")
+            except Exception as e:
+                logger.warning(f"打开首页失败: {e}")
+
+        # 每个账号只同步一次浏览器 Cookie，后续接口调用共用同一个连接池
+        session = self.http
+        sync_driver_cookies(session, self.driver)
+        csrf_token = self.get_csrf_token()
+        # 后续都是接口调用，低内存模式下回到空白页释放首页占用的内存
+        release_page(self.driver)
+        with metrics.phase("checkin"):
+            result_type, message = self.perform_checkin_request(session, csrf_token)
+        base_msg = self.describe_result(result_type, message)
+
+        self.save_session()
+        with metrics.phase("status"):
+            return self.append_points_detail(session, base_msg)
+
+    def describe_result(self, result_type: str, message: str) -> str:
+        """生成基础结果文案，失败时抛出异常"""
         if result_type == "success":
-            base_msg = f"签到成功：{message}"
+            return f"签到成功：{message}"
         elif result_type == "duplicate":
-            base_msg = message or "您今天已经签到过了"
-        elif result_type == "auth":
-            raise RuntimeError(message)
+            return message or "您今天已经签到过了"
         else:
             raise RuntimeError(message)
 
-        # 再尝试补充积分信息
+    def append_points_detail(self, session, base_msg: str) -> str:
+        """尝试通过 /checkin.json 补充积分信息"""
         detail_text = ""
         try:
-            info = self.fetch_checkin_status()
+            info = self.fetch_checkin_status(session)
             if info.get("today_checked_in"):
                 today_points = info.get("today_points")
                 consecutive_days = info.get("consecutive_days")
@@ -382,19 +550,26 @@ class MJJBoxAutoCheckin:
 
     # ========== 资源回收 ==========
 
-    def close(self):
-        if self.driver:
-            try:
+    def close(self, discard: bool = False):
+        """关闭或归还 driver；discard=True 时不放回浏览器池"""
+        if not self.driver:
+            return
+        self.stop_sampling()
+        try:
+            if self.pool:
+                self.pool.release(self.driver, discard=discard)
+            else:
                 self.driver.quit()
-            except Exception:
-                pass
+        except Exception:
+            pass
+        self.driver = None
 
 
 # ========== 多账号解析 ==========
 
 def parse_accounts_from_env():
     """
-    支持两种方式：
+    支持两种方式，返回 [{"username", "password"}, ...]：
     1. 多账号：
        MJJBOX_ACCOUNTS = 邮箱1:密码1,邮箱2:密码2
 
@@ -413,88 +588,197 @@ def parse_accounts_from_env():
             user = user.strip()
             pwd = pwd.strip()
             if user and pwd:
-                accounts.append((user, pwd))
+                accounts.append({"username": user, "password": pwd})
 
     if not accounts:
         user = os.getenv("MJJBOX_EMAIL", "").strip()
         pwd = os.getenv("MJJBOX_PASSWORD", "").strip()
         if user and pwd:
-            accounts.append((user, pwd))
+            accounts.append({"username": user, "password": pwd})
 
     return accounts
 
 
 # ========== Telegram 汇总推送 ==========
 
-def send_telegram_summary(message: str) -> None:
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
-
-    if not bot_token or not chat_id:
-        logger.info("未配置 TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID，跳过 Telegram 推送")
-        return
+def build_summary(outcomes):
+    """构造汇总消息（带 emoji，风格类似 Leaflow），返回 (标题, 各账号内容)"""
+    success_count = sum(1 for success, _, _ in outcomes if success)
+    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {
-            "chat_id": chat_id,
-            "text": message,
-            "parse_mode": "HTML",
-        }
-        resp = requests.post(url, data=data, timeout=10)
-        if resp.status_code != 200:
-            logger.warning(f"Telegram 推送失败：{resp.text}")
-    except Exception as e:
-        logger.warning(f"Telegram 推送异常: {e}")
+    header = ""
+    header += "🎁 MJJBOX 自动签到通知\n"
+    header += f"📊 成功: {success_count}/{len(outcomes)}\n"
+    header += f"📅 签到时间：{current_date}\n"
+    return header, [msg for _, msg, _ in outcomes]
 
 
 # ========== 主入口 ==========
 
-def main():
-    accounts = parse_accounts_from_env()
+def main(argv=None):
+    args = parse_cli(argv)
+    if args.merge:
+        merge_and_notify("mjjbox", args.merge, build_summary, parse_mode="HTML")
+        return
+
+    # 配置了账号文件时逐行读取，否则使用环境变量
+    accounts = source_from_env("mjjbox", "username")
+    if accounts is None:
+        accounts = parse_accounts_from_env()
     if not accounts:
         logger.error(
             "未找到账号配置，请设置环境变量：\n"
             "  多账号：MJJBOX_ACCOUNTS = 邮箱1:密码1,邮箱2:密码2\n"
-            "  或 单账号：MJJBOX_EMAIL / MJJBOX_PASSWORD"
+            "  或 单账号：MJJBOX_EMAIL / MJJBOX_PASSWORD\n"
+            "  或 账号文件：MJJBOX_ACCOUNTS_FILE"
         )
         return
 
-    total_count = len(accounts)
-    success_count = 0
-    overall_messages = []
+    # 分片模式：只处理本分片的账号，记录它们在完整列表中的序号，合并时按原顺序排列
+    shard = args.shard
+    if shard:
+        accounts, shard_indexes = select(accounts, "mjjbox", "username", shard)
 
-    for idx, (user, pwd) in enumerate(accounts, start=1):
-        logger.info("=" * 60)
-        logger.info(f"开始处理第 {idx} 个账号：{user}")
+    total_count = len(accounts)
 
-        checker = MJJBoxAutoCheckin(user, pwd)
-        try:
-            result = checker.checkin()
-            success_count += 1
-            msg = f"✅ 账号 {user}：\n{result}"
+    pool = pool_from_env(create_driver, origins=[get_base_url()])
+    session_store = store_from_env()
+    daily_state = state_from_env()
+    http_session = build_session()
+    limiter = get_limiter("mjjbox")
+    notifier = TelegramDispatcher.from_env(parse_mode="HTML")
+
+    # 进度模式：已完成账号的结果，按账号顺序存放，未完成的为 None
+    progress_outcomes = [None] * total_count
+
+    def render_progress():
+        done = [o for o in progress_outcomes if o]
+        header, blocks = build_summary(done)
+        return header + f"⏳ 进度：{len(done)}/{total_count}\n", blocks
+
+    # 分片模式下由合并步骤统一发送汇总，不发送进度消息
+    progress = LiveProgress.from_env(notifier, render_progress) if not shard else None
+
+    def process_account(i, account):
+        """处理第 i 个账号（从 0 开始），返回 (是否成功, 汇总文案, 异常)"""
+        outcome = checkin_account(account["username"], account["password"], account.get("proxy"))
+        progress_outcomes[i] = outcome
+        if progress:
+            progress.update()
+        return outcome
+
+    def checkin_account(user, pwd, proxy=None):
+        # 今日已签到成功的账号直接使用记录，不登录也不启动浏览器
+        record = daily_state.get("mjjbox", user) if daily_state else None
+        if record:
+            msg = f"✅ 账号 {user}：\n{record['message'] or '您今天已经签到过了'}（今日已完成，跳过）"
             logger.info(msg)
-        except Exception as e:
-            msg = f"❌ 账号 {user}：\n{e}"
-            logger.error(msg)
-        finally:
-            checker.close()
-
-        overall_messages.append(msg)
-        # 多账号间稍微停顿一下，避免太频繁
-        time.sleep(5)
-
-    # 构造汇总消息（带 emoji，风格类似 Leaflow）
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    summary = ""
-    summary += "🎁 MJJBOX 自动签到通知\n"
-    summary += f"📊 成功: {success_count}/{total_count}\n"
-    summary += f"📅 签到时间：{current_date}\n\n"
-    summary += "\n\n".join(overall_messages)
+            with metrics.account("mjjbox", user):
+                metrics.count("skipped")
+                metrics.set_outcome(True)
+            return True, msg, None
+
+        # 账号之间的间隔由限速器控制，遇到限流会自动放慢
+        limiter.acquire_account()
+
+        # 使用单独代理的账号用自己的 Session，不影响共用的连接池
+        session = http_session
+        if proxy:
+            session = build_session()
+            session.proxies.update(proxy_settings(proxy))
+
+        checker = None
+        error = None
+        with metrics.account("mjjbox", user):
+            try:
+                checker = MJJBoxAutoCheckin(
+                    user, pwd,
+                    pool=pool,
+                    session_store=session_store,
+                    http_session=session,
+                    proxy=proxy,
+                )
+                result = checker.checkin()
+                limiter.on_success()
+                if daily_state:
+                    daily_state.mark_done("mjjbox", user, result)
+                msg = f"✅ 账号 {user}：\n{result}"
+                logger.info(msg)
+            except Exception as e:
+                error = e
+                msg = f"❌ 账号 {user}：\n{e}"
+                logger.error(msg)
+            finally:
+                if checker:
+                    checker.close(discard=error is not None)
+                if session is not http_session:
+                    session.close()
+            metrics.set_outcome(error is None)
+
+        return error is None, msg, error
+
+    # 启用计划时每个账号到了分配的时间才开始处理，当天已签到的账号不等待
+    plan = plan_from_env("mjjbox")
+    if plan:
+        order = plan.iter_due(
+            [account["username"] for account in accounts],
+            ready=lambda user: bool(daily_state and daily_state.get("mjjbox", user)),
+        )
+    else:
+        order = ((i, None) for i in range(total_count))
 
-    logger.info(summary)
-    send_telegram_summary(summary)
+    outcomes = [None] * total_count
+    if progress:
+        progress.start()
+    try:
+        for i, _ in order:
+            account = accounts[i]
+            logger.info("=" * 60)
+            logger.info(f"开始处理第 {i + 1} 个账号：{account['username']}")
+            outcomes[i] = process_account(i, account)
+
+        # 失败的账号按退避间隔重试，不重复处理已成功的账号
+        queue = RetryQueue.from_env()
+        for i, (success, _, error) in enumerate(outcomes):
+            if not success:
+                queue.push(i, error, label=accounts[i]["username"])
+        for i, attempt in queue.drain():
+            account = accounts[i]
+            logger.info("=" * 60)
+            logger.info(f"第 {attempt} 次尝试账号：{account['username']}")
+            outcomes[i] = process_account(i, account)
+            if not outcomes[i][0]:
+                queue.push(i, outcomes[i][2], label=account["username"])
+
+        header, overall_messages = build_summary(outcomes)
+        header += summary_line(site_peaks("mjjbox"))
+        logger.info(header + "\n" + "\n\n".join(overall_messages))
+        # 后台发送，超长时按账号拆成多条，与关闭浏览器等收尾工作同时进行；
+        # 进度模式下把进度消息编辑为最终汇总；分片模式只保存结果，由 --merge 合并后统一发送
+        if shard:
+            write_results("mjjbox", shard, (
+                (shard_indexes[i], (success, msg, str(error) if error else None))
+                for i, (success, msg, error) in enumerate(outcomes)
+            ), peaks=site_peaks("mjjbox"))
+        elif progress:
+            progress.finish(header, overall_messages)
+        elif notifier:
+            notifier.send_summary(header, overall_messages)
+        else:
+            logger.info("未配置 TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID，跳过 Telegram 推送")
+    finally:
+        if pool:
+            pool.close()
+        if daily_state:
+            daily_state.close()
+        http_session.close()
+
+    # 输出耗时统计
+    metrics.write_reports()
+
+    # 等待通知发送完成
+    if notifier:
+        notifier.close()
 
 
 if __name__ == "__main__":
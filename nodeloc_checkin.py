@@ -3,26 +3,146 @@
 NodeLoc 多账号自动签到脚本 (最终格式修正版)
 环境变量：
 NODELOC_ACCOUNTS: 账号:密码,账号2:密码2
+NODELOC_MODE: 签到方式 auto(默认，先纯 HTTP，HTTP 登录失败再用浏览器) / http / browser
+NODELOC_ACCOUNTS_FILE: 账号文件（可选），JSONL / CSV，可加密，格式见 account_source.py
+分片运行（可选）：--shard i/n 只处理一部分账号，--merge 目录 合并各分片结果并发送汇总，见 sharding.py
+低内存模式（可选）：LOW_MEMORY=1，每个账号的浏览器内存峰值附在汇总中，见 memory_profile.py
 """
 
 import os
-import time
 import logging
-import random
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-import requests
 from datetime import datetime
+from browser_pool import pool_from_env
+from resource_blocking import configure_options, apply_blocking, report_page
+from memory_profile import window_size, configure_low_memory, track_driver, summary_line, site_peaks
+from dom_extract import element_texts, table_rows
+from page_ready import wait_document_ready, wait_network_idle, wait_present, wait_for_any
+from session_store import (
+    store_from_env, load_into_session, import_driver_cookies,
+    export_driver_cookies, export_session_cookies
+)
+from http_client import build_session
+from discourse_http import ajax_headers, fetch_csrf, http_login, session_is_valid
+from run_metrics import metrics
+from daily_state import state_from_env
+from retry_queue import RetryQueue
+from rate_limiter import get_limiter
+from telegram_notify import TelegramDispatcher, LiveProgress
+from load_planner import plan_from_env
+from account_source import source_from_env, proxy_settings
+from sharding import parse_cli, select, write_results, merge_and_notify
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 浏览器登录结果：已登录页面上的当前用户头像 / Discourse 登录框的错误提示
+LOGIN_SUCCESS_SELECTORS = ["#current-user", ".header-dropdown-toggle.current-user"]
+LOGIN_ERROR_SELECTORS = ["#modal-alert.alert-error", "#login-form .alert-error", ".login-modal .alert-error"]
+
+def get_base_url():
+    return os.getenv('NODELOC_BASE_URL', 'https://www.nodeloc.com').rstrip('/')
+
+def get_checkin_path():
+    """签到接口路径（纯 HTTP 模式使用）"""
+    return os.getenv('NODELOC_CHECKIN_PATH', '/checkin')
+
+def create_driver(proxy=None):
+    """创建Chrome驱动，proxy 为账号单独配置的代理"""
+    chrome_options = Options()
+    
+    # GitHub Actions环境配置（HEADLESS=1 时本地也使用无头模式）
+    if os.getenv('GITHUB_ACTIONS') or os.getenv('HEADLESS') == '1':
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument(f'--window-size={window_size()}')
+    
+    # 通用配置 - 防检测
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    configure_options(chrome_options, "nodeloc")
+    configure_low_memory(chrome_options)
+    if proxy:
+        chrome_options.add_argument(f'--proxy-server={proxy}')
+    chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    
+    driver = webdriver.Chrome(options=chrome_options)
+    apply_blocking(driver, "nodeloc")
+    
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": """
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            })
+        """
+    })
+    metrics.instrument_driver(driver)
+    get_limiter("nodeloc").instrument_driver(driver)
+    return driver
+
+def parse_points_json(data):
+    """
+    解析积分记录 JSON，返回 {"total", "reward", "time"}。
+    只有最新一条正向记录是"每日签到奖励"时才认为今日有签到奖励，与页面表格的解析规则一致。
+    找不到总积分或记录列表时返回 None（接口结构变化）。
+    """
+    if not isinstance(data, dict):
+        return None
+    
+    total_points = None
+    for key in ('total_points', 'total_scores', 'total', 'points'):
+        if isinstance(data.get(key), (int, float, str)):
+            total_points = str(data[key])
+            break
+    
+    # 记录列表可能在顶层，也可能嵌套在某个字段中
+    events = None
+    for key in ('events', 'points_history', 'histories', 'data'):
+        if isinstance(data.get(key), list):
+            events = data[key]
+            break
+    
+    if total_points is None or events is None:
+        return None
+    
+    today_reward = "未知"
+    checkin_time = "未知"
+    
+    positive = []
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        amount = event.get('points', event.get('score', event.get('amount')))
+        try:
+            if float(amount) > 0:
+                positive.append((event, amount))
+        except (TypeError, ValueError):
+            continue
+    
+    if positive:
+        event, amount = positive[0]
+        reason = str(event.get('reason') or event.get('description') or event.get('title') or '')
+        if "每日签到奖励" in reason:
+            today_reward = f"+{amount}"
+            checkin_time = str(event.get('created_at') or event.get('time') or "未知")
+            logger.info(f"成功提取签到奖励: {today_reward}")
+    
+    return {
+        "total": total_points,
+        "reward": today_reward,
+        "time": checkin_time
+    }
+
 class NodeLocAutoCheckin:
-    def __init__(self, username, password):
+    def __init__(self, username, password, pool=None, session_store=None, proxy=None):
         self.username = username
         self.password = password
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -31,43 +151,180 @@ class NodeLocAutoCheckin:
         if not self.username or not self.password:
             raise ValueError("用户名和密码不能为空")
         
+        # 使用单独代理的账号不能复用池中的浏览器
+        self.proxy = proxy
+        self.pool = pool if not proxy else None
+        self.session_store = session_store
+        self.base_url = get_base_url()
+        # 浏览器按需启动，纯 HTTP 模式下不会创建
         self.driver = None
-        self.setup_driver()
+        self.rss_sampler = None
     
     def setup_driver(self):
-        """设置Chrome驱动选项"""
-        chrome_options = Options()
+        """设置Chrome驱动，启用浏览器池时从池中获取"""
+        with metrics.phase("driver_startup"):
+            if self.pool:
+                self.driver = self.pool.acquire()
+            else:
+                self.driver = create_driver(self.proxy)
+        self.rss_sampler = track_driver(self.driver)
+    
+    def stop_sampling(self):
+        """在关闭或归还浏览器之前记录本账号的浏览器内存峰值"""
+        if self.rss_sampler:
+            self.rss_sampler.stop()
+            self.rss_sampler = None
+    
+    def close_driver(self, discard=False):
+        """关闭或归还Chrome驱动"""
+        if not self.driver:
+            return
+        self.stop_sampling()
+        if self.pool:
+            self.pool.release(self.driver, discard=discard)
+        else:
+            self.driver.quit()
+        self.driver = None
+        
+    def restore_session(self, session):
+        """把缓存的Cookie载入 requests.Session，并通过 /session/current.json 校验，有效时返回Cookie列表"""
+        if not self.session_store:
+            return []
         
-        # GitHub Actions环境配置
-        if os.getenv('GITHUB_ACTIONS'):
-            chrome_options.add_argument('--headless=new')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
+        cookies = self.session_store.load("nodeloc", self.username)
+        if not cookies:
+            return []
         
-        # 通用配置 - 防检测
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        load_into_session(session, cookies)
+        if session_is_valid(session, self.base_url):
+            logger.info("缓存会话有效，跳过登录")
+            return cookies
         
-        self.driver = webdriver.Chrome(options=chrome_options)
+        logger.info("缓存会话已失效，重新登录")
+        self.session_store.delete("nodeloc", self.username)
+        session.cookies.clear()
+        return []
+    
+    def save_session(self, session=None):
+        """签到成功后刷新会话缓存；传入 session 时保存 HTTP 会话，否则保存浏览器Cookie"""
+        if not self.session_store:
+            return
+        try:
+            if session is not None:
+                cookies = export_session_cookies(session)
+            else:
+                cookies = export_driver_cookies(self.driver)
+            self.session_store.save("nodeloc", self.username, cookies)
+            logger.info("会话缓存已更新")
+        except Exception as e:
+            logger.warning(f"保存会话缓存失败: {e}")
+    
+    # ========== 纯 HTTP 模式 ==========
+    
+    def new_session(self):
+        """本账号使用的 HTTP 会话（连接池 + GET 重试），调用方负责关闭"""
+        session = build_session()
+        session.proxies.update(proxy_settings(self.proxy))
+        metrics.instrument_session(session)
+        get_limiter("nodeloc").instrument_session(session)
+        return session
+    
+    def login_http(self, session):
+        """纯 HTTP 登录：优先使用缓存会话，否则通过 Discourse 接口登录，返回 CSRF Token"""
+        with metrics.phase("login"):
+            if self.restore_session(session):
+                return fetch_csrf(session, self.base_url)
+            logger.info("使用 HTTP 接口登录")
+            return http_login(session, self.base_url, self.username, self.password)
+    
+    def run_http(self, session, csrf_token):
+        """
+        纯 HTTP 签到：在 login_http 登录后的会话上签到并读取积分 JSON，不启动浏览器。
+        签到请求发出后不再抛出积分读取的错误，积分记为未知，避免调用方回退到浏览器重复签到
+        """
+        with metrics.phase("checkin"):
+            checked_in = self.checkin_http(session, csrf_token)
+        with metrics.phase("points"):
+            try:
+                info = self.get_points_info_http(session)
+            except Exception as e:
+                logger.warning(f"获取积分详情失败，积分记为未知: {e}")
+                info = {"total": "未知", "reward": "未知", "time": "未知"}
+        self.save_session(session)
+        info["checked_in"] = checked_in
+        return info
+    
+    def checkin_http(self, session, csrf_token):
+        """调用签到接口，已签到时接口返回 422"""
+        url = f"{self.base_url}{get_checkin_path()}"
+        logger.info(f"向 {url} 发送签到请求")
+        resp = session.post(url, headers=ajax_headers(csrf_token), timeout=15)
+        
+        if resp.status_code == 200:
+            logger.info("签到请求成功")
+            return True
+        if resp.status_code == 422:
+            logger.info("今日已签到")
+            return False
+        if resp.status_code == 403:
+            raise Exception("权限不足或未登录 (403)")
+        raise Exception(f"签到请求失败，HTTP 状态码：{resp.status_code}")
+    
+    def get_points_info_http(self, session):
+        """读取积分记录 JSON，返回与 get_points_info 相同结构的字典；请求失败或结构无法识别时抛出异常"""
+        # 登录名可能是邮箱，积分页面需要真实用户名
+        resp = session.get(
+            f"{self.base_url}/session/current.json",
+            headers={"Accept": "application/json"},
+            timeout=15
+        )
+        resp.raise_for_status()
+        username = resp.json().get("current_user", {}).get("username") or self.username
+        
+        resp = session.get(
+            f"{self.base_url}/u/{username}/points-history/events.json",
+            headers={"Accept": "application/json"},
+            timeout=15
+        )
+        resp.raise_for_status()
+        info = parse_points_json(resp.json())
+        if info is None:
+            raise ValueError("积分记录接口返回结构无法识别")
+        return info
+    
+    # ========== 浏览器模式 ==========
+    
+    def run_browser(self):
+        """浏览器签到：登录、点击签到按钮并从积分页面表格中读取结果"""
+        if not self.driver:
+            self.setup_driver()
+        
+        # 优先使用缓存会话，失效时再登录
+        with metrics.phase("login"):
+            session = self.new_session()
+            try:
+                cookies = self.restore_session(session)
+            finally:
+                session.close()
+            if cookies:
+                import_driver_cookies(self.driver, cookies)
+            elif not self.login():
+                raise Exception("登录失败")
         
-        self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": """
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """
-        })
+        with metrics.phase("checkin"):
+            self.checkin()
+        with metrics.phase("points"):
+            info = self.get_points_info()
+        self.save_session()
+        return info
         
     def login(self):
         """执行登录流程"""
         logger.info(f"开始登录流程: {self.username}")
         try:
-            self.driver.get("https://www.nodeloc.com/login")
-            time.sleep(5)
+            self.driver.get(f"{self.base_url}/login")
+            wait_document_ready(self.driver, timeout=5)
+            report_page(self.driver, "登录页")
             
             username_input = WebDriverWait(self.driver, 20).until(
                 EC.presence_of_element_located((By.ID, "login-account-name"))
@@ -79,16 +336,19 @@ class NodeLocAutoCheckin:
             password_input.clear()
             password_input.send_keys(self.password)
             
-            time.sleep(1)
             self.driver.find_element(By.ID, "login-button").click()
             
-            time.sleep(5)
-            if "login" not in self.driver.current_url:
+            # 登录成功后跳转的页面出现当前用户头像，失败时登录框出现错误提示，任一出现即返回，最多等待10秒
+            hit = wait_for_any(self.driver, LOGIN_SUCCESS_SELECTORS + LOGIN_ERROR_SELECTORS, timeout=10)
+            if hit and hit["index"] >= len(LOGIN_SUCCESS_SELECTORS):
+                logger.error(f"登录失败: {hit['text']}")
+                return False
+            if hit or "login" not in self.driver.current_url:
                 logger.info("登录成功")
                 return True
             
-            self.driver.get("https://www.nodeloc.com/")
-            time.sleep(3)
+            self.driver.get(f"{self.base_url}/")
+            wait_document_ready(self.driver, timeout=3)
             return True
             
         except Exception as e:
@@ -98,9 +358,10 @@ class NodeLocAutoCheckin:
     def checkin(self):
         """执行签到流程"""
         logger.info("检查签到状态...")
-        if self.driver.current_url != "https://www.nodeloc.com/":
-            self.driver.get("https://www.nodeloc.com/")
-            time.sleep(5)
+        if self.driver.current_url != f"{self.base_url}/":
+            self.driver.get(f"{self.base_url}/")
+            wait_document_ready(self.driver, timeout=5)
+            report_page(self.driver, "首页")
         
         try:
             checkin_btn = WebDriverWait(self.driver, 10).until(
@@ -110,7 +371,7 @@ class NodeLocAutoCheckin:
             if checkin_btn.is_displayed() and checkin_btn.is_enabled():
                 checkin_btn.click()
                 logger.info("已点击签到按钮")
-                time.sleep(3)
+                wait_network_idle(self.driver, timeout=3)
                 return True
             else:
                 logger.info("签到按钮不可用")
@@ -122,48 +383,44 @@ class NodeLocAutoCheckin:
     def get_points_info(self):
         """获取积分详情 - 严格匹配模式"""
         try:
-            logger.info("等待2秒后获取积分详情...")
-            time.sleep(2)
+            logger.info("等待页面空闲后获取积分详情...")
+            wait_network_idle(self.driver, timeout=2)
             
             try:
                 avatar_link = self.driver.find_element(By.CSS_SELECTOR, ".App-header-controls .Avatar").find_element(By.XPATH, "./..").get_attribute("href")
                 points_url = f"{avatar_link}/points-history/events"
             except:
-                points_url = f"https://www.nodeloc.com/u/{self.username}/points-history/events"
+                points_url = f"{self.base_url}/u/{self.username}/points-history/events"
             
             logger.info(f"访问积分页面: {points_url}")
             self.driver.get(points_url)
-            time.sleep(5)
+            # 积分表格或总能量出现即可，最多等待5秒
+            wait_present(self.driver, By.CSS_SELECTOR, "tr.positive-points, .total-scores .value", timeout=5)
+            wait_network_idle(self.driver, timeout=2)
+            report_page(self.driver, "积分页")
             
-            # 1. 获取总能量
+            # 1. 获取总能量（一次脚本调用取回）
             total_points = "未知"
-            try:
-                total_elem = self.driver.find_element(By.CSS_SELECTOR, ".total-scores .value")
-                total_points = total_elem.text.strip()
-            except:
+            total_text = element_texts(self.driver, [".total-scores .value"]).get(".total-scores .value")
+            if total_text:
+                total_points = total_text
+            else:
                 logger.warning("未找到总能量元素")
 
-            # 2. 获取今日签到奖励
+            # 2. 获取今日签到奖励（只看最新一条正向记录，一次脚本调用取回整行）
             today_reward = "未知"
             checkin_time = "未知"
             
-            try:
-                positive_rows = self.driver.find_elements(By.CSS_SELECTOR, "tr.positive-points")
-                
-                if positive_rows:
-                    first_row = positive_rows[0]
-                    cols = first_row.find_elements(By.TAG_NAME, "td")
-                    
-                    if len(cols) >= 3:
-                        reason_text = cols[2].text.strip()
-                        if "每日签到奖励" in reason_text:
-                            score_span = cols[1].find_element(By.CSS_SELECTOR, ".positive")
-                            today_reward = score_span.text.strip()
-                            time_span = cols[0].find_element(By.TAG_NAME, "span")
-                            checkin_time = time_span.get_attribute("title")
-                            logger.info(f"成功提取签到奖励: {today_reward}")
-            except Exception as e:
-                logger.warning(f"提取表格数据时出错: {e}")
+            positive_rows = table_rows(self.driver, "tr.positive-points", limit=1)
+            if positive_rows:
+                cols = positive_rows[0]
+                if len(cols) >= 3 and "每日签到奖励" in cols[2]['text']:
+                    if cols[1]['positive']:
+                        today_reward = cols[1]['positive']
+                        checkin_time = cols[0]['title'] or "未知"
+                        logger.info(f"成功提取签到奖励: {today_reward}")
+                    else:
+                        logger.warning("签到奖励行中未找到积分数值")
             
             return {
                 "total": total_points,
@@ -176,40 +433,83 @@ class NodeLocAutoCheckin:
             return None
 
     def run(self):
+        """
+        返回 (是否成功, 结果, 总能量, 签到结果是否经过确认)。
+        按 NODELOC_MODE 选择签到方式：
+          auto    先走纯 HTTP，HTTP 登录失败时回退到浏览器（默认）；
+                  签到请求发出后不再回退，避免重复签到
+          http    只走纯 HTTP
+          browser 只走浏览器
+        """
         try:
             logger.info(f"--- 开始处理账号: {self.username} ---")
-            if self.login():
-                self.checkin()
-                info = self.get_points_info()
-                
-                if info:
-                    if info['reward'] != "未知":
-                        # 这里的文案对应 "签到成功！您获得了 +5 能量"
-                        result_msg = f"签到成功！您获得了 {info['reward']} 能量"
+            mode = os.getenv('NODELOC_MODE', 'auto').strip().lower()
+            info = None
+            done = False
+            
+            if mode in ('auto', 'http'):
+                session = self.new_session()
+                try:
+                    try:
+                        csrf_token = self.login_http(session)
+                    except Exception as e:
+                        # 登录被拒绝或接口结构变化时回退到浏览器
+                        if mode == 'http':
+                            raise Exception(f"HTTP 登录失败: {e}")
+                        logger.warning(f"HTTP 登录失败，回退到浏览器模式: {e}")
                     else:
-                        result_msg = "今日已签到 (无新增记录)"
-                    balance_msg = info['total']
+                        info = self.run_http(session, csrf_token)
+                        done = True
+                finally:
+                    session.close()
+            
+            if not done:
+                info = self.run_browser()
+            
+            if info:
+                if info['reward'] != "未知":
+                    # 这里的文案对应 "签到成功！您获得了 +5 能量"
+                    result_msg = f"签到成功！您获得了 {info['reward']} 能量"
+                elif info.get('checked_in'):
+                    # 签到接口返回 200，但积分记录中还没有本次奖励
+                    result_msg = "签到成功 (未找到奖励记录)"
                 else:
-                    result_msg = "签到完成 (无法获取详情)"
-                    balance_msg = "未知"
-                
-                logger.info(f"{result_msg}, 总能量: {balance_msg}")
-                return True, result_msg, balance_msg
+                    result_msg = "今日已签到 (无新增记录)"
+                balance_msg = info['total']
             else:
-                raise Exception("登录失败")
+                result_msg = "签到完成 (无法获取详情)"
+                balance_msg = "未知"
+            
+            # 签到接口返回 200 / 422，或积分记录中有签到奖励时才算确认；
+            # 浏览器模式下没有奖励记录（"无新增记录"、"无法获取详情"）不能确认是否已签到
+            confirmed = bool(info) and ('checked_in' in info or info['reward'] != "未知")
+            logger.info(f"{result_msg}, 总能量: {balance_msg}")
+            return True, result_msg, balance_msg, confirmed
         except Exception as e:
-            return False, f"执行异常: {str(e)}", "未知"
+            self.close_driver(discard=True)
+            return False, f"执行异常: {str(e)}", "未知", False
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.close_driver()
 
 class MultiAccountManager:
-    def __init__(self):
-        self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
-        self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
+    def __init__(self, shard=None):
+        self.notifier = TelegramDispatcher.from_env()
         self.accounts = self.load_accounts()
+        # 分片模式：只处理本分片的账号，记录它们在完整列表中的序号，合并时按原顺序排列
+        self.shard = shard
+        self.shard_indexes = None
+        if shard:
+            self.accounts, self.shard_indexes = select(self.accounts, "nodeloc", "username", shard)
+        # 进度模式：已完成账号的结果，按账号顺序存放，未完成的为 None
+        self.progress_results = [None] * len(self.accounts)
+        # 分片模式下由合并步骤统一发送汇总，不发送进度消息
+        self.progress = LiveProgress.from_env(self.notifier, self.render_progress) if not shard else None
     
     def load_accounts(self):
+        # 配置了账号文件（NODELOC_ACCOUNTS_FILE / ACCOUNTS_FILE）时逐行读取，否则使用 NODELOC_ACCOUNTS
+        source = source_from_env("nodeloc", "username")
+        if source is not None:
+            return source
         accounts = []
         accounts_str = os.getenv('NODELOC_ACCOUNTS', '').strip()
         if accounts_str:
@@ -220,51 +520,152 @@ class MultiAccountManager:
                     accounts.append({'username': u.strip(), 'password': pw.strip()})
         return accounts
     
-    def send_notification(self, results):
-        if not self.telegram_bot_token or not self.telegram_chat_id:
-            return
-        
+    @staticmethod
+    def build_summary(results):
+        """返回 (标题, 各账号内容)"""
         # 1. 顶部统计信息
         success_count = sum(1 for _, success, _, _ in results if success)
         total_count = len(results)
         current_date = datetime.now().strftime("%Y-%m-%d")
         
-        message = f"🤖 NodeLoc 自动签到报告\n"
-        message += f"📅 日期: {current_date}\n"
-        message += f"📊 统计: 成功 {success_count}/{total_count}\n\n"
+        header = f"🤖 NodeLoc 自动签到报告\n"
+        header += f"📅 日期: {current_date}\n"
+        header += f"📊 统计: 成功 {success_count}/{total_count}\n"
         
-        # 2. 账号详情
+        # 2. 账号详情，每个账号一段，超长时在账号之间拆分
+        blocks = []
         for username, success, result, balance in results:
             # 隐藏部分用户名
             masked_user = username[:2] + "***" if len(username) > 2 else username
             
-            message += f"账号：{masked_user}\n"
-            
-            if success:
-                message += f"✅ {result}\n"
-                message += f"💰 当前总能量：{balance}\n\n"
-            else:
-                message += f"❌ {result}\n"
-                message += f"💰 当前总能量：{balance}\n\n"
+            block = f"账号：{masked_user}\n"
+            block += f"✅ {result}\n" if success else f"❌ {result}\n"
+            block += f"💰 当前总能量：{balance}"
+            blocks.append(block)
+        return header, blocks
+    
+    def render_progress(self):
+        """进度消息：已完成账号的汇总 + 进度"""
+        done = [r for r in self.progress_results if r]
+        header, blocks = self.build_summary(done)
+        header += f"⏳ 进度: {len(done)}/{len(self.accounts)}\n"
+        return header, blocks
+    
+    def record_progress(self, index, outcome):
+        """记录第 index 个账号（从 0 开始）的结果并更新进度消息，原样返回结果"""
+        self.progress_results[index] = outcome
+        if self.progress:
+            self.progress.update()
+        return outcome
+    
+    def send_notification(self, results):
+        if self.shard:
+            # 分片模式只保存本分片的结果，由 --merge 合并后统一发送
+            write_results("nodeloc", self.shard, zip(self.shard_indexes, results), peaks=site_peaks("nodeloc"))
+            return
         
-        # 发送
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage",
-                data={"chat_id": self.telegram_chat_id, "text": message}
-            )
-            logger.info("Telegram通知已发送")
-        except Exception as e:
-            logger.error(f"发送通知失败: {e}")
+        if not self.notifier:
+            return
+        
+        # 后台发送，与关闭浏览器池同时进行；进度模式下把进度消息编辑为最终汇总
+        header, blocks = self.build_summary(results)
+        header += summary_line(site_peaks("nodeloc"))
+        if self.progress:
+            self.progress.finish(header, blocks)
+        else:
+            self.notifier.send_summary(header, blocks)
+
+    def process_account(self, acc, pool, session_store, daily_state):
+        """处理单个账号，返回 (用户名, 是否成功, 结果, 总能量)"""
+        # 账号之间的间隔由限速器控制，遇到限流会自动放慢
+        limiter = get_limiter("nodeloc")
+        limiter.acquire_account()
+        
+        handler = NodeLocAutoCheckin(
+            acc['username'], acc['password'],
+            pool=pool, session_store=session_store,
+            proxy=acc.get('proxy')
+        )
+        with metrics.account("nodeloc", acc['username']):
+            success, result, balance, confirmed = handler.run()
+            metrics.set_outcome(success)
+        if success:
+            limiter.on_success()
+        # 只记录确认过的结果，未确认的账号下次运行时重新检查
+        if confirmed and daily_state:
+            daily_state.mark_done("nodeloc", acc['username'], result, balance)
+        elif success:
+            logger.warning(f"{acc['username']} 签到结果未确认，不记入今日状态")
+        return acc['username'], success, result, balance
 
     def run_all(self):
-        results = []
-        for acc in self.accounts:
-            handler = NodeLocAutoCheckin(acc['username'], acc['password'])
-            success, result, balance = handler.run()
-            results.append((acc['username'], success, result, balance))
-            time.sleep(random.uniform(3, 8))
-        self.send_notification(results)
+        results = [None] * len(self.accounts)
+        pool = pool_from_env(create_driver, origins=[get_base_url()])
+        session_store = store_from_env()
+        daily_state = state_from_env()
+        
+        # 启用计划时每个账号到了分配的时间才开始处理，当天已签到的账号不等待
+        plan = plan_from_env("nodeloc")
+        if plan:
+            order = plan.iter_due(
+                [acc['username'] for acc in self.accounts],
+                ready=lambda username: bool(daily_state and daily_state.get("nodeloc", username)),
+            )
+        else:
+            order = ((i, acc['username']) for i, acc in enumerate(self.accounts))
+        
+        if self.progress:
+            self.progress.start()
+        try:
+            for i, _ in order:
+                acc = self.accounts[i]
+                # 今日已签到成功的账号直接使用记录，不登录也不启动浏览器
+                record = daily_state.get("nodeloc", acc['username']) if daily_state else None
+                if record:
+                    logger.info(f"{acc['username']} 今日已完成签到，跳过")
+                    with metrics.account("nodeloc", acc['username']):
+                        metrics.count("skipped")
+                        metrics.set_outcome(True)
+                    results[i] = self.record_progress(
+                        i, (acc['username'], True, record['message'] or "今日已签到", record['balance'] or "未知")
+                    )
+                    continue
+                
+                results[i] = self.record_progress(i, self.process_account(acc, pool, session_store, daily_state))
+            
+            # 失败的账号按退避间隔重试，不重复处理已成功的账号
+            queue = RetryQueue.from_env()
+            for i, (username, success, result, _) in enumerate(results):
+                if not success:
+                    queue.push(i, result, label=username)
+            for i, attempt in queue.drain():
+                logger.info(f"第 {attempt} 次尝试账号: {self.accounts[i]['username']}")
+                results[i] = self.record_progress(
+                    i, self.process_account(self.accounts[i], pool, session_store, daily_state)
+                )
+                if not results[i][1]:
+                    queue.push(i, results[i][2], label=results[i][0])
+            
+            self.send_notification(results)
+        finally:
+            if pool:
+                pool.close()
+            if daily_state:
+                daily_state.close()
+        
+        # 输出耗时统计
+        metrics.write_reports()
+        
+        # 等待通知发送完成
+        if self.notifier:
+            self.notifier.close()
+
+def main():
+    args = parse_cli()
+    if args.merge:
+        merge_and_notify("nodeloc", args.merge, MultiAccountManager.build_summary)
+        return
+    MultiAccountManager(shard=args.shard).run_all()
 
 if __name__ == "__main__":
-    MultiAccountManager().run_all()
+    main()
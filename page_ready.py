@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+页面就绪等待工具
+
+用事件驱动的轮询代替固定的 time.sleep：页面达到所需状态（文档加载完成、
+目标元素出现、URL 变化、网络空闲）就立即返回，原来的睡眠时长只作为超时上限。
+所有函数超时后都不抛异常，而是返回 False / None，由调用方决定后续处理。
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.2
+
+# 返回文档状态和已加载的资源数量，资源数量一段时间不再增长即视为网络空闲
+NETWORK_STATE_SCRIPT = """
+var entries = performance.getEntriesByType('resource').length;
+return [document.readyState, entries];
+"""
+
+
+def wait_until(driver, condition, timeout=10, poll=POLL_INTERVAL):
+    """反复执行 condition(driver)，返回第一个真值；超时返回 None"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            value = condition(driver)
+            if value:
+                return value
+        except Exception:
+            pass
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll)
+
+
+def wait_document_ready(driver, timeout=10):
+    """等待 document.readyState == 'complete'"""
+    ready = wait_until(
+        driver,
+        lambda d: d.execute_script("return document.readyState") == "complete",
+        timeout,
+    )
+    if not ready:
+        logger.debug(f"等待文档加载超时 ({timeout}s)")
+    return bool(ready)
+
+
+def wait_url(driver, predicate, timeout=10):
+    """等待当前 URL 满足 predicate(url)，返回当前 URL；超时返回 None"""
+    return wait_until(
+        driver,
+        lambda d: d.current_url if predicate(d.current_url) else None,
+        timeout,
+    )
+
+
+def wait_url_change(driver, old_url, timeout=10):
+    """等待 URL 从 old_url 变为其他地址"""
+    return wait_url(driver, lambda url: url != old_url, timeout)
+
+
+def wait_present(driver, by, value, timeout=10):
+    """等待元素出现并返回该元素；超时返回 None"""
+    def find(d):
+        elements = d.find_elements(by, value)
+        return elements[0] if elements else None
+
+    return wait_until(driver, find, timeout)
+
+
+def wait_network_idle(driver, timeout=10, idle_time=0.5):
+    """
+    等待网络空闲：文档加载完成，且资源请求数在 idle_time 内不再增长。
+    超时返回 False。
+    """
+    deadline = time.monotonic() + timeout
+    last_count = None
+    stable_since = None
+
+    while True:
+        now = time.monotonic()
+        try:
+            state, count = driver.execute_script(NETWORK_STATE_SCRIPT)
+        except Exception:
+            state, count = None, None
+
+        if state == "complete" and count == last_count:
+            if stable_since is None:
+                stable_since = now
+            if now - stable_since >= idle_time:
+                return True
+        else:
+            stable_since = None
+        last_count = count
+
+        if now >= deadline:
+            logger.debug(f"等待网络空闲超时 ({timeout}s)")
+            return False
+        time.sleep(POLL_INTERVAL)
+
+
+# 在页面内同时等待多个选择器：先检查一次，未命中则用 MutationObserver 监听 DOM 变化，
+# 任意一个选择器命中（按列表顺序优先）即返回，只需要一次 WebDriver 往返
+WAIT_FOR_ANY_SCRIPT = """
+var selectors = arguments[0];
+var timeoutMs = arguments[1];
+var requireVisible = arguments[2];
+var done = arguments[arguments.length - 1];
+
+function isVisible(el) {
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden') return false;
+    var rect = el.getBoundingClientRect();
+    return rect.width > 0 || rect.height > 0;
+}
+
+function findFirst(selector) {
+    var nodes = [];
+    try {
+        if (selector.indexOf('//') === 0 || selector.indexOf('(//') === 0) {
+            var snapshot = document.evaluate(selector, document, null,
+                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (var i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+        } else {
+            nodes = document.querySelectorAll(selector);
+        }
+    } catch (e) {
+        return null;
+    }
+    for (var j = 0; j < nodes.length; j++) {
+        if (nodes[j].nodeType === 1 && (!requireVisible || isVisible(nodes[j]))) return nodes[j];
+    }
+    return null;
+}
+
+function check() {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = findFirst(selectors[i]);
+        if (el) {
+            return {
+                index: i,
+                selector: selectors[i],
+                element: el,
+                text: (el.innerText || el.textContent || el.value || '').trim(),
+                enabled: !el.disabled && el.getAttribute('aria-disabled') !== 'true'
+            };
+        }
+    }
+    return null;
+}
+
+var hit = check();
+if (hit) { done(hit); return; }
+
+var finished = false;
+var timer = null;
+var observer = new MutationObserver(function () {
+    if (finished) return;
+    var result = check();
+    if (result) {
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        done(result);
+    }
+});
+observer.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, characterData: true
+});
+timer = setTimeout(function () {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    done(null);
+}, timeoutMs);
+"""
+
+
+def wait_for_any(driver, selectors, timeout=10, visible=True):
+    """
+    同时等待多个选择器（CSS 或以 // 开头的 XPath），返回第一个命中的结果：
+      {"index", "selector", "element", "text", "enabled"}
+    多个同时存在时按列表顺序优先。最坏耗时为 timeout，而不是每个选择器超时之和。
+    超时返回 None。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            driver.set_script_timeout(remaining + 5)
+            return driver.execute_async_script(
+                WAIT_FOR_ANY_SCRIPT, list(selectors), int(remaining * 1000), visible
+            )
+        except Exception as e:
+            # 等待期间页面发生跳转会中断脚本，在新页面上继续等待剩余时间
+            logger.debug(f"等待选择器时脚本中断，重试: {e}")
+            time.sleep(POLL_INTERVAL)
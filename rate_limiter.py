@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+按站点的自适应限速
+
+每个站点一个限速器，所有并发处理的账号共用，包含两个令牌桶：
+  - 账号桶：控制开始处理（登录）新账号的速度，替代原来账号之间的固定等待
+  - 请求桶：控制 HTTP 请求和浏览器页面跳转的速度
+
+速率按 AIMD 自适应：请求正常时缓慢提速（最高为基础速率的 RATE_LIMIT_MAX_FACTOR 倍），
+遇到 429 或 403/503 质询页（Cloudflare 等）时速率减半，并按 Retry-After 暂停。
+requests 会话从响应中判断；浏览器每次打开页面后读取主文档的状态码（Navigation Timing）和页面开头的内容判断。
+
+环境变量：
+  RATE_LIMIT                 设为 off 时不限速
+  RATE_LIMIT_<站点>_ACCOUNTS  每分钟开始处理的账号数，默认 12（即每 5 秒一个）
+  RATE_LIMIT_<站点>_RPS       每秒请求数，默认 5
+  RATE_LIMIT_MAX_FACTOR      健康时最多提速到基础速率的几倍，默认 4
+"""
+
+import os
+import time
+import logging
+import threading
+
+from run_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 速率调整参数
+MIN_FACTOR = 0.1
+INCREASE_STEP = 0.05
+DECREASE_RATIO = 0.5
+# 没有 Retry-After 时，被限流后暂停的秒数
+DEFAULT_COOLDOWN = 10.0
+
+CHALLENGE_MARKERS = ("just a moment", "attention required", "cf-chl", "challenge-platform", "captcha")
+# 取不到状态码时只认这些质询页特有的标记（登录页上的验证码不算）
+STRONG_CHALLENGE_MARKERS = ("just a moment", "cf-chl", "challenge-platform")
+
+# 浏览器打开页面后读取主文档状态码和页面开头的内容；responseStatus 需要 Chrome 109+，取不到时为 0
+PAGE_STATUS_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var root = document.documentElement;
+return {
+    status: (nav && nav.responseStatus) || 0,
+    body: ((document.title || '') + ' ' + (root ? root.outerHTML.slice(0, 2000) : '')).toLowerCase()
+};
+"""
+
+
+def looks_throttled(status: int, body: str) -> bool:
+    """429 一律视为限流；403/503 只有在像质询页时才算，普通的未登录 403 不算"""
+    if status == 429:
+        return True
+    if status in (403, 503):
+        return any(marker in body for marker in CHALLENGE_MARKERS)
+    if not status:
+        return any(marker in body for marker in STRONG_CHALLENGE_MARKERS)
+    return False
+
+
+def is_throttled(response) -> bool:
+    status = response.status_code
+    if status in (403, 503) and response.headers.get("cf-mitigated"):
+        return True
+    if status not in (403, 429, 503):
+        return False
+    try:
+        body = response.text[:2000].lower()
+    except Exception:
+        body = ""
+    return looks_throttled(status, body)
+
+
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After", "")
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, rate: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def reserve(self, now: float, rate: float) -> float:
+        """预留一个令牌，返回需要等待的秒数（令牌可以暂时为负，后来者排在后面）"""
+        self.refill(now, rate)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / rate
+
+
+class SiteRateLimiter:
+    def __init__(self, site: str, accounts_per_minute=12.0, requests_per_second=5.0, max_factor=4.0, enabled=True):
+        self.site = site
+        self.enabled = enabled
+        self.max_factor = max(1.0, max_factor)
+        self.factor = 1.0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self.accounts = TokenBucket(max(accounts_per_minute, 0.1) / 60.0, burst=1)
+        self.requests = TokenBucket(max(requests_per_second, 0.1), burst=max(1.0, requests_per_second))
+
+    def _acquire(self, bucket: TokenBucket) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, bucket.reserve(now, bucket.rate * self.factor))
+        if wait > 0:
+            time.sleep(wait)
+
+    def acquire_account(self) -> None:
+        """开始处理一个账号前调用"""
+        self._acquire(self.accounts)
+
+    def refund_account(self) -> None:
+        """账号还没访问站点就出错（例如浏览器启动失败）时退回令牌，下一个账号不必等待"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.accounts.tokens = min(self.accounts.burst, self.accounts.tokens + 1)
+
+    def acquire_request(self) -> None:
+        """发出一个请求或打开一个页面前调用"""
+        self._acquire(self.requests)
+
+    def _set_factor(self, factor: float) -> None:
+        # 先按旧速率补充令牌，再切换速率
+        now = time.monotonic()
+        self.accounts.refill(now, self.accounts.rate * self.factor)
+        self.requests.refill(now, self.requests.rate * self.factor)
+        self.factor = factor
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.factor < self.max_factor:
+                self._set_factor(min(self.max_factor, self.factor + INCREASE_STEP))
+
+    def on_throttle(self, retry_after=None) -> None:
+        cooldown = DEFAULT_COOLDOWN if retry_after is None else retry_after
+        with self._lock:
+            self._set_factor(max(MIN_FACTOR, self.factor * DECREASE_RATIO))
+            self.paused_until = max(self.paused_until, time.monotonic() + cooldown)
+            factor = self.factor
+        metrics.count("throttled")
+        logger.warning(f"[{self.site}] 触发限流，降速到基础速率的 {factor:.2f} 倍，暂停 {cooldown:.0f} 秒")
+
+    def observe(self, response) -> None:
+        if is_throttled(response):
+            self.on_throttle(retry_after_seconds(response))
+        elif response.status_code < 400:
+            self.on_success()
+
+    def instrument_session(self, session) -> None:
+        """requests.Session 每次请求前取令牌，响应后根据状态调整速率"""
+        if not self.enabled or getattr(session, "_rate_limited", False):
+            return
+        original = session.request
+
+        def request(method, url, *args, **kwargs):
+            self.acquire_request()
+            return original(method, url, *args, **kwargs)
+
+        def on_response(response, *args, **kwargs):
+            self.observe(response)
+
+        session.request = request
+        session.hooks["response"].append(on_response)
+        session._rate_limited = True
+
+    def observe_page(self, driver) -> None:
+        """浏览器打开页面后调用：主文档 429 或质询页时降速，正常时提速"""
+        try:
+            page = driver.execute_script(PAGE_STATUS_SCRIPT) or {}
+        except Exception as e:
+            logger.debug(f"读取页面状态失败: {e}")
+            return
+        status = int(page.get("status") or 0)
+        if looks_throttled(status, page.get("body") or ""):
+            self.on_throttle()
+        elif 0 < status < 400:
+            self.on_success()
+
+    def instrument_driver(self, driver) -> None:
+        """浏览器打开页面（get 命令）前取令牌，打开后根据主文档状态和内容调整速率"""
+        if not self.enabled or getattr(driver, "_rate_limited", False):
+            return
+        original = driver.execute
+
+        def execute(driver_command, params=None):
+            if driver_command != "get":
+                return original(driver_command, params)
+            url = (params or {}).get("url", "")
+            # 空白页不经过站点，不取令牌
+            if url.startswith(("about:", "data:")):
+                return original(driver_command, params)
+            self.acquire_request()
+            try:
+                return original(driver_command, params)
+            finally:
+                self.observe_page(driver)
+
+        driver.execute = execute
+        driver._rate_limited = True
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"{name} 配置无效: {value}，使用默认值 {default}")
+        return default
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(site: str) -> SiteRateLimiter:
+    """进程内每个站点共享一个限速器"""
+    with _limiters_lock:
+        if site not in _limiters:
+            prefix = f"RATE_LIMIT_{site.upper()}"
+            _limiters[site] = SiteRateLimiter(
+                site,
+                accounts_per_minute=_env_float(f"{prefix}_ACCOUNTS", 12.0),
+                requests_per_second=_env_float(f"{prefix}_RPS", 5.0),
+                max_factor=_env_float("RATE_LIMIT_MAX_FACTOR", 4.0),
+                enabled=os.getenv("RATE_LIMIT", "on").strip().lower() != "off",
+            )
+        return _limiters[site]
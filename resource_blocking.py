@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+资源拦截配置
+
+脚本只关心页面中的文字和按钮，图片、字体、媒体和统计脚本都不需要下载。
+通过 Chrome 偏好设置禁用图片，并用 CDP Network.setBlockedURLs 拦截其余资源，
+每个站点可以配置白名单，保证脚本依赖的元素仍然正常渲染。
+
+环境变量：
+  BLOCK_RESOURCES        拦截级别：off（默认）/ light / aggressive
+  BLOCK_RESOURCES_ALLOW  额外的白名单（逗号分隔的 URL 通配符，匹配的规则不会生效）
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif"]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+MEDIA_PATTERNS = ["*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg"]
+TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*hm.baidu.com*",
+    "*clarity.ms*",
+    "*cloudflareinsights.com*",
+    "*sentry.io*",
+]
+
+PROFILES = {
+    "off": [],
+    "light": IMAGE_PATTERNS + FONT_PATTERNS + MEDIA_PATTERNS,
+    "aggressive": IMAGE_PATTERNS + FONT_PATTERNS + MEDIA_PATTERNS + TRACKER_PATTERNS,
+}
+
+# 各站点必须保留的资源（URL 通配符），页面结构依赖某类资源时在这里添加
+SITE_ALLOWLISTS = {
+    "leaflow": [],
+    "mjjbox": [],
+    "nodeloc": [],
+}
+
+# 统计页面传输量和可交互时间
+PAGE_STATS_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0] || {};
+var resources = performance.getEntriesByType('resource');
+var bytes = nav.transferSize || 0;
+for (var i = 0; i < resources.length; i++) { bytes += resources[i].transferSize || 0; }
+return {
+    url: location.href,
+    bytes: bytes,
+    resources: resources.length,
+    interactive_ms: Math.round(nav.domInteractive || 0),
+    load_ms: Math.round(nav.loadEventEnd || 0)
+};
+"""
+
+
+def get_profile() -> str:
+    profile = os.getenv("BLOCK_RESOURCES", "off").strip().lower()
+    if profile not in PROFILES:
+        logger.warning(f"未知的资源拦截级别: {profile}，不拦截资源")
+        return "off"
+    return profile
+
+
+def blocked_patterns(site: str, profile: str = None) -> list:
+    """根据拦截级别和站点白名单计算最终要拦截的 URL 规则"""
+    profile = profile or get_profile()
+    allow = set(SITE_ALLOWLISTS.get(site, []))
+    extra = os.getenv("BLOCK_RESOURCES_ALLOW", "")
+    allow.update(p.strip() for p in extra.split(",") if p.strip())
+    return [p for p in PROFILES[profile] if p not in allow]
+
+
+def configure_options(chrome_options, site: str) -> None:
+    """创建浏览器前调用：拦截图片时直接关闭图片加载"""
+    patterns = blocked_patterns(site)
+    if set(IMAGE_PATTERNS) - {"*.svg"} <= set(patterns):
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+        })
+
+
+def apply_blocking(driver, site: str) -> None:
+    """创建浏览器后调用：通过 CDP 拦截其余资源"""
+    patterns = blocked_patterns(site)
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.info(f"已启用资源拦截（{get_profile()}），共 {len(patterns)} 条规则")
+    except Exception as e:
+        logger.warning(f"启用资源拦截失败: {e}")
+
+
+def report_page(driver, label: str):
+    """记录当前页面的传输量和可交互时间，返回统计字典"""
+    try:
+        stats = driver.execute_script(PAGE_STATS_SCRIPT)
+    except Exception as e:
+        logger.debug(f"获取页面统计失败: {e}")
+        return None
+
+    logger.info(
+        f"页面[{label}] 传输 {stats['bytes'] / 1024:.1f} KB，"
+        f"资源 {stats['resources']} 个，"
+        f"可交互 {stats['interactive_ms']} ms"
+    )
+    return stats
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+失败账号重试队列
+
+第一轮处理完所有账号后，把失败的账号放进队列，按指数退避在同一次运行中重试，
+健康账号不会被重复处理。失败原因按错误信息分类：
+  auth     密码错误、二次验证、权限不足等，重试无意义
+  network  超时、连接失败、浏览器崩溃、页面加载失败等，通常是临时问题
+  layout   找不到元素等页面结构问题，重试一般也无济于事
+  unknown  无法归类
+默认只重试 network 和 unknown。
+
+环境变量：
+  RETRY_MAX_ATTEMPTS   每个账号最多尝试次数（含第一次），默认 3；1 表示不重试
+  RETRY_BASE_DELAY     第一次重试前等待的秒数，之后每次翻倍，默认 30
+  RETRY_MAX_DELAY      单次等待上限（秒），默认 300
+  RETRY_CLASSES        需要重试的错误类别，逗号分隔，默认 network,unknown
+"""
+
+import os
+import time
+import heapq
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 按顺序匹配，先命中的类别生效（"HTTP 登录失败，状态码 502" 和 "页面加载失败，无法找到元素" 都归为 network）
+ERROR_KEYWORDS = (
+    ("network", (
+        "timeout", "timed out", "超时", "加载失败", "connection", "连接", "net::err", "err_",
+        "chrome not reachable", "disconnected", "invalid session id", "session deleted",
+        "crash", "max retries", "remote end closed", "502", "503", "504", "429",
+    )),
+    ("auth", (
+        "登录失败", "密码错误", "密码不正确", "incorrect password", "二次验证", "second factor",
+        "权限不足", "未登录", "unauthenticated", "unauthorized", "invalid credentials", "(401)", "(403)",
+    )),
+    ("layout", (
+        "找不到", "未找到", "no such element", "unable to locate", "stale element",
+        "not interactable", "结构变化",
+    )),
+)
+
+# 按异常类名归类（不需要导入 selenium / requests）
+EXCEPTION_CLASSES = {
+    "DiscourseLoginError": "auth",
+    "TimeoutException": "network",
+    "WebDriverException": "network",
+    "ConnectionError": "network",
+    "Timeout": "network",
+    "ReadTimeout": "network",
+    "ConnectTimeout": "network",
+    "NoSuchElementException": "layout",
+    "StaleElementReferenceException": "layout",
+    "ElementNotInteractableException": "layout",
+}
+
+
+def classify_error(error) -> str:
+    """把异常或错误信息归类为 auth / network / layout / unknown"""
+    if isinstance(error, BaseException):
+        for cls in type(error).__mro__:
+            if cls.__name__ in EXCEPTION_CLASSES:
+                return EXCEPTION_CLASSES[cls.__name__]
+    text = str(error or "").lower()
+    for category, keywords in ERROR_KEYWORDS:
+        if any(k in text for k in keywords):
+            return category
+    return "unknown"
+
+
+def _env_number(name: str, default, cast=float):
+    value = os.getenv(name, str(default)).strip()
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"{name} 配置无效: {value}，使用默认值 {default}")
+        return default
+
+
+class RetryQueue:
+    def __init__(self, max_attempts=3, base_delay=30.0, max_delay=300.0, retry_classes=("network", "unknown")):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_classes = set(retry_classes)
+        # key -> 已失败次数
+        self.attempts = {}
+        # (可以重试的时间, 序号, key)
+        self._heap = []
+        self._seq = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryQueue":
+        classes = os.getenv("RETRY_CLASSES", "network,unknown")
+        return cls(
+            max_attempts=_env_number("RETRY_MAX_ATTEMPTS", 3, int),
+            base_delay=_env_number("RETRY_BASE_DELAY", 30.0),
+            max_delay=_env_number("RETRY_MAX_DELAY", 300.0),
+            retry_classes=[c.strip() for c in classes.split(",") if c.strip()],
+        )
+
+    def backoff(self, failures: int) -> float:
+        """第 n 次失败后的等待时间：base * 2^(n-1)，加 ±20% 抖动，不超过上限"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (failures - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def push(self, key, error, label: str = "") -> bool:
+        """记录一次失败；可以重试时加入队列并返回 True"""
+        failures = self.attempts.get(key, 0) + 1
+        self.attempts[key] = failures
+        category = classify_error(error)
+        label = label or str(key)
+
+        if category not in self.retry_classes:
+            logger.info(f"[重试] {label} 失败类型为 {category}，不重试")
+            return False
+        if failures >= self.max_attempts:
+            logger.warning(f"[重试] {label} 已尝试 {failures} 次，放弃")
+            return False
+
+        delay = self.backoff(failures)
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, key))
+        self._seq += 1
+        logger.info(f"[重试] {label} 失败类型为 {category}，{delay:.0f} 秒后进行第 {failures + 1} 次尝试")
+        return True
+
+    def drain(self):
+        """
+        依次产出到期的 (key, 第几次尝试)，没有到期的就等待。
+        遍历过程中可以继续 push，失败的账号会按更长的间隔重新排队。
+        """
+        while self._heap:
+            ready_at, _, key = heapq.heappop(self._heap)
+            wait = ready_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            yield key, self.attempts[key] + 1
+
+    def __len__(self):
+        return len(self._heap)
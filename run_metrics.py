@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+分阶段耗时统计
+
+按 站点 / 账号 / 阶段 记录耗时（浏览器启动、登录、签到、结果读取、余额查询……），
+并统计每个账号发出的 WebDriver 命令数、HTTP 请求数和峰值（例如浏览器内存，见 memory_profile.py）。运行结束时输出：
+  - JSON 报告（每个账号的明细 + 每个站点各阶段的 p50 / p95）
+  - Prometheus textfile collector 格式文件（summary 类型，按站点和阶段聚合；峰值按站点输出 p50 / p95 / 最大值）
+
+环境变量：
+  METRICS_JSON       JSON 报告路径（不设置则不输出）
+  METRICS_PROM_FILE  Prometheus textfile 路径（不设置则不输出），例如
+                     /var/lib/node_exporter/textfile/checkin.prom
+"""
+
+import os
+import json
+import math
+import hashlib
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+def mask_account(account: str) -> str:
+    """报告中只保留账号前 3 位，附加短哈希区分前缀相同的账号"""
+    if not account:
+        return ""
+    digest = hashlib.sha1(account.encode("utf-8")).hexdigest()[:6]
+    return f"{account[:3]}***{digest}"
+
+
+def percentile(values, q):
+    """最近秩法分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+        # [{"site", "account", "phase", "seconds", "ok"}]
+        self.phases = []
+        # (site, account) -> {"webdriver_commands": n, "http_requests": n}
+        self.counters = defaultdict(lambda: defaultdict(int))
+        # (site, account) -> {"browser_peak_rss_bytes": n}
+        self.peaks = defaultdict(dict)
+        # (site, account) -> 是否成功
+        self.outcomes = {}
+
+    def reset(self, site: str = None) -> None:
+        """
+        清空已记录的数据（同一进程内多轮运行时使用）。
+        指定 site 时只清空该站点的数据，其他站点正在进行或上一轮的统计保留
+        """
+        with self._lock:
+            if site is None:
+                self.started_at = time.time()
+                self.phases = []
+                self.counters = defaultdict(lambda: defaultdict(int))
+                self.peaks = defaultdict(dict)
+                self.outcomes = {}
+                return
+            self.phases = [item for item in self.phases if item["site"] != site]
+            for records in (self.counters, self.peaks, self.outcomes):
+                for key in [key for key in records if key[0] == site]:
+                    del records[key]
+
+    # ========== 账号上下文 ==========
+
+    def current(self):
+        return getattr(self._local, "context", None)
+
+    @contextmanager
+    def account(self, site: str, account: str):
+        """在当前线程中标记正在处理的账号，并记录该账号的总耗时"""
+        previous = self.current()
+        self._local.context = (site, mask_account(account))
+        try:
+            with self.phase("total"):
+                yield
+        finally:
+            self._local.context = previous
+
+    def set_outcome(self, success: bool) -> None:
+        context = self.current()
+        if context:
+            with self._lock:
+                self.outcomes[context] = bool(success)
+
+    # ========== 阶段计时与计数 ==========
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个阶段的耗时；不在账号上下文中时不记录"""
+        context = self.current()
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            if context:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.phases.append({
+                        "site": context[0],
+                        "account": context[1],
+                        "phase": name,
+                        "seconds": round(elapsed, 3),
+                        "ok": ok,
+                    })
+
+    def count(self, kind: str, n: int = 1) -> None:
+        context = self.current()
+        if context:
+            with self._lock:
+                self.counters[context][kind] += n
+
+    def record_peak(self, kind: str, value) -> None:
+        """记录当前账号的峰值，多次记录时保留最大值"""
+        context = self.current()
+        if context:
+            with self._lock:
+                self.peaks[context][kind] = max(self.peaks[context].get(kind, 0), value)
+
+    def peak_values(self, site: str, kind: str) -> list:
+        with self._lock:
+            return [peaks[kind] for (s, _), peaks in self.peaks.items() if s == site and kind in peaks]
+
+    def instrument_driver(self, driver) -> None:
+        """统计 WebDriver 命令数：所有命令都经过 driver.execute"""
+        if getattr(driver, "_metrics_instrumented", False):
+            return
+        original = driver.execute
+
+        def execute(driver_command, params=None):
+            self.count("webdriver_commands")
+            return original(driver_command, params)
+
+        driver.execute = execute
+        driver._metrics_instrumented = True
+
+    def instrument_session(self, session) -> None:
+        """统计 requests.Session 发出的 HTTP 请求数"""
+        if getattr(session, "_metrics_instrumented", False):
+            return
+
+        def on_response(response, *args, **kwargs):
+            self.count("http_requests")
+
+        session.hooks["response"].append(on_response)
+        session._metrics_instrumented = True
+
+    # ========== 报告 ==========
+
+    def phase_stats(self) -> dict:
+        """{site: {phase: {"count", "sum", "p50", "p95"}}}"""
+        grouped = defaultdict(lambda: defaultdict(list))
+        with self._lock:
+            for item in self.phases:
+                grouped[item["site"]][item["phase"]].append(item["seconds"])
+
+        stats = {}
+        for site, phases in grouped.items():
+            stats[site] = {
+                phase: {
+                    "count": len(values),
+                    "sum": round(sum(values), 3),
+                    "p50": percentile(values, 0.5),
+                    "p95": percentile(values, 0.95),
+                }
+                for phase, values in phases.items()
+            }
+        return stats
+
+    def build_report(self) -> dict:
+        accounts = defaultdict(lambda: {"phases": [], "counters": {}, "peaks": {}})
+        with self._lock:
+            for item in self.phases:
+                key = (item["site"], item["account"])
+                accounts[key]["phases"].append({
+                    "phase": item["phase"],
+                    "seconds": item["seconds"],
+                    "ok": item["ok"],
+                })
+            for key, counters in self.counters.items():
+                accounts[key]["counters"] = dict(counters)
+            for key, peaks in self.peaks.items():
+                accounts[key]["peaks"] = dict(peaks)
+            outcomes = dict(self.outcomes)
+
+        return {
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "sites": self.phase_stats(),
+            "accounts": [
+                {
+                    "site": site,
+                    "account": account,
+                    "success": outcomes.get((site, account)),
+                    **detail,
+                }
+                for (site, account), detail in accounts.items()
+            ],
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP checkin_phase_duration_seconds Duration of each check-in phase in the last run.",
+            "# TYPE checkin_phase_duration_seconds summary",
+        ]
+        for site, phases in sorted(self.phase_stats().items()):
+            for phase, s in sorted(phases.items()):
+                labels = f'site="{site}",phase="{phase}"'
+                lines.append(f'checkin_phase_duration_seconds{{{labels},quantile="0.5"}} {s["p50"]}')
+                lines.append(f'checkin_phase_duration_seconds{{{labels},quantile="0.95"}} {s["p95"]}')
+                lines.append(f"checkin_phase_duration_seconds_sum{{{labels}}} {s['sum']}")
+                lines.append(f"checkin_phase_duration_seconds_count{{{labels}}} {s['count']}")
+
+        totals = defaultdict(lambda: defaultdict(int))
+        results = defaultdict(lambda: defaultdict(int))
+        peaks = defaultdict(lambda: defaultdict(list))
+        with self._lock:
+            for (site, _), counters in self.counters.items():
+                for kind, n in counters.items():
+                    totals[site][kind] += n
+            for (site, _), values in self.peaks.items():
+                for kind, value in values.items():
+                    peaks[kind][site].append(value)
+            for (site, _), success in self.outcomes.items():
+                results[site]["success" if success else "failure"] += 1
+
+        lines.append("# HELP checkin_commands Commands and requests issued in the last run.")
+        lines.append("# TYPE checkin_commands gauge")
+        for site, counters in sorted(totals.items()):
+            for kind, n in sorted(counters.items()):
+                lines.append(f'checkin_commands{{site="{site}",kind="{kind}"}} {n}')
+
+        for kind, sites in sorted(peaks.items()):
+            lines.append(f"# HELP checkin_{kind} Per-account peak {kind} in the last run.")
+            lines.append(f"# TYPE checkin_{kind} gauge")
+            for site, values in sorted(sites.items()):
+                for q in (0.5, 0.95, 1):
+                    lines.append(f'checkin_{kind}{{site="{site}",quantile="{q}"}} {percentile(values, q)}')
+
+        lines.append("# HELP checkin_accounts Accounts processed in the last run by result.")
+        lines.append("# TYPE checkin_accounts gauge")
+        for site, counts in sorted(results.items()):
+            for result, n in sorted(counts.items()):
+                lines.append(f'checkin_accounts{{site="{site}",result="{result}"}} {n}')
+
+        lines.append("# HELP checkin_last_run_timestamp_seconds Finish time of the last run.")
+        lines.append("# TYPE checkin_last_run_timestamp_seconds gauge")
+        lines.append(f"checkin_last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self) -> None:
+        for site, phases in sorted(self.phase_stats().items()):
+            for phase, s in sorted(phases.items()):
+                logger.info(
+                    f"[耗时统计] {site} {phase}: 次数 {s['count']}，"
+                    f"p50 {s['p50']:.2f}s，p95 {s['p95']:.2f}s"
+                )
+        with self._lock:
+            peaks = defaultdict(list)
+            for (site, _), values in self.peaks.items():
+                for kind, value in values.items():
+                    peaks[(site, kind)].append(value)
+        for (site, kind), values in sorted(peaks.items()):
+            logger.info(
+                f"[峰值统计] {site} {kind}: 账号 {len(values)}，"
+                f"p50 {percentile(values, 0.5)}，最大 {max(values)}"
+            )
+
+    def write_reports(self) -> None:
+        """按环境变量输出 JSON 报告和 Prometheus 文件（先写临时文件再替换）"""
+        self.log_summary()
+
+        json_path = os.getenv("METRICS_JSON", "")
+        if json_path:
+            _atomic_write(json_path, json.dumps(self.build_report(), ensure_ascii=False, indent=2))
+            logger.info(f"耗时报告已写入 {json_path}")
+
+        prom_path = os.getenv("METRICS_PROM_FILE", "")
+        if prom_path:
+            _atomic_write(prom_path, self.render_prometheus())
+            logger.info(f"Prometheus 指标已写入 {prom_path}")
+
+
+def _atomic_write(path: str, content: str) -> None:
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"写入 {path} 失败: {e}")
+
+
+# 进程内共享的统计实例
+metrics = RunMetrics()
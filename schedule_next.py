@@ -1,28 +1,64 @@
+"""
+为 Uptime Kuma 监控设置下一次触发的间隔（在明天的指定分钟窗口内随机选一个时间点）
+
+单个监控：
+  python schedule_next.py <start_minute> <end_minute> <monitor_id>
+
+批量模式（一次登录，在同一个连接上修改所有监控）：
+  python schedule_next.py --batch <文件>       文件为 - 时从标准输入读取
+  文件格式二选一：
+    JSON：[{"monitor_id": 12, "start_minute": 60, "end_minute": 120}, ...]
+    文本：每行 "start_minute end_minute monitor_id"，# 开头为注释
+
+环境变量：
+  KUMA_URL / KUMA_USER / KUMA_PASS
+  KUMA_TOKEN_FILE   登录 token 缓存文件，默认 .kuma_token；下次运行先用 token 登录，
+                    失效时再用账号密码登录。设为 off 时不缓存
+"""
+
 import os
 import sys
+import json
 import random
 from datetime import datetime, timedelta
 
 import pytz
-from uptime_kuma_api import UptimeKumaApi  # pip install uptime-kuma-api
 
 
-def calc_next_interval_seconds(start_minute: int, end_minute: int):
+TZ = pytz.timezone("Asia/Shanghai")
+
+
+def pick_run_time(day, start_minute: int, end_minute: int, earliest=None):
+    """在 day 当天（北京时间）[start_minute, end_minute] 窗口内随机选一个时间点，不早于 earliest"""
     if end_minute <= start_minute:
         raise ValueError("TIME_RANGE_END must be greater than TIME_RANGE_START")
 
-    tz = pytz.timezone("Asia/Shanghai")
-    now = datetime.now(tz)
-
-    tomorrow = (now + timedelta(days=1)).date()
-    base = tz.localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day, 0, 0, 0))
+    base = TZ.localize(datetime(day.year, day.month, day.day, 0, 0, 0))
 
     start = base + timedelta(minutes=start_minute)
     end = base + timedelta(minutes=end_minute)
+    if earliest is not None and earliest > start:
+        start = min(earliest, end)
 
     delta_seconds = int((end - start).total_seconds())
     offset = random.randint(0, delta_seconds)
-    next_run = start + timedelta(seconds=offset)
+    return start + timedelta(seconds=offset)
+
+
+def next_run_time(start_minute: int, end_minute: int, now=None, include_today: bool = True):
+    """下一次运行时间：今天的窗口还没结束时在剩余部分中选，否则选明天"""
+    now = now or datetime.now(TZ)
+    today = now.astimezone(TZ).date()
+    if include_today:
+        window_end = TZ.localize(datetime(today.year, today.month, today.day)) + timedelta(minutes=end_minute)
+        if now < window_end:
+            return pick_run_time(today, start_minute, end_minute, earliest=now)
+    return pick_run_time(today + timedelta(days=1), start_minute, end_minute)
+
+
+def calc_next_interval_seconds(start_minute: int, end_minute: int):
+    now = datetime.now(TZ)
+    next_run = next_run_time(start_minute, end_minute, now, include_today=False)
 
     interval_seconds = int((next_run - now).total_seconds())
     if interval_seconds < 20:
@@ -30,33 +66,115 @@ def calc_next_interval_seconds(start_minute: int, end_minute: int):
     return interval_seconds, next_run
 
 
+def load_batch(path: str):
+    """读取批量配置，返回 [(start_minute, end_minute, monitor_id), ...]"""
+    if path == "-":
+        content = sys.stdin.read()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+    if content.lstrip().startswith("["):
+        return [
+            (int(item["start_minute"]), int(item["end_minute"]), int(item["monitor_id"]))
+            for item in json.loads(content)
+        ]
+
+    monitors = []
+    for lineno, line in enumerate(content.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts = line.replace(",", " ").split()
+        if len(parts) != 3:
+            raise ValueError(f"{path}:{lineno}: expected 'start_minute end_minute monitor_id', got {line!r}")
+        monitors.append(tuple(int(p) for p in parts))
+    return monitors
+
+
+def token_file():
+    path = os.getenv("KUMA_TOKEN_FILE", ".kuma_token").strip()
+    return None if not path or path.lower() == "off" else path
+
+
+def connect(kuma_url: str, kuma_user: str, kuma_pass: str):
+    """登录 Uptime Kuma：优先使用缓存的 token，失效时用账号密码登录并更新缓存"""
+    # 延迟导入：只计算间隔（或被其他脚本导入）时不需要加载 Socket.IO 客户端
+    from uptime_kuma_api import UptimeKumaApi  # pip install uptime-kuma-api
+
+    api = UptimeKumaApi(kuma_url)
+    path = token_file()
+
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                token = f.read().strip()
+            if token:
+                api.login_by_token(token)
+                print("[schedule_next] Logged in with cached token")
+                return api
+        except Exception as e:
+            print(f"[schedule_next] Cached token rejected ({e}), logging in with password")
+
+    result = api.login(kuma_user, kuma_pass)
+    token = (result or {}).get("token")
+    if path and token:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(token)
+        except OSError as e:
+            print(f"[schedule_next] Failed to cache token: {e}")
+    return api
+
+
+def schedule_monitors(api, monitors) -> int:
+    """在同一个已登录的连接上依次修改所有监控，返回失败的数量"""
+    failed = 0
+    for start_minute, end_minute, monitor_id in monitors:
+        try:
+            interval_seconds, next_run = calc_next_interval_seconds(start_minute, end_minute)
+            print(
+                f"[schedule_next] Next run at (Asia/Shanghai): {next_run}, "
+                f"interval = {interval_seconds} seconds, "
+                f"range = {start_minute}-{end_minute} minutes, monitor_id = {monitor_id}"
+            )
+            # 这里直接调用官方封装的 edit_monitor，内部会通过 Socket.IO 调用 editMonitor 事件。[web:11][web:91]
+            api.edit_monitor(monitor_id, interval=interval_seconds)
+        except Exception as e:
+            failed += 1
+            print(f"[schedule_next] Failed to update monitor_id = {monitor_id}: {e}")
+    return failed
+
+
 def main():
-    if len(sys.argv) != 4:
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        monitors = load_batch(sys.argv[2])
+    elif len(sys.argv) == 4:
+        monitors = [(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]))]
+    else:
         print("Usage: python schedule_next.py <start_minute> <end_minute> <monitor_id>")
+        print("       python schedule_next.py --batch <file|->")
         sys.exit(1)
 
-    start_minute = int(sys.argv[1])
-    end_minute = int(sys.argv[2])
-    monitor_id = int(sys.argv[3])
+    if not monitors:
+        print("[schedule_next] No monitors to update")
+        return
 
     kuma_url = os.environ["KUMA_URL"].rstrip("/")
     kuma_user = os.environ["KUMA_USER"]
     kuma_pass = os.environ["KUMA_PASS"]
 
-    interval_seconds, next_run = calc_next_interval_seconds(start_minute, end_minute)
-    print(
-        f"[schedule_next] Next run at (Asia/Shanghai): {next_run}, "
-        f"interval = {interval_seconds} seconds, "
-        f"range = {start_minute}-{end_minute} minutes, monitor_id = {monitor_id}"
-    )
-
-    api = UptimeKumaApi(kuma_url)
-    api.login(kuma_user, kuma_pass)
-
-    # 这里直接调用官方封装的 edit_monitor，内部会通过 Socket.IO 调用 editMonitor 事件。[web:11][web:91]
-    api.edit_monitor(monitor_id, interval=interval_seconds)
+    api = connect(kuma_url, kuma_user, kuma_pass)
+    try:
+        failed = schedule_monitors(api, monitors)
+    finally:
+        api.disconnect()
 
-    api.disconnect()
+    if len(monitors) > 1:
+        print(f"[schedule_next] Updated {len(monitors) - failed}/{len(monitors)} monitors")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+选择器命中缓存
+
+脚本中很多步骤会按顺序尝试一串备选选择器，每个未命中的选择器都要等满超时。
+这里按 站点 + 步骤 记录上次实际命中的选择器，下次运行时排到最前面先试，
+其余选择器保持原顺序作为后备。页面改版导致旧选择器失效时，新命中的选择器会覆盖记录。
+
+环境变量：
+  SELECTOR_CACHE   缓存文件路径，默认 .selector_cache.json
+"""
+
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._data = {}
+
+    def ordered(self, site: str, step: str, selectors):
+        """返回调整顺序后的选择器列表：上次命中的排在最前"""
+        winner = self._data.get(site, {}).get(step)
+        if winner in selectors:
+            return [winner] + [s for s in selectors if s != winner]
+        return list(selectors)
+
+    def record(self, site: str, step: str, selector: str) -> None:
+        """记录本次命中的选择器，有变化时写回文件"""
+        with self._lock:
+            if self._data.get(site, {}).get(step) == selector:
+                return
+            self._data.setdefault(site, {})[step] = selector
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"保存选择器缓存失败: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SelectorCache:
+    """进程内共享一个缓存实例"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SelectorCache(os.getenv("SELECTOR_CACHE", ".selector_cache.json"))
+        return _cache
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+加密的登录会话缓存
+
+按 站点 + 账号 保存浏览器 Cookie，下次运行时先恢复 Cookie 并做一次轻量校验，
+只有会话失效时才走完整的登录流程。每次签到成功后刷新缓存。
+
+环境变量：
+  SESSION_STORE_KEY       加密口令（必填，未设置时不启用会话缓存）
+  SESSION_STORE_DIR       缓存目录，默认 .sessions
+  SESSION_MAX_AGE_DAYS    缓存最长保留天数，默认 30
+
+依赖 cryptography（Fernet 对称加密）。
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # 未安装时禁用会话缓存
+    Fernet = None
+    InvalidToken = Exception
+
+logger = logging.getLogger(__name__)
+
+# Network.setCookies 接受的字段
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+
+def derive_key(passphrase: str) -> bytes:
+    """把任意长度的口令转换成 Fernet 需要的 32 字节 base64 密钥"""
+    digest = hashlib.sha256(passphrase.encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest)
+
+
+class SessionStore:
+    def __init__(self, key: bytes, directory: str = ".sessions", max_age_days: float = 30):
+        self.fernet = Fernet(key)
+        self.directory = directory
+        self.max_age = max_age_days * 86400
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, site: str, account: str) -> str:
+        # 文件名只包含哈希，不暴露账号
+        name = hashlib.sha256(f"{site}:{account}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def load(self, site: str, account: str):
+        """读取缓存的 Cookie 列表；不存在、过期或无法解密时返回 None"""
+        path = self._path(site, account)
+        try:
+            with open(path, "rb") as f:
+                payload = json.loads(self.fernet.decrypt(f.read()))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError) as e:
+            logger.warning(f"会话缓存无法解密，已忽略: {e}")
+            self.delete(site, account)
+            return None
+
+        if time.time() - payload.get("saved_at", 0) > self.max_age:
+            logger.info("会话缓存已过期")
+            self.delete(site, account)
+            return None
+
+        return payload.get("cookies") or None
+
+    def save(self, site: str, account: str, cookies) -> None:
+        """加密保存 Cookie 列表（先写临时文件再替换，避免写坏）"""
+        path = self._path(site, account)
+        payload = json.dumps({"saved_at": time.time(), "cookies": list(cookies)})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.fernet.encrypt(payload.encode("utf-8")))
+        os.replace(tmp_path, path)
+
+    def delete(self, site: str, account: str) -> None:
+        try:
+            os.remove(self._path(site, account))
+        except FileNotFoundError:
+            pass
+
+
+def store_from_env():
+    """根据环境变量创建会话缓存；未配置口令或缺少依赖时返回 None"""
+    passphrase = os.getenv("SESSION_STORE_KEY", "")
+    if not passphrase:
+        return None
+    if Fernet is None:
+        logger.warning("未安装 cryptography，无法启用会话缓存")
+        return None
+
+    try:
+        max_age_days = float(os.getenv("SESSION_MAX_AGE_DAYS", "30"))
+    except ValueError:
+        max_age_days = 30
+
+    directory = os.getenv("SESSION_STORE_DIR", ".sessions")
+    return SessionStore(derive_key(passphrase), directory, max_age_days)
+
+
+# ========== Cookie 导入导出 ==========
+
+def export_driver_cookies(driver):
+    """通过 CDP 导出浏览器中所有域名的 Cookie"""
+    cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+    exported = []
+    for cookie in cookies:
+        item = {k: cookie[k] for k in COOKIE_FIELDS if k in cookie}
+        # 会话 Cookie 的 expires 为 -1，恢复时不能带上
+        if cookie.get("session") or item.get("expires", -1) < 0:
+            item.pop("expires", None)
+        exported.append(item)
+    return exported
+
+
+def import_driver_cookies(driver, cookies) -> None:
+    """通过 CDP 写入 Cookie，无需先打开对应域名"""
+    params = [{k: c[k] for k in COOKIE_FIELDS if k in c} for c in cookies]
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+
+
+def load_into_session(session, cookies) -> None:
+    """把缓存的 Cookie 写入 requests.Session"""
+    for c in cookies:
+        session.cookies.set(
+            c["name"], c["value"],
+            domain=c.get("domain", ""),
+            path=c.get("path", "/"),
+        )
+
+
+def export_session_cookies(session):
+    """把 requests.Session 中的 Cookie 转换成可缓存的格式"""
+    exported = []
+    for c in session.cookies:
+        item = {
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain,
+            "path": c.path or "/",
+            "secure": bool(c.secure),
+        }
+        if c.expires:
+            item["expires"] = c.expires
+        exported.append(item)
+    return exported
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+账号分片
+
+把一个站点的账号按账号哈希稳定地分成 n 份，由多个任务（例如 GitHub Actions matrix）并行处理，
+单个任务失败只影响自己的那一份。各分片不发送 Telegram 汇总，而是把结果写入文件，
+最后由合并步骤读取所有分片的结果，按原始账号顺序发出一条与不分片时相同的汇总。
+
+用法（三个脚本相同）：
+  python leaflow_checkin.py --shard 2/4          处理第 2 份（共 4 份），结果写入 SHARD_RESULTS_DIR
+  python leaflow_checkin.py --merge shard_results 合并所有分片的结果并发送汇总
+
+分片只取决于站点和账号本身，账号增减时其余账号的分片不变。
+
+环境变量：
+  CHECKIN_SHARD      与 --shard 相同，便于在工作流中配置
+  SHARD_RESULTS_DIR  分片结果目录，默认 shard_results
+"""
+
+import os
+import re
+import json
+import glob
+import hashlib
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(value):
+    """把 "i/n" 解析为 (i, n)，i 从 1 开始；为空时返回 None"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    match = re.fullmatch(r"(\d+)\s*/\s*(\d+)", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/n，例如 2/4: {value}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"分片序号应在 1 到 {count} 之间: {value}")
+    return index, count
+
+
+def shard_of(site: str, account: str, count: int) -> int:
+    """账号所在的分片（从 1 开始），使用稳定哈希，与进程、机器无关"""
+    digest = hashlib.sha256(f"{site}:{account}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select(accounts, site: str, id_field: str, shard):
+    """
+    返回 (本分片的账号, 它们在完整账号列表中的序号)。
+    账号源支持 take() 时只保留序号，不把账号内容读入内存。
+    """
+    index, count = shard
+    indexes = [i for i, account in enumerate(accounts) if shard_of(site, account[id_field], count) == index]
+    subset = accounts.take(indexes) if hasattr(accounts, "take") else [accounts[i] for i in indexes]
+    logger.info(f"[{site}] 分片 {index}/{count}：处理 {len(indexes)}/{len(accounts)} 个账号")
+    return subset, indexes
+
+
+def results_dir() -> str:
+    return os.getenv("SHARD_RESULTS_DIR", "shard_results").strip() or "shard_results"
+
+
+def write_results(site: str, shard, entries, peaks=()) -> str:
+    """entries 为 [(完整列表中的序号, 结果), ...]，结果需要能序列化为 JSON；peaks 为各账号的浏览器内存峰值（字节）"""
+    index, count = shard
+    directory = results_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{site}-shard-{index}-of-{count}.json")
+    data = {"site": site, "shard": [index, count], "results": [[i, list(result)] for i, result in entries],
+            "browser_peak_rss": list(peaks)}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    logger.info(f"[{site}] 分片结果已写入 {path}")
+    return path
+
+
+def load_results(site: str, directory: str):
+    """读取目录（含子目录）下该站点的所有分片结果，返回 (按原始顺序排列的结果, 缺少的分片序号, 各账号的浏览器内存峰值)"""
+    entries = {}
+    peaks = []
+    seen = set()
+    counts = set()
+    pattern = os.path.join(directory, "**", f"{site}-shard-*-of-*.json")
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取分片结果失败 {path}: {e}")
+            continue
+        index, count = data["shard"]
+        seen.add(index)
+        counts.add(count)
+        for i, result in data["results"]:
+            entries[i] = tuple(result)
+        peaks.extend(data.get("browser_peak_rss", []))
+
+    if len(counts) > 1:
+        logger.warning(f"[{site}] 分片结果来自不同的分片数: {sorted(counts)}")
+    total = max(counts) if counts else 0
+    missing = sorted(set(range(1, total + 1)) - seen)
+    logger.info(f"[{site}] 读取到 {len(seen)}/{total} 个分片，共 {len(entries)} 个账号的结果")
+    return [entries[i] for i in sorted(entries)], missing, peaks
+
+
+def merge_and_notify(site: str, directory: str, build_summary, parse_mode=None):
+    """合并分片结果，按 build_summary 生成与不分片时相同的汇总并发送；缺少分片时在标题中注明"""
+    # 延迟导入，避免分片任务本身加载通知模块之外的依赖
+    from telegram_notify import TelegramDispatcher
+    from memory_profile import summary_line
+
+    results, missing, peaks = load_results(site, directory)
+    header, blocks = build_summary(results)
+    header += summary_line(peaks)
+    if missing:
+        header += f"⚠️ 缺少分片: {', '.join(str(i) for i in missing)}，对应账号没有结果\n"
+    logger.info(header + "\n" + "\n\n".join(blocks))
+
+    notifier = TelegramDispatcher.from_env(parse_mode=parse_mode)
+    if not notifier:
+        logger.info("未配置 TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID，跳过 Telegram 推送")
+        return results
+    notifier.send_summary(header, blocks)
+    notifier.close()
+    return results
+
+
+def parse_cli(argv=None):
+    """解析脚本的 --shard / --merge 参数"""
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", type=parse_shard, default=None, metavar="i/n",
+                       help="只处理第 i 份账号（共 n 份），结果写入 SHARD_RESULTS_DIR")
+    group.add_argument("--merge", metavar="DIR", help="合并 DIR 下各分片的结果并发送汇总")
+    args = parser.parse_args(argv)
+    if args.shard is None and not args.merge:
+        try:
+            args.shard = parse_shard(os.getenv("CHECKIN_SHARD", ""))
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    return args
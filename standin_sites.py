@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+本地模拟站点（性能基准测试用）
+
+用标准库 http.server 模拟脚本会访问的页面和接口，结构与脚本中的选择器一一对应：
+  leaflow   /login、/dashboard、/api/balance、签到页 /checkin、/api/checkin
+  discourse /login、/、/session/csrf、/session、/session/current.json、
+            /checkin、/checkin.json、/u/<用户>/points-history/events(.json)
+            MJJBOX 和 NodeLoc 都是 Discourse 论坛，共用同一套模拟页面
+
+可配置每个请求的延迟、登录页弹窗以及一部分账号"今日已签到"的初始状态。
+只用于本地基准测试，不校验密码强度，也不做任何持久化。
+"""
+
+import json
+import time
+import html
+import secrets
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse, parse_qs, quote
+
+logger = logging.getLogger(__name__)
+
+SITES = ("leaflow", "discourse")
+
+# 模拟站点统一接受的密码
+STANDIN_PASSWORD = "benchmark"
+
+CHECKIN_REWARD = 10
+
+
+class StandInState:
+    """模拟站点的账号和会话状态，所有请求线程共用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 会话 ID -> {"csrf": token, "user": 用户名或 None}
+        self.sessions = {}
+        # 用户名 -> {"checked_in": bool, "points": int, "streak": int, "history": [...]}
+        self.users = {}
+        self.requests = 0
+
+    def seed(self, names, checked_in_ratio: float = 0.0) -> None:
+        """创建账号，前 checked_in_ratio 比例的账号标记为今日已签到"""
+        already = int(len(names) * checked_in_ratio)
+        with self._lock:
+            for i, name in enumerate(names):
+                user = self.users.setdefault(name, {"points": 100, "streak": 0, "history": []})
+                user["checked_in"] = False
+                if i < already:
+                    self._record_checkin(user)
+
+    def new_day(self, checked_in_ratio: float = 0.0) -> None:
+        """模拟进入新的一天：清空签到状态，保留会话"""
+        self.seed(list(self.users), checked_in_ratio)
+
+    def new_session(self) -> str:
+        sid = secrets.token_hex(16)
+        with self._lock:
+            self.sessions[sid] = {"csrf": secrets.token_urlsafe(24), "user": None}
+        return sid
+
+    def session(self, sid):
+        with self._lock:
+            return self.sessions.get(sid)
+
+    def login(self, sid, name: str, password: str) -> bool:
+        if not name or password != STANDIN_PASSWORD:
+            return False
+        with self._lock:
+            self.users.setdefault(name, {"points": 100, "streak": 0, "history": [], "checked_in": False})
+            session = self.sessions.setdefault(sid, {})
+            session["user"] = name
+            # 登录后轮换 CSRF Token，与 Discourse 行为一致
+            session["csrf"] = secrets.token_urlsafe(24)
+        return True
+
+    def checkin(self, name: str) -> bool:
+        """签到成功返回 True，今日已签到返回 False"""
+        with self._lock:
+            user = self.users[name]
+            if user["checked_in"]:
+                return False
+            self._record_checkin(user)
+            return True
+
+    def user(self, name: str) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.users[name]))
+
+    def _record_checkin(self, user) -> None:
+        user["checked_in"] = True
+        user["points"] += CHECKIN_REWARD
+        user["streak"] += 1
+        user["history"].insert(0, {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "points": CHECKIN_REWARD,
+        })
+
+
+# ========== 页面模板 ==========
+
+POPUP_HTML = """
+<div id="popup" style="position:fixed;top:0;left:0;width:100%;height:100%;
+     background:rgba(0,0,0,.5);z-index:9999;display:none"></div>
+<script>
+setTimeout(function () { document.getElementById('popup').style.display = 'block'; }, 200);
+document.getElementById('popup').addEventListener('click', function () { this.remove(); });
+</script>
+"""
+
+LEAFLOW_LOGIN_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>登录</title></head><body>
+<form method="post" action="/login">
+  <input type="email" name="email" placeholder="邮箱">
+  <input type="password" name="password" placeholder="密码">
+  <button type="submit">登录</button>
+</form>
+{popup}
+</body></html>"""
+
+LEAFLOW_DASHBOARD_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>仪表板</title></head><body>
+<h1>仪表板</h1>
+<div>账户余额：<span class="font-medium balance" id="balance">加载中</span></div>
+<script>
+fetch('/api/balance', {headers: {'Accept': 'application/json'}})
+  .then(function (r) { return r.json(); })
+  .then(function (d) { document.getElementById('balance').innerText = '¥' + d.data.balance; });
+</script>
+</body></html>"""
+
+LEAFLOW_CHECKIN_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>每日签到</title></head><body>
+<h1>每日签到</h1>
+<button class="checkin-btn" {disabled}>{label}</button>
+<div id="result"></div>
+<script>
+document.querySelector('.checkin-btn').addEventListener('click', function () {{
+  fetch('/api/checkin', {{method: 'POST', headers: {{'Accept': 'application/json',
+      'X-Requested-With': 'XMLHttpRequest'}}}})
+    .then(function (r) {{ return r.json(); }})
+    .then(function (d) {{
+      var box = document.getElementById('result');
+      box.className = 'alert-success';
+      box.innerText = d.message;
+    }});
+}});
+</script>
+</body></html>"""
+
+DISCOURSE_LOGIN_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>登录</title></head><body>
+<input id="login-account-name" type="text">
+<input id="login-account-password" type="password">
+<button id="login-button" class="btn-primary">登录</button>
+{popup}
+<script>
+function ajax(url, opts) {{
+  opts = opts || {{}};
+  opts.headers = Object.assign({{'Accept': 'application/json', 'X-Requested-With': 'XMLHttpRequest'}},
+                               opts.headers || {{}});
+  return fetch(url, opts).then(function (r) {{ return r.json(); }});
+}}
+document.getElementById('login-button').addEventListener('click', function () {{
+  var body = 'login=' + encodeURIComponent(document.getElementById('login-account-name').value) +
+             '&password=' + encodeURIComponent(document.getElementById('login-account-password').value);
+  ajax('/session/csrf').then(function (d) {{
+    return ajax('/session', {{method: 'POST', body: body, headers: {{'X-CSRF-Token': d.csrf,
+        'Content-Type': 'application/x-www-form-urlencoded'}}}});
+  }}).then(function (d) {{ if (!d.error) location.href = '/'; }});
+}});
+</script>
+</body></html>"""
+
+DISCOURSE_HOME_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><meta name="csrf-token" content="{csrf}"><title>首页</title></head>
+<body>
+<div class="App-header-controls">{avatar}</div>
+{checkin}
+<script>
+var btn = document.querySelector('.checkin-button');
+if (btn) btn.addEventListener('click', function () {{
+  fetch('/checkin', {{method: 'POST', headers: {{'Accept': 'application/json',
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRF-Token': document.querySelector('meta[name=csrf-token]').content}}}})
+    .then(function () {{ btn.disabled = true; btn.innerText = '已签到'; }});
+}});
+</script>
+</body></html>"""
+
+DISCOURSE_POINTS_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>积分记录</title></head><body>
+<div class="total-scores"><span class="value">{total}</span></div>
+<table>{rows}</table>
+</body></html>"""
+
+POINTS_ROW_HTML = (
+    '<tr class="positive-points"><td><span title="{time}">{date}</span></td>'
+    '<td><span class="positive">+{points}</span></td><td>每日签到奖励</td></tr>'
+)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = "StandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ---------- 基础工具 ----------
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+
+    def cookies(self) -> dict:
+        jar = SimpleCookie(self.headers.get("Cookie", ""))
+        return {k: v.value for k, v in jar.items()}
+
+    def current_session(self):
+        """返回 (会话ID, 会话)，没有会话时新建"""
+        sid = self.cookies().get(self.server.cookie_name)
+        session = self.state.session(sid) if sid else None
+        if session is None:
+            sid = self.state.new_session()
+            session = self.state.session(sid)
+            self._new_cookie = sid
+        return sid, session
+
+    def read_form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[0] for k, v in parse_qs(body).items()}
+
+    def send(self, status: int, body, content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False)
+            content_type = "application/json; charset=utf-8"
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if getattr(self, "_new_cookie", None):
+            self.send_header("Set-Cookie", f"{self.server.cookie_name}={self._new_cookie}; Path=/; HttpOnly")
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location: str):
+        self.send(302, "", headers=[("Location", location)])
+
+    def handle_one_request(self):
+        self._new_cookie = None
+        super().handle_one_request()
+
+    def dispatch(self, method: str):
+        with self.server.counter_lock:
+            self.state.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = urlparse(self.path).path
+        handler = getattr(self, f"{self.server.site}_{method}", None)
+        try:
+            if handler is None or not handler(path):
+                self.send(404, {"error": "not found"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        self.dispatch("get")
+
+    def do_POST(self):
+        self.dispatch("post")
+
+    # ---------- Leaflow ----------
+
+    def leaflow_get(self, path):
+        sid, session = self.current_session()
+        user = session["user"]
+        popup = POPUP_HTML if self.server.popup else ""
+
+        if path == "/login":
+            self.send(200, LEAFLOW_LOGIN_HTML.format(popup=popup))
+        elif path == "/dashboard":
+            if not user:
+                self.redirect("/login")
+            else:
+                self.send(200, LEAFLOW_DASHBOARD_HTML)
+        elif path == "/api/balance":
+            if not user:
+                self.send(401, {"message": "Unauthenticated."})
+            else:
+                points = self.state.user(user)["points"]
+                self.send(200, {"data": {"balance": f"{points / 100:.2f}"}})
+        elif path == "/checkin":
+            if not user:
+                self.redirect("/login")
+            else:
+                checked_in = self.state.user(user)["checked_in"]
+                self.send(200, LEAFLOW_CHECKIN_HTML.format(
+                    disabled="disabled" if checked_in else "",
+                    label="已签到" if checked_in else "立即签到",
+                ))
+        else:
+            return False
+        return True
+
+    def leaflow_post(self, path):
+        sid, session = self.current_session()
+        if path == "/login":
+            form = self.read_form()
+            if self.state.login(sid, form.get("email", ""), form.get("password", "")):
+                self.send(302, "", headers=[
+                    ("Location", "/dashboard"),
+                    ("Set-Cookie", f"XSRF-TOKEN={quote(self.state.session(sid)['csrf'])}; Path=/"),
+                ])
+            else:
+                self.send(200, LEAFLOW_LOGIN_HTML.format(popup="") + '<div class="alert-danger">密码错误</div>')
+        elif path == "/api/checkin":
+            self.read_form()
+            if not session["user"]:
+                self.send(401, {"message": "Unauthenticated."})
+            elif self.state.checkin(session["user"]):
+                self.send(200, {"success": True, "message": f"签到成功，获得 {CHECKIN_REWARD / 100:.2f} 元"})
+            else:
+                self.send(200, {"success": False, "message": "今日已签到"})
+        else:
+            return False
+        return True
+
+    # ---------- Discourse（MJJBOX / NodeLoc） ----------
+
+    def discourse_get(self, path):
+        sid, session = self.current_session()
+        user = session["user"]
+        popup = POPUP_HTML if self.server.popup else ""
+
+        if path == "/login":
+            self.send(200, DISCOURSE_LOGIN_HTML.format(popup=popup))
+        elif path == "/":
+            avatar = checkin = ""
+            if user:
+                avatar = f'<a href="/u/{html.escape(user)}"><img class="Avatar" alt=""></a>'
+                checked_in = self.state.user(user)["checked_in"]
+                checkin = '<button class="checkin-button" {0}>{1}</button>'.format(
+                    "disabled" if checked_in else "", "已签到" if checked_in else "签到"
+                )
+            self.send(200, DISCOURSE_HOME_HTML.format(
+                csrf=html.escape(session["csrf"]), avatar=avatar, checkin=checkin
+            ))
+        elif path == "/session/csrf":
+            self.send(200, {"csrf": session["csrf"]})
+        elif path == "/session/current.json":
+            if user:
+                self.send(200, {"current_user": {"username": user}})
+            else:
+                self.send(404, {"errors": ["not logged in"]})
+        elif path == "/checkin.json":
+            if not user:
+                self.send(403, {"errors": ["not logged in"]})
+            else:
+                info = self.state.user(user)
+                self.send(200, {
+                    "user_checkin_count": len(info["history"]),
+                    "consecutive_days": info["streak"],
+                    "today_checked_in": info["checked_in"],
+                    "current_points": info["points"],
+                    "checkin_history": [
+                        {"date": h["date"], "points_earned": h["points"]} for h in info["history"]
+                    ],
+                })
+        elif path.startswith("/u/") and "/points-history/events" in path:
+            name = path.split("/")[2]
+            if name not in self.state.users:
+                return False
+            info = self.state.user(name)
+            if path.endswith(".json"):
+                self.send(200, {
+                    "total_points": info["points"],
+                    "events": [
+                        {"points": h["points"], "reason": "每日签到奖励", "created_at": h["created_at"]}
+                        for h in info["history"]
+                    ],
+                })
+            else:
+                rows = "".join(
+                    POINTS_ROW_HTML.format(time=h["created_at"], date=h["date"], points=h["points"])
+                    for h in info["history"]
+                )
+                self.send(200, DISCOURSE_POINTS_HTML.format(total=info["points"], rows=rows))
+        else:
+            return False
+        return True
+
+    def discourse_post(self, path):
+        sid, session = self.current_session()
+        form = self.read_form()
+        token_ok = self.headers.get("X-CSRF-Token") == session["csrf"]
+
+        if path == "/session":
+            if not token_ok:
+                self.send(403, {"errors": ["BAD CSRF"]})
+            elif self.state.login(sid, form.get("login", ""), form.get("password", "")):
+                self.send(200, {"user": {"username": form["login"]}}, headers=[
+                    ("Set-Cookie", f"_t={secrets.token_hex(16)}; Path=/; HttpOnly"),
+                ])
+            else:
+                self.send(200, {"error": "用户名或密码不正确"})
+        elif path == "/checkin":
+            if not token_ok or not session["user"]:
+                self.send(403, {"errors": ["not logged in"]})
+            elif self.state.checkin(session["user"]):
+                self.send(200, {"success": True, "message": f"签到成功，获得 {CHECKIN_REWARD} 积分"})
+            else:
+                self.send(422, {"errors": ["您今天已经签到过了 (already checked in)"]})
+        else:
+            return False
+        return True
+
+
+class StandInServer:
+    """
+    在后台线程中运行的模拟站点
+      site       leaflow / discourse
+      latency    每个请求的固定延迟（秒），模拟网络往返和服务端处理时间
+      popup      登录页是否弹出遮罩弹窗
+    """
+
+    def __init__(self, site: str, latency: float = 0.0, popup: bool = False, host: str = "127.0.0.1"):
+        if site not in SITES:
+            raise ValueError(f"未知的模拟站点: {site}")
+        self.state = StandInState()
+        self.httpd = ThreadingHTTPServer((host, 0), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.site = site
+        self.httpd.latency = latency
+        self.httpd.popup = popup
+        self.httpd.state = self.state
+        self.httpd.counter_lock = threading.Lock()
+        self.httpd.cookie_name = "leaflow_session" if site == "leaflow" else "_forum_session"
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"模拟站点已启动: {self.httpd.site} {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Telegram 通知发送
+
+  - 汇总消息超过 Telegram 单条 4096 字符的限制时，按账号分段拆成多条发送
+  - 429 时按返回的 retry_after 等待后重试，网络错误和 5xx 按指数退避重试
+  - 所有消息共用一个带连接池的 Session，每次请求都有超时
+  - 在后台线程中发送，调用方入队后可以继续做收尾工作，最后 close() 等待发送完成
+  - 进度模式：开始时发一条状态消息，每完成一个账号就原地编辑更新，
+    更新合并后按间隔发出，最后一次编辑为完整的汇总
+
+环境变量：
+  TELEGRAM_BOT_TOKEN
+  TELEGRAM_CHAT_ID
+  TELEGRAM_PROGRESS           设为 1 时启用进度模式
+  TELEGRAM_PROGRESS_INTERVAL  两次编辑之间的最短间隔（秒），默认 3
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+
+import requests
+
+from http_client import build_session
+
+logger = logging.getLogger(__name__)
+
+# Telegram 按 UTF-16 码元计算长度
+MAX_MESSAGE_LENGTH = 4096
+REQUEST_TIMEOUT = 10
+API_BASE = "https://api.telegram.org"
+
+
+def text_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _split_long_block(block: str, limit: int) -> list:
+    """单个账号的内容本身超长时按行拆分，单行超长时硬切"""
+    parts, current = [], ""
+    for line in block.split("\n"):
+        while text_length(line) > limit:
+            cut = limit
+            while text_length(line[:cut]) > limit:
+                cut -= 1
+            parts.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if text_length(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_message(header: str, blocks, limit: int = MAX_MESSAGE_LENGTH, separator: str = "\n\n") -> list:
+    """
+    把 标题 + 各账号内容 拆成若干条不超过 limit 的消息，只在账号之间断开。
+    后续消息带上标题第一行和 (第 n 条) 标记，便于在聊天中对应。
+    """
+    title = header.split("\n", 1)[0]
+    # 给续页标记 "标题 (n/m)" 预留空间
+    limit -= text_length(title) + 16
+    messages = []
+    current = header.rstrip("\n")
+
+    for block in blocks:
+        block = block.strip("\n")
+        candidate = f"{current}{separator}{block}" if current else block
+        if text_length(candidate) <= limit:
+            current = candidate
+            continue
+
+        if current:
+            messages.append(current)
+        if text_length(block) > limit:
+            pieces = _split_long_block(block, limit)
+            messages.extend(pieces[:-1])
+            block = pieces[-1]
+        current = block
+
+    if current:
+        messages.append(current)
+
+    if len(messages) > 1:
+        messages = [messages[0]] + [
+            f"{title} ({i}/{len(messages)})\n\n{m}" for i, m in enumerate(messages[1:], 2)
+        ]
+    return messages
+
+
+def fit_message(header: str, blocks, limit: int = MAX_MESSAGE_LENGTH, separator: str = "\n\n") -> str:
+    """拼成一条不超过 limit 的消息，放不下时省略最早的账号（用于进度消息）"""
+    blocks = [b.strip("\n") for b in blocks]
+    header = header.rstrip("\n")
+    omitted = 0
+    while True:
+        parts = [header]
+        if omitted:
+            parts.append(f"…（省略前 {omitted} 个账号）")
+        text = separator.join(parts + blocks[omitted:])
+        if text_length(text) <= limit:
+            return text
+        if omitted >= len(blocks):
+            # 只剩标题仍然超长，按行截断
+            return _split_long_block(text, limit)[0]
+        omitted += 1
+
+
+class TelegramDispatcher:
+    def __init__(self, bot_token: str, chat_id: str, parse_mode: str = None, max_attempts: int = 5, session=None):
+        self.api = f"{API_BASE}/bot{bot_token}"
+        self.chat_id = chat_id
+        self.parse_mode = parse_mode
+        self.max_attempts = max_attempts
+        self.session = session or build_session(pool_size=2)
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="telegram-dispatcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, parse_mode: str = None):
+        """未配置 TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID 时返回 None"""
+        bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+        chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
+        if not bot_token or not chat_id:
+            return None
+        return cls(bot_token, chat_id, parse_mode=parse_mode)
+
+    # ========== 入队 ==========
+
+    def submit(self, job) -> None:
+        """把一个无参函数放到后台线程执行，按入队顺序依次执行"""
+        self._queue.put(job)
+
+    def send(self, text: str) -> None:
+        """发送一条消息，超长时按行拆分"""
+        for part in split_message("", [text]):
+            self.submit(lambda part=part: self.deliver(part))
+
+    def send_summary(self, header: str, blocks) -> None:
+        """发送汇总：标题 + 各账号内容，超长时在账号之间拆成多条"""
+        messages = split_message(header, blocks)
+        if len(messages) > 1:
+            logger.info(f"Telegram 汇总超过长度限制，拆分为 {len(messages)} 条发送")
+        for message in messages:
+            self.submit(lambda message=message: self.deliver(message))
+
+    def close(self, timeout: float = 60) -> bool:
+        """等待队列中的消息发送完成，返回是否全部发送成功"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Telegram 通知未能在限定时间内发送完成")
+            return False
+        return self.failed == 0
+
+    # ========== 后台发送 ==========
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"Telegram 通知任务异常: {e}")
+                self.failed += 1
+
+    def deliver(self, text: str):
+        """发送一条消息，返回 message_id，失败时返回 None（在后台线程中调用）"""
+        result = self.call("sendMessage", self._message_data(text))
+        if result is None:
+            self.failed += 1
+            return None
+        self.sent += 1
+        logger.info("Telegram 通知发送成功")
+        return result.get("message_id")
+
+    def edit(self, message_id, text: str) -> bool:
+        """原地编辑一条消息（在后台线程中调用）"""
+        data = self._message_data(text)
+        data["message_id"] = message_id
+        return self.call("editMessageText", data, ignore=("message is not modified",)) is not None
+
+    def _message_data(self, text: str) -> dict:
+        data = {"chat_id": self.chat_id, "text": text}
+        if self.parse_mode:
+            data["parse_mode"] = self.parse_mode
+        return data
+
+    def call(self, method: str, data: dict, ignore=()):
+        """
+        调用 Bot API，返回 result；失败返回 None。
+        ignore 中的错误描述视为成功（例如编辑内容没有变化）。
+        """
+        delay = 1.0
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                resp = self.session.post(f"{self.api}/{method}", data=data, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                logger.warning(f"Telegram 请求失败（第 {attempt} 次）: {e}")
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            try:
+                payload = resp.json()
+            except ValueError:
+                payload = {}
+
+            if resp.status_code == 200:
+                result = payload.get("result")
+                return result if isinstance(result, dict) else {}
+
+            if resp.status_code == 429:
+                try:
+                    retry_after = float(payload.get("parameters", {}).get("retry_after", delay))
+                except (TypeError, ValueError):
+                    retry_after = delay
+                logger.warning(f"Telegram 限流，{retry_after:.0f} 秒后重试")
+                time.sleep(retry_after)
+                continue
+
+            if resp.status_code >= 500:
+                logger.warning(f"Telegram 返回 HTTP {resp.status_code}（第 {attempt} 次），稍后重试")
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            description = str(payload.get("description", ""))
+            if any(text in description for text in ignore):
+                return {}
+
+            # 4xx（消息格式错误、chat_id 无效等）重试也不会成功
+            logger.error(f"Telegram {method} 失败: {resp.text[:200]}")
+            return None
+
+        logger.error(f"Telegram {method} 多次重试后仍然失败")
+        return None
+
+
+class LiveProgress:
+    """
+    进度消息：start() 发出一条状态消息，update() 之后按间隔原地编辑，finish() 编辑为最终汇总。
+
+    render 返回当前的 (标题, 各账号内容)，在后台线程发送前才调用，
+    因此间隔内的多次 update() 只会产生一次编辑，内容总是最新的。
+    """
+
+    def __init__(self, dispatcher: TelegramDispatcher, render, interval: float = 3.0):
+        self.dispatcher = dispatcher
+        self.render = render
+        self.interval = interval
+        self.message_id = None
+        self._last_edit = 0.0
+        self._pending = False
+        self._finished = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, dispatcher, render):
+        """未配置 Telegram 或未开启 TELEGRAM_PROGRESS 时返回 None"""
+        if not dispatcher or os.getenv("TELEGRAM_PROGRESS", "").strip().lower() not in ("1", "true", "on"):
+            return None
+        value = os.getenv("TELEGRAM_PROGRESS_INTERVAL", "3").strip()
+        try:
+            interval = max(1.0, float(value))
+        except ValueError:
+            logger.warning(f"TELEGRAM_PROGRESS_INTERVAL 配置无效: {value}，使用默认值 3")
+            interval = 3.0
+        return cls(dispatcher, render, interval)
+
+    def start(self) -> None:
+        def job():
+            self.message_id = self.dispatcher.deliver(fit_message(*self.render()))
+            self._last_edit = time.monotonic()
+            if self.message_id is None:
+                logger.warning("进度消息发送失败，结束时改为直接发送汇总")
+
+        self.dispatcher.submit(job)
+
+    def update(self) -> None:
+        """有账号完成时调用，可以在任意线程调用"""
+        with self._lock:
+            if self._pending or self._finished:
+                return
+            self._pending = True
+        self.dispatcher.submit(self._flush)
+
+    def _flush(self) -> None:
+        wait = self._last_edit + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self._pending = False
+            if self._finished:
+                return
+        if self.message_id is None:
+            return
+        self.dispatcher.edit(self.message_id, fit_message(*self.render()))
+        self._last_edit = time.monotonic()
+
+    def finish(self, header: str, blocks) -> None:
+        """把进度消息编辑为最终汇总；超长的部分和编辑失败时作为新消息发送"""
+        with self._lock:
+            self._finished = True
+        messages = split_message(header, blocks)
+
+        def job():
+            rest = messages
+            if self.message_id is not None:
+                wait = self._last_edit + 1.0 - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                if self.dispatcher.edit(self.message_id, messages[0]):
+                    self.dispatcher.sent += 1
+                    rest = messages[1:]
+            for message in rest:
+                self.dispatcher.deliver(message)
+
+        self.dispatcher.submit(job)